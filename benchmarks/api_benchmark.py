@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+API Request Benchmark
+
+Measures requests/sec and latency percentiles of an API endpoint, including the
+full middleware stack, by calling the ASGI application in-process.
+
+Usage:
+    python benchmarks/api_benchmark.py --requests 5000 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import statistics
+import time
+
+import httpx
+
+from dell_unisphere_package.main import app
+from dell_unisphere_package.models.storage import upgrade_sessions
+from dell_unisphere_package.schemas.base import UpgradeStatusEnum
+from dell_unisphere_package.utils.upgrade_simulator import (
+    create_realistic_upgrade_tasks,
+)
+
+CREDENTIALS = base64.b64encode(b"admin:Password123!").decode("utf-8")
+HEADERS = {"Authorization": f"Basic {CREDENTIALS}", "X-EMC-REST-CLIENT": "true"}
+
+
+def create_sessions(count):
+    """Create completed upgrade sessions to be listed by the endpoint."""
+    for i in range(count):
+        session_id = f"bench_{i}"
+        upgrade_sessions[session_id] = {
+            "id": session_id,
+            "caption": "Benchmark upgrade",
+            "status": UpgradeStatusEnum.COMPLETED,
+            "messages": [],
+            "elapsedTime": "PT0M",
+            "percentComplete": 100,
+            "tasks": create_realistic_upgrade_tasks(),
+        }
+
+
+async def run_benchmark(path, request_count, concurrency, warmup):
+    """Issue the requests from concurrent workers and report throughput."""
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://testserver", headers=HEADERS
+    ) as client:
+        for _ in range(warmup):
+            response = await client.get(path)
+            response.raise_for_status()
+
+        remaining = request_count
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"Endpoint:                  GET {path}")
+    print(f"Requests:                  {len(latencies)} ({concurrency} concurrent)")
+    print(f"Throughput:                {len(latencies) / elapsed:.0f} req/s")
+    print(f"Latency p50:               {quantiles[49] * 1000:.2f} ms")
+    print(f"Latency p99:               {quantiles[98] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--path", default="/api/types/upgradeSession/instances")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.getLogger("dell_unisphere_package").setLevel(logging.WARNING)
+    create_sessions(args.sessions)
+    asyncio.run(run_benchmark(args.path, args.requests, args.concurrency, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
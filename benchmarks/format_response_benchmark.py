@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Response Envelope Benchmark
+
+Compares format_response against the previous implementation, which rebuilt the
+URL prefixes for every entry and formatted the timestamp on every call.
+
+Usage:
+    python benchmarks/format_response_benchmark.py --entries 2000 --repeat 200
+"""
+
+import argparse
+import time
+
+from fastapi import Request
+
+from dell_unisphere_package.controllers.auth import format_response
+from dell_unisphere_package.schemas.upgrade import UpgradeTask
+from dell_unisphere_package.utils.upgrade_simulator import (
+    create_realistic_upgrade_tasks,
+)
+
+
+def legacy_format_response(
+    data, request: Request, base_url="/api", instance_type=None, instance_id=None
+):
+    """Previous implementation of format_response, kept for comparison."""
+    from datetime import datetime
+
+    from pydantic import BaseModel
+
+    current_time = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+    def convert_model_to_dict(item):
+        if isinstance(item, BaseModel):
+            return item.model_dump()
+        return item
+
+    base_url_path = f"{base_url}/types/{instance_type}/instances"
+    full_base_url = (
+        f"{request.url.scheme}://{request.url.netloc}{base_url_path}?per_page=2000"
+    )
+
+    entries = []
+    for i, item in enumerate(data):
+        item_id = getattr(item, "id", f"{i}") if hasattr(item, "id") else f"{i}"
+        instance_base_url = f"{request.url.scheme}://{request.url.netloc}{base_url}/instances/{instance_type}"
+
+        entry = {
+            "@base": instance_base_url,
+            "content": convert_model_to_dict(item),
+            "links": [{"rel": "self", "href": f"/{item_id}"}],
+            "updated": current_time,
+        }
+        entries.append(entry)
+
+    return {
+        "@base": full_base_url,
+        "updated": current_time,
+        "links": [{"rel": "self", "href": "&page=1"}],
+        "entries": entries,
+    }
+
+
+def make_request():
+    """Create a collection request as routed by Starlette."""
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("localhost", 8000),
+            "path": "/api/types/upgradeSession/instances",
+            "query_string": b"",
+            "headers": [],
+        }
+    )
+
+
+def measure(function, data, request, repeat):
+    """Return the mean time per call in seconds."""
+    function(data, request, instance_type="upgradeSession")
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(data, request, instance_type="upgradeSession")
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    request = make_request()
+    task = create_realistic_upgrade_tasks()[0]
+    datasets = {
+        "dicts": [{"id": f"session_{i}", **task} for i in range(args.entries)],
+        "models": [UpgradeTask(**task) for _ in range(args.entries)],
+    }
+
+    print(f"Entries per response:      {args.entries}")
+    for name, data in datasets.items():
+        legacy = measure(legacy_format_response, data, request, args.repeat)
+        current = measure(format_response, data, request, args.repeat)
+        print(
+            f"{name + ':':<27}legacy {legacy * 1000:.2f} ms, "
+            f"current {current * 1000:.2f} ms ({legacy / current:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+JSON Response Benchmark
+
+Compares encoding large upgradeSession and installedSoftwareVersion envelopes with
+UnisphereJSONResponse against FastAPI's default jsonable_encoder and JSONResponse.
+
+Usage:
+    python benchmarks/json_response_benchmark.py --entries 2000 --repeat 50
+"""
+
+import argparse
+import time
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from dell_unisphere_package.controllers.auth import format_response
+from dell_unisphere_package.models.records import TaskRecord
+from dell_unisphere_package.schemas.base import (
+    InstalledSoftwareVersion,
+    UpgradeSessionTypeEnum,
+    UpgradeStatusEnum,
+)
+from dell_unisphere_package.schemas.upgrade import UpgradeMessage
+from dell_unisphere_package.utils import json_response
+from dell_unisphere_package.utils.json_response import UnisphereJSONResponse
+from dell_unisphere_package.utils.upgrade_simulator import (
+    create_realistic_upgrade_tasks,
+)
+
+
+def make_request():
+    """Create a collection request as routed by Starlette."""
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("localhost", 8000),
+            "path": "/api/types/upgradeSession/instances",
+            "query_string": b"",
+            "headers": [],
+        }
+    )
+
+
+def make_upgrade_sessions(count):
+    """Create upgrade sessions as stored by the upgrade routes."""
+    sessions = []
+    for i in range(count):
+        tasks = [
+            TaskRecord.from_value(task) for task in create_realistic_upgrade_tasks()
+        ]
+        sessions.append(
+            {
+                "id": f"session_{i}",
+                "type": UpgradeSessionTypeEnum.UPGRADE,
+                "candidate": "candidate_1",
+                "caption": "Upgrade to 5.4.0",
+                "status": UpgradeStatusEnum.IN_PROGRESS,
+                "messages": [
+                    UpgradeMessage(
+                        timestamp=task.creationTime,
+                        message=f"Starting task: {task.caption}",
+                    )
+                    for task in tasks[:3]
+                ],
+                "creationTime": tasks[0].creationTime,
+                "elapsedTime": "PT0M",
+                "percentComplete": 21,
+                "tasks": tasks,
+            }
+        )
+    return sessions
+
+
+def measure(encode, envelope, repeat):
+    """Return the mean encoding time in seconds and the encoded body."""
+    body = encode(envelope)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode(envelope)
+    return (time.perf_counter() - start) / repeat, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if json_response.orjson is None:
+        print("orjson is not installed; install the 'fast' extra to compare")
+        return
+
+    request = make_request()
+    payloads = {
+        "upgradeSession": make_upgrade_sessions(args.entries),
+        "installedSoftwareVersion": [
+            InstalledSoftwareVersion(id=str(i)) for i in range(args.entries)
+        ],
+    }
+
+    print(f"Entries per response:      {args.entries}")
+    for instance_type, data in payloads.items():
+        envelope = format_response(data, request, instance_type=instance_type)
+        standard, standard_body = measure(
+            lambda content: JSONResponse(jsonable_encoder(content)).body,
+            envelope,
+            args.repeat,
+        )
+        fast, fast_body = measure(
+            lambda content: UnisphereJSONResponse(content).body, envelope, args.repeat
+        )
+        same = "identical" if standard_body == fast_body else "different"
+        print(
+            f"{instance_type + ':':<27}standard {standard * 1000:.1f} ms, "
+            f"fast {fast * 1000:.1f} ms ({standard / fast:.1f}x, {same} JSON)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+
+Measures how long loading a saved state with many upgrade sessions takes before
+the server can serve requests, loading every session versus loading the upgrade
+sessions index and reading sessions when they are first accessed.
+
+Usage:
+    python benchmarks/startup_benchmark.py --sessions 100000 --active 100
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import UpgradeSessionRecord
+from dell_unisphere_package.schemas.base import UpgradeStatusEnum
+from dell_unisphere_package.utils import state_persistence
+from dell_unisphere_package.utils.state_persistence import (
+    load_upgrade_sessions,
+    load_upgrade_sessions_into,
+    save_upgrade_sessions,
+)
+from dell_unisphere_package.utils.upgrade_simulator import (
+    FINISHED_STATUSES,
+    create_realistic_upgrade_tasks,
+)
+
+
+def make_store():
+    """Create a store indexed like the upgrade sessions."""
+    return IndexedStore(
+        indexes=("status",),
+        ordered=("creationTime",),
+        record_type=UpgradeSessionRecord,
+    )
+
+
+def use_state_dir(state_dir):
+    """Keep the state files in a directory of their own."""
+    state_persistence.STATE_DIR = state_dir
+    state_persistence.UPGRADE_SESSIONS_FILE = state_dir / "upgrade_sessions.json"
+    state_persistence.UPGRADE_SESSIONS_INDEX_FILE = (
+        state_dir / "upgrade_sessions.index.json"
+    )
+    state_persistence.BACKUP_FILE = state_dir / "upgrade_sessions.backup.json"
+    state_persistence.STATE_LOG_FILE = state_dir / "upgrade_sessions.log"
+    state_persistence.SESSION_FILES_DIR = state_dir / "upgrade_sessions"
+    state_persistence.CANDIDATE_FILES_DIR = state_dir / "candidate_software"
+    state_persistence.STATE_DATABASE_FILE = state_dir / "state.db"
+
+
+def save_sessions(count, active):
+    """Save upgrade sessions, all of them completed except the active ones."""
+    tasks = create_realistic_upgrade_tasks()
+    store = make_store()
+    for i in range(count):
+        session_id = f"session_{i}"
+        store[session_id] = {
+            "id": session_id,
+            "candidate": "candidate_1",
+            "caption": "Upgrade to 5.4.0",
+            "status": (
+                UpgradeStatusEnum.IN_PROGRESS
+                if i < active
+                else UpgradeStatusEnum.COMPLETED
+            ),
+            "messages": [
+                {"timestamp": task["creationTime"], "message": task["caption"]}
+                for task in tasks[:4]
+            ],
+            "creationTime": tasks[0]["creationTime"],
+            "elapsedTime": "PT45M",
+            "percentComplete": 100,
+            "tasks": [dict(task) for task in tasks],
+        }
+    save_upgrade_sessions(store)
+
+
+def active_sessions(store):
+    """Access the sessions that have not finished, as the server does on startup."""
+    for session_id in store.keys_where_not("status", FINISHED_STATUSES):
+        store[session_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--active", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as state_dir:
+        use_state_dir(Path(state_dir))
+        start = time.perf_counter()
+        save_sessions(args.sessions, args.active)
+        size = state_persistence.UPGRADE_SESSIONS_FILE.stat().st_size
+        print(f"Upgrade sessions:          {args.sessions} ({args.active} active)")
+        print(
+            f"Saved state:               {size / 1024 / 1024:.1f} MB "
+            f"in {time.perf_counter() - start:.1f} s"
+        )
+
+        start = time.perf_counter()
+        store = make_store()
+        store.update(load_upgrade_sessions())
+        active_sessions(store)
+        full = time.perf_counter() - start
+        print(f"Loading every session:     {full * 1000:.0f} ms")
+        del store
+
+        start = time.perf_counter()
+        store = make_store()
+        load_upgrade_sessions_into(store)
+        active_sessions(store)
+        lazy = time.perf_counter() - start
+        print(f"Loading the index:         {lazy * 1000:.0f} ms ({full / lazy:.1f}x)")
+
+        keys = random.sample(list(store), min(args.reads, len(store)))
+        start = time.perf_counter()
+        for key in keys:
+            store[key]
+        read = (time.perf_counter() - start) / len(keys)
+        print(f"First access to a session: {read * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Upgrade Scheduler Benchmark
+
+Measures the per-session memory and CPU footprint of running many upgrade
+simulations concurrently on a single event loop.
+
+Usage:
+    python benchmarks/upgrade_scheduler_benchmark.py --sessions 10000 --duration 5
+"""
+
+import argparse
+import asyncio
+import logging
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from dell_unisphere_package.models.storage import (
+    candidate_software_versions,
+    upgrade_sessions,
+)
+from dell_unisphere_package.schemas.base import UpgradeStatusEnum
+from dell_unisphere_package.utils.upgrade_simulator import (
+    create_realistic_upgrade_tasks,
+    progress_engine,
+    scheduler,
+    start_upgrade_simulation,
+    stop_upgrade_simulation,
+)
+
+
+def create_sessions(count):
+    """Create upgrade sessions that share a single candidate."""
+    candidate_software_versions["candidate_bench"] = {
+        "id": "candidate_bench",
+        "version": "5.4.0",
+        "fullVersion": "Unity 5.4.0.0 (Release, Build 150)",
+        "revision": 150,
+        "releaseDate": datetime.now().isoformat(),
+        "rebootRequired": True,
+        "canPauseBeforeReboot": True,
+    }
+    for i in range(count):
+        session_id = f"bench_{i}"
+        upgrade_sessions[session_id] = {
+            "id": session_id,
+            "candidate": "candidate_bench",
+            "caption": "Benchmark upgrade",
+            "status": UpgradeStatusEnum.IN_PROGRESS,
+            "startTime": datetime.now().isoformat(),
+            "messages": [],
+            "creationTime": datetime.now().isoformat(),
+            "elapsedTime": "PT0M",
+            "percentComplete": 0,
+            "tasks": create_realistic_upgrade_tasks(),
+        }
+
+
+async def run_benchmark(session_count, duration):
+    """Start all simulations, let them run for a while and report the footprint."""
+    threads_before = threading.active_count()
+
+    create_sessions(session_count)
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    start = time.perf_counter()
+    for session_id in list(upgrade_sessions):
+        start_upgrade_simulation(session_id)
+    start_elapsed = time.perf_counter() - start
+
+    # Let every simulation reach its first progress sleep
+    await asyncio.sleep(0.5)
+    current, peak = tracemalloc.get_traced_memory()
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await asyncio.sleep(duration)
+    cpu_used = time.process_time() - cpu_start
+    wall_used = time.perf_counter() - wall_start
+
+    stats = scheduler.stats()
+    engine_stats = progress_engine.stats()
+    threads_during = threading.active_count()
+
+    for session_id in list(upgrade_sessions):
+        stop_upgrade_simulation(session_id)
+    await scheduler.shutdown()
+    tracemalloc.stop()
+
+    print(f"Sessions:                  {session_count}")
+    print(f"Scheduler stats:           {stats}")
+    print(f"Progress engine stats:     {engine_stats}")
+    print(f"Threads before/during:     {threads_before}/{threads_during}")
+    print(f"Start time:                {start_elapsed * 1000:.1f} ms")
+    print(
+        f"Simulation memory:         {(current - baseline) / 1024 / 1024:.1f} MiB "
+        f"({(current - baseline) / session_count:.0f} bytes/session, "
+        f"peak {(peak - baseline) / 1024 / 1024:.1f} MiB)"
+    )
+    print(
+        f"CPU while running:         {cpu_used / wall_used * 100:.1f}% of one core "
+        f"({cpu_used / wall_used / session_count * 1e6:.2f} us/s per session)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="Seconds to measure CPU usage"
+    )
+    args = parser.parse_args()
+
+    logging.getLogger("dell_unisphere_package").setLevel(logging.WARNING)
+    asyncio.run(run_benchmark(args.sessions, args.duration))
+
+
+if __name__ == "__main__":
+    main()
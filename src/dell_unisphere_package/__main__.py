@@ -2,14 +2,44 @@
 Entry point for running the Dell Unisphere Mock API.
 """
 
+import argparse
+import os
+
 import uvicorn
 
-from dell_unisphere_package.main import app
+from dell_unisphere_package.utils.shared_state import SHARED_STATE_ENV
 
 
 def main():
-    """Run the application using uvicorn."""
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    """Run the application using uvicorn.
+
+    With more than one worker, the workers share their state through the state
+    database, so they serve the same mock behind one port.
+    """
+    parser = argparse.ArgumentParser(description="Run the Dell Unisphere Mock API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of worker processes"
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Workers import the application themselves and inherit the environment
+        os.environ[SHARED_STATE_ENV] = "1"
+        uvicorn.run(
+            "dell_unisphere_package.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            log_level="info",
+        )
+    else:
+        # Only imported by the process serving it, so that the parent of several
+        # workers does not save a state of its own on exit
+        from dell_unisphere_package.main import app
+
+        uvicorn.run(app, host=args.host, port=args.port, log_level="info")
 
 
 if __name__ == "__main__":
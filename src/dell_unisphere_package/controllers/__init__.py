@@ -3,10 +3,16 @@
 This package contains the request/response handling logic for the API.
 """
 
-from .auth import error_response, format_response, get_current_user
+from .auth import (
+    error_response,
+    format_json_response,
+    format_response,
+    get_current_user,
+)
 
 __all__ = [
     "get_current_user",
     "format_response",
+    "format_json_response",
     "error_response",
 ]
@@ -3,11 +3,70 @@
 This module handles authentication and session management.
 """
 
-import uuid
+import base64
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, ValuesView
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+from urllib.parse import urlencode
 
 from fastapi import HTTPException, Request
+from pydantic import BaseModel
 
+from ..models.indexed_store import KeyedRecords
 from ..models.storage import sessions, users
+from ..utils.json_response import UnisphereJSONResponse
+from .projection import get_fields, project
+
+# Maximum number of Authorization header values remembered as verified
+CREDENTIAL_CACHE_SIZE = 256
+
+# Verified Authorization header values mapped to (username, user record, password).
+# An entry is only trusted while users still holds the same record and password.
+_credential_cache: "OrderedDict[str, Tuple[str, Dict[str, Any], str]]" = OrderedDict()
+# Sync dependencies run in threadpool threads, which all use the cache
+_credential_lock = threading.Lock()
+
+
+def _verify_basic_auth(auth_header: str) -> Optional[str]:
+    """Verify an HTTP Basic Authorization header.
+
+    Args:
+        auth_header: Value of the Authorization header, starting with "Basic "
+
+    Returns:
+        The authenticated username, or None if the credentials are invalid
+    """
+    with _credential_lock:
+        cached = _credential_cache.get(auth_header)
+        if cached is not None:
+            username, user, password = cached
+            if users.get(username) is user and user["password"] == password:
+                _credential_cache.move_to_end(auth_header)
+                return username
+            # The user was changed or removed since the header was verified
+            del _credential_cache[auth_header]
+
+    try:
+        # Extract username and password from Authorization header
+        auth_decoded = base64.b64decode(auth_header[6:]).decode("utf-8")
+        username, password = auth_decoded.split(":", 1)
+    except Exception:
+        return None
+
+    # Validate credentials
+    user = users.get(username)
+    if user is None or user["password"] != password:
+        return None
+
+    with _credential_lock:
+        _credential_cache[auth_header] = (username, user, password)
+        if len(_credential_cache) > CREDENTIAL_CACHE_SIZE:
+            _credential_cache.popitem(last=False)
+    return username
 
 
 # Authentication middleware
@@ -15,29 +74,25 @@ def get_current_user(request: Request):
     # First check for HTTP Basic Authentication
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Basic "):
-        # Extract username and password from Authorization header
-        import base64
-
-        try:
-            auth_decoded = base64.b64decode(auth_header[6:]).decode("utf-8")
-            username, password = auth_decoded.split(":", 1)
-
-            # Validate credentials
-            if username in users and users[username]["password"] == password:
-                # Create or update session
-                session_id = str(uuid.uuid4())
-                sessions[session_id] = {
-                    "username": username,
-                    "user_id": users[username]["id"],
-                    "roles": users[username]["roles"],
-                    "domain": users[username]["domain"],
-                }
+        username = _verify_basic_auth(auth_header)
+        if username is not None:
+            # Reuse the session of a client that authenticated before
+            client = (username, request.client.host if request.client else None)
+            session_id = sessions.find_client_session(client)
+            if session_id is None:
+                session_id = sessions.create(
+                    {
+                        "username": username,
+                        "user_id": users[username]["id"],
+                        "roles": users[username]["roles"],
+                        "domain": users[username]["domain"],
+                    },
+                    client=client,
+                )
+            request.state.login_session_id = session_id
 
-                # Return user info
-                return sessions[session_id]
-        except Exception:
-            # If any error occurs during basic auth parsing, continue to cookie check
-            pass
+            # Return user info
+            return sessions[session_id]
 
     # Then check for cookie-based authentication
     session_id = request.cookies.get("EMC-CSRF-TOKEN")
@@ -48,63 +103,231 @@ def get_current_user(request: Request):
     raise HTTPException(status_code=401, detail="Not authenticated")
 
 
+# Number of entries per page when a request does not specify per_page
+DEFAULT_PER_PAGE = 2000
+
+
+def _page_parameter(params: Mapping, name: str, default: int) -> int:
+    """Return a positive integer paging query parameter."""
+    value = params.get(name)
+    if not isinstance(value, str):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise HTTPException(
+            status_code=400, detail=f"{name} must be a positive integer"
+        )
+    return number
+
+
+def get_pagination(request: Request) -> Tuple[int, int]:
+    """Return the requested (page, per_page), defaulting to the first page."""
+    params = request.query_params
+    if not isinstance(params, Mapping):
+        params = {}
+    return (
+        _page_parameter(params, "page", 1),
+        _page_parameter(params, "per_page", DEFAULT_PER_PAGE),
+    )
+
+
+def is_compact(request: Request) -> bool:
+    """Check whether the request asks for compact=true responses.
+
+    Compact responses omit the @base, links and updated metadata of each entry.
+    """
+    params = request.query_params
+    if not isinstance(params, Mapping):
+        return False
+    compact = params.get("compact")
+    return isinstance(compact, str) and compact.lower() == "true"
+
+
 # Helper function to format API response
+@lru_cache(maxsize=256)
+def _url_prefixes(
+    scheme: str, netloc: str, base_url: str, instance_type
+) -> Tuple[str, str]:
+    """Return the collection and instance @base URLs for a resource type."""
+    origin = f"{scheme}://{netloc}{base_url}"
+    return (
+        f"{origin}/types/{instance_type}/instances",
+        f"{origin}/instances/{instance_type}",
+    )
+
+
+def _collection_query(request: Request, per_page: int) -> str:
+    """Return the query string of a collection's @base URL.
+
+    Like Unisphere, it repeats the request's query parameters other than the page
+    and ends with the page size.
+    """
+    params = request.query_params
+    if not isinstance(params, Mapping) or not params:
+        return f"?per_page={per_page}"
+
+    kept = [
+        (name, value)
+        for name, value in params.multi_items()
+        if name not in ("page", "per_page")
+    ]
+    kept.append(("per_page", per_page))
+    return "?" + urlencode(kept, safe=",")
+
+
+# Timestamp of the last formatted response, reused within the same millisecond
+_updated_cache: Tuple[int, str] = (-1, "")
+
+
+def _updated_timestamp() -> str:
+    """Return the current time formatted for the 'updated' field."""
+    global _updated_cache
+
+    now = datetime.now()
+    millisecond = int(now.timestamp() * 1000)
+    if _updated_cache[0] != millisecond:
+        _updated_cache = (
+            millisecond,
+            now.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+        )
+    return _updated_cache[1]
+
+
+def _content(item, convert, model, fields):
+    """Build the response content of a stored item."""
+    if convert is not None:
+        item = convert(item)
+    if fields is not None:
+        # Pick the requested fields without building or dumping the model
+        return project(item, fields, model)
+    if model is not None:
+        item = model(**item)
+    if isinstance(item, BaseModel):
+        # Convert Pydantic models to dictionaries
+        item = item.model_dump()
+    return item
+
+
 def format_response(
-    data, request: Request, base_url="/api", instance_type=None, instance_id=None
+    data,
+    request: Request,
+    base_url="/api",
+    instance_type=None,
+    instance_id=None,
+    convert: Optional[Callable[[Any], Any]] = None,
+    model: Optional[Type[BaseModel]] = None,
 ):
-    """Format the API response according to Dell Unisphere API standards."""
-    from datetime import datetime
+    """Format the API response according to Dell Unisphere API standards.
 
-    from pydantic import BaseModel
+    Collections are paginated according to the request's page and per_page query
+    parameters. A list or KeyedRecords is sliced, so only the items of the requested
+    page are loaded and passed to convert, and building the content of a page costs
+    the same however large the collection is.
+    When the request has a fields query parameter, only the requested (possibly
+    dotted) fields are picked out of each item, and with compact=true the entries
+    only hold their content.
 
-    current_time = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    Args:
+        data: Item or collection of items (a list, dict values or KeyedRecords)
+            to return
+        request: The request being answered
+        base_url: Path prefix of the API
+        instance_type: Resource type of the items
+        instance_id: ID of the item, for single instance responses
+        convert: Optional function turning a stored item into response content
+        model: Optional model the stored items, which are dicts, are validated with
+    """
+    is_collection = isinstance(data, (list, ValuesView, KeyedRecords))
+    if not is_collection and not instance_id:
+        return data
 
-    # Convert Pydantic models to dictionaries
-    def convert_model_to_dict(item):
-        if isinstance(item, BaseModel):
-            return item.model_dump()
-        return item
+    current_time = _updated_timestamp()
+    url = request.url
+    collection_base_url, instance_base_url = _url_prefixes(
+        url.scheme, url.netloc, base_url, instance_type
+    )
+    fields = get_fields(request)
+    compact = is_compact(request)
 
-    if isinstance(data, list):
+    if is_collection:
         # Collection response
-        base_url_path = f"{base_url}/types/{instance_type}/instances"
-        full_base_url = (
-            f"{request.url.scheme}://{request.url.netloc}{base_url_path}?per_page=2000"
-        )
-
+        page, per_page = get_pagination(request)
+        first = (page - 1) * per_page
+        last = first + per_page
+        if isinstance(data, ValuesView):
+            # Values of a plain dictionary, all in memory, can only be walked
+            items = islice(data, first, last)
+        else:
+            # Only the records of the page are loaded
+            items = data[first:last]
         entries = []
-        for i, item in enumerate(data):
-            item_id = getattr(item, "id", f"{i}") if hasattr(item, "id") else f"{i}"
-            instance_base_url = f"{request.url.scheme}://{request.url.netloc}{base_url}/instances/{instance_type}"
-
-            entry = {
-                "@base": instance_base_url,
-                "content": convert_model_to_dict(item),
-                "links": [{"rel": "self", "href": f"/{item_id}"}],
-                "updated": current_time,
-            }
-            entries.append(entry)
-
-        response = {
-            "@base": full_base_url,
+        for i, item in enumerate(items, start=first):
+            content = _content(item, convert, model, fields)
+            if compact:
+                entries.append({"content": content})
+                continue
+
+            if model is not None:
+                item_id = item.get("id", i)
+            else:
+                item_id = getattr(item, "id", i)
+
+            entries.append(
+                {
+                    "@base": instance_base_url,
+                    "content": content,
+                    "links": [{"rel": "self", "href": f"/{item_id}"}],
+                    "updated": current_time,
+                }
+            )
+
+        links = [{"rel": "self", "href": f"&page={page}"}]
+        if page > 1:
+            links.append({"rel": "prev", "href": f"&page={page - 1}"})
+        if last < len(data):
+            links.append({"rel": "next", "href": f"&page={page + 1}"})
+
+        return {
+            "@base": collection_base_url + _collection_query(request, per_page),
             "updated": current_time,
-            "links": [{"rel": "self", "href": "&page=1"}],
+            "links": links,
             "entries": entries,
         }
 
-        return response
-    else:
-        # Single instance response
-        instance_base_url = f"{request.url.scheme}://{request.url.netloc}{base_url}/instances/{instance_type}"
-        if instance_id:
-            response = {
-                "@base": instance_base_url,
-                "content": convert_model_to_dict(data),
-                "links": [{"rel": "self", "href": f"/{instance_id}"}],
-                "updated": current_time,
-            }
-            return response
-        return data
+    # Single instance response
+    content = _content(data, convert, model, fields)
+    if compact:
+        return {"content": content}
+    return {
+        "@base": instance_base_url,
+        "content": content,
+        "links": [{"rel": "self", "href": f"/{instance_id}"}],
+        "updated": current_time,
+    }
+
+
+def format_json_response(
+    data,
+    request: Request,
+    base_url="/api",
+    instance_type=None,
+    instance_id=None,
+    convert: Optional[Callable[[Any], Any]] = None,
+    model: Optional[Type[BaseModel]] = None,
+) -> UnisphereJSONResponse:
+    """Format the API response and return it encoded with the fast JSON encoder.
+
+    Returning the response directly skips FastAPI's jsonable_encoder pass, which
+    dominates the cost of large collections.
+    """
+    return UnisphereJSONResponse(
+        format_response(
+            data, request, base_url, instance_type, instance_id, convert, model
+        )
+    )
 
 
 # TODO: implement correct error codes as per API definition
@@ -0,0 +1,109 @@
+"""Field projection for Dell Unisphere API.
+
+This module implements the `fields` query parameter. The requested fields, which
+may be dotted to select nested attributes such as `tasks.status`, are parsed into
+a tree that is used to pick only those values out of stored items or models,
+without copying or dumping the rest.
+"""
+
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, Optional, Type
+
+from fastapi import Request
+from pydantic import BaseModel
+
+# Parsed fields: each requested name maps to the tree of its requested nested
+# fields, or to None when the whole value is requested
+FieldTree = Dict[str, Optional["FieldTree"]]
+
+# Marker for values that are absent from an item
+_MISSING = object()
+
+
+@lru_cache(maxsize=256)
+def parse_fields(fields: Optional[str]) -> Optional[FieldTree]:
+    """Parse a comma-separated list of possibly dotted field names.
+
+    Requesting a field as a whole takes precedence over requesting some of its
+    nested fields. Names starting with an underscore are private and ignored.
+
+    Args:
+        fields: Value of the fields query parameter, e.g. "status,tasks.status"
+
+    Returns:
+        The field tree, or None if no field is requested
+    """
+    if not fields:
+        return None
+
+    tree: FieldTree = {}
+    for field in fields.split(","):
+        names = [name.strip() for name in field.split(".")]
+        if not all(names) or any(name.startswith("_") for name in names):
+            continue
+
+        node = tree
+        for name in names[:-1]:
+            child = node.setdefault(name, {})
+            if child is None:
+                # The whole value is already requested
+                break
+            node = child
+        else:
+            node[names[-1]] = None
+    return tree or None
+
+
+def get_fields(request: Request) -> Optional[FieldTree]:
+    """Return the field tree requested by the request's fields query parameter."""
+    params = request.query_params
+    if not isinstance(params, Mapping):
+        return None
+    fields = params.get("fields")
+    return parse_fields(fields) if isinstance(fields, str) else None
+
+
+def _lookup(value: Any, name: str, model: Optional[Type[BaseModel]]) -> Any:
+    """Return a field of a model or mapping, or _MISSING if it has none."""
+    if isinstance(value, BaseModel):
+        if name in type(value).model_fields:
+            return getattr(value, name)
+        return _MISSING
+    if isinstance(value, Mapping):
+        if name in value:
+            return value[name]
+        if model is not None and name in model.model_fields:
+            return model.model_fields[name].get_default(call_default_factory=True)
+    return _MISSING
+
+
+def project(
+    value: Any, fields: Optional[FieldTree], model: Optional[Type[BaseModel]] = None
+) -> Any:
+    """Return only the requested fields of a value.
+
+    Lists are projected item by item. Requested fields a value does not have are
+    left out.
+
+    Args:
+        value: Mapping, Pydantic model or list of them
+        fields: Field tree returned by parse_fields, or None for the whole value
+        model: Optional model whose defaults fill in fields missing from a mapping
+
+    Returns:
+        A dictionary (or list of them) holding the requested fields
+    """
+    if fields is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [project(item, fields, model) for item in value]
+    if not isinstance(value, (BaseModel, Mapping)):
+        return value
+
+    projected = {}
+    for name, nested in fields.items():
+        field_value = _lookup(value, name, model)
+        if field_value is not _MISSING:
+            projected[name] = project(field_value, nested)
+    return projected
@@ -0,0 +1,344 @@
+"""Collection queries for Dell Unisphere API.
+
+This module implements the Unisphere `filter` and `orderby` query parameters, e.g.
+`filter=status eq 1 and caption lk "Upgrade%"` and `orderby=creationTime desc`.
+Conditions on fields indexed by an IndexedStore are answered from its indexes,
+so only the matching records are examined.
+"""
+
+import re
+from collections.abc import Mapping
+from enum import Enum
+from functools import lru_cache
+from typing import Any, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, Request
+
+from ..models.indexed_store import IndexedStore
+
+# Comparison operators of filter conditions
+_OPERATORS = {"eq", "ne", "lt", "le", "gt", "ge", "lk"}
+
+# Filter tokens: parentheses, double-quoted strings and words
+_TOKEN = re.compile(r'\s*(?:([()])|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+# Marker for fields an item does not have
+_MISSING = object()
+
+
+def _bad_query(message: str) -> HTTPException:
+    return HTTPException(status_code=400, detail=message)
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    """Split a filter into ("paren", "("), ("string", str) and ("word", str) tokens."""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise _bad_query(f"Invalid filter: {text}")
+        paren, string, word = match.groups()
+        if paren is not None:
+            tokens.append(("paren", paren))
+        elif string is not None:
+            tokens.append(("string", re.sub(r"\\(.)", r"\1", string)))
+        else:
+            tokens.append(("word", word))
+        position = match.end()
+    return tokens
+
+
+def _literal(kind: str, token: str) -> Any:
+    """Return the value of a filter operand."""
+    if kind == "string":
+        return token
+    lowered = token.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered == "null":
+        return None
+    for number in (int, float):
+        try:
+            return number(token)
+        except ValueError:
+            pass
+    return token
+
+
+class _Parser:
+    """Recursive descent parser of filter expressions.
+
+    Expressions are parsed into tuples: ("or", [nodes]), ("and", [nodes]),
+    ("not", node) and ("cmp", field, operator, value).
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def _peek_word(self) -> Optional[str]:
+        if self.position < len(self.tokens):
+            kind, token = self.tokens[self.position]
+            if kind == "word":
+                return token.lower()
+        return None
+
+    def _next(self) -> Tuple[str, Any]:
+        if self.position >= len(self.tokens):
+            raise _bad_query(f"Incomplete filter: {self.text}")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self._parse_or()
+        if self.position != len(self.tokens):
+            raise _bad_query(f"Invalid filter: {self.text}")
+        return node
+
+    def _parse_or(self):
+        nodes = [self._parse_and()]
+        while self._peek_word() == "or":
+            self.position += 1
+            nodes.append(self._parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def _parse_and(self):
+        nodes = [self._parse_not()]
+        while self._peek_word() == "and":
+            self.position += 1
+            nodes.append(self._parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def _parse_not(self):
+        if self._peek_word() == "not":
+            self.position += 1
+            return ("not", self._parse_not())
+        return self._parse_condition()
+
+    def _parse_condition(self):
+        kind, token = self._next()
+        if kind == "paren" and token == "(":
+            node = self._parse_or()
+            if self._next() != ("paren", ")"):
+                raise _bad_query(f"Unbalanced parentheses in filter: {self.text}")
+            return node
+        if kind != "word":
+            raise _bad_query(f"Expected a field name in filter: {self.text}")
+
+        operator_kind, operator = self._next()
+        if operator_kind != "word" or operator.lower() not in _OPERATORS:
+            raise _bad_query(f"Unknown operator in filter: {self.text}")
+        value_kind, value = self._next()
+        if value_kind == "paren":
+            raise _bad_query(f"Expected a value in filter: {self.text}")
+        return ("cmp", token, operator.lower(), _literal(value_kind, value))
+
+
+@lru_cache(maxsize=256)
+def parse_filter(text: str):
+    """Parse the value of a filter query parameter.
+
+    Raises:
+        HTTPException: If the filter is malformed
+    """
+    return _Parser(text).parse()
+
+
+@lru_cache(maxsize=256)
+def parse_orderby(text: str) -> Tuple[Tuple[str, bool], ...]:
+    """Parse the value of an orderby query parameter into (field, descending) pairs.
+
+    Raises:
+        HTTPException: If a sort direction is neither asc nor desc
+    """
+    ordering = []
+    for part in text.split(","):
+        words = part.split()
+        if not words:
+            continue
+        direction = words[1].lower() if len(words) > 1 else "asc"
+        if len(words) > 2 or direction not in ("asc", "desc"):
+            raise _bad_query(f"Invalid orderby: {text}")
+        ordering.append((words[0], direction == "desc"))
+    return tuple(ordering)
+
+
+def _field_value(item: Any, field: str) -> Any:
+    """Return a possibly dotted field of a mapping or object, or _MISSING."""
+    value = item
+    for name in field.split("."):
+        if isinstance(value, Mapping):
+            value = value.get(name, _MISSING)
+        else:
+            value = getattr(value, name, _MISSING)
+        if value is _MISSING:
+            break
+    return value
+
+
+def _like(value: Any, pattern: Any) -> bool:
+    """Match a value against a pattern using % and _ wildcards, ignoring case."""
+    if isinstance(value, Enum):
+        value = value.value
+    regex = "".join(
+        ".*" if char == "%" else "." if char == "_" else re.escape(char)
+        for char in str(pattern)
+    )
+    return re.fullmatch(regex, str(value), re.IGNORECASE | re.DOTALL) is not None
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    if value is _MISSING:
+        return operator == "ne"
+    try:
+        if operator == "eq":
+            return value == operand
+        if operator == "ne":
+            return value != operand
+        if operator == "lk":
+            return _like(value, operand)
+        if value is None or operand is None:
+            return False
+        if operator == "lt":
+            return value < operand
+        if operator == "le":
+            return value <= operand
+        if operator == "gt":
+            return value > operand
+        return value >= operand
+    except TypeError:
+        # Values of different types never satisfy an ordering comparison
+        return False
+
+
+def matches(item: Any, node) -> bool:
+    """Check whether an item satisfies a parsed filter."""
+    kind = node[0]
+    if kind == "cmp":
+        _, field, operator, operand = node
+        return _compare(_field_value(item, field), operator, operand)
+    if kind == "and":
+        return all(matches(item, child) for child in node[1])
+    if kind == "or":
+        return any(matches(item, child) for child in node[1])
+    return not matches(item, node[1])
+
+
+def _indexed_keys(store: IndexedStore, node) -> Optional[Set[str]]:
+    """Return a superset of the keys matching a filter from the store's indexes.
+
+    Returns None if the filter cannot be answered from the indexes.
+    """
+    kind = node[0]
+    if kind == "cmp":
+        _, field, operator, operand = node
+        if operator == "eq" and field in store.indexed_fields:
+            return store.keys_where(field, operand)
+        return None
+    if kind == "and":
+        candidates = None
+        for child in node[1]:
+            keys = _indexed_keys(store, child)
+            if keys is not None:
+                candidates = keys if candidates is None else candidates & keys
+        return candidates
+    if kind == "or":
+        candidates = set()
+        for child in node[1]:
+            keys = _indexed_keys(store, child)
+            if keys is None:
+                return None
+            candidates |= keys
+        return candidates
+    return None
+
+
+def _sort_key(field: str, descending: bool, as_text: bool = False):
+    """Return the sort key of a field; items without the field sort last."""
+
+    def key(item):
+        value = _field_value(item, field)
+        present = value is not _MISSING and value is not None
+        if not present:
+            value = ""
+        elif as_text:
+            value = str(value)
+        # With reverse=True, present values have to rank higher to stay first
+        return (present if descending else not present, value)
+
+    return key
+
+
+def _sort(items: List[Any], ordering: Tuple[Tuple[str, bool], ...]) -> List[Any]:
+    """Sort items by several fields, starting with the least significant."""
+    for field, descending in reversed(ordering):
+        try:
+            items.sort(key=_sort_key(field, descending), reverse=descending)
+        except TypeError:
+            # Values of mixed types are ordered by their text
+            items.sort(key=_sort_key(field, descending, True), reverse=descending)
+    return items
+
+
+def _all_items(store: Mapping):
+    """Return every item of a store; those of an IndexedStore are loaded as used."""
+    if isinstance(store, IndexedStore):
+        return store.records()
+    return store.values()
+
+
+def query_collection(store: Mapping, request: Request):
+    """Select and order the items of a store by the request's filter and orderby.
+
+    Without a filter, the items of an IndexedStore are returned as KeyedRecords,
+    so only the records of the requested page are loaded.
+
+    Args:
+        store: The stored items, keyed by ID
+        request: The request being answered
+
+    Returns:
+        The store's items if neither parameter is given, else a sequence of items
+
+    Raises:
+        HTTPException: If the filter or orderby parameter is malformed
+    """
+    params = request.query_params
+    if not isinstance(params, Mapping):
+        return _all_items(store)
+    filter_text = params.get("filter")
+    orderby_text = params.get("orderby")
+    if not filter_text and not orderby_text:
+        return _all_items(store)
+
+    node = parse_filter(filter_text) if filter_text else None
+    ordering = parse_orderby(orderby_text) if orderby_text else ()
+    indexed = isinstance(store, IndexedStore)
+
+    keys = None
+    if node is not None and indexed:
+        keys = _indexed_keys(store, node)
+
+    if (
+        keys is None
+        and indexed
+        and len(ordering) == 1
+        and ordering[0][0] in store.ordered_fields
+    ):
+        # Walk the ordered index instead of sorting every item
+        if node is None:
+            return store.records(store.keys_ordered_by(*ordering[0]))
+        items = (store[key] for key in store.keys_ordered_by(*ordering[0]))
+        return [item for item in items if node is None or matches(item, node)]
+
+    if keys is not None:
+        items = [store[key] for key in store.in_insertion_order(keys)]
+    else:
+        items = list(store.values())
+    if node is not None:
+        items = [item for item in items if matches(item, node)]
+    return _sort(items, ordering)
@@ -20,6 +20,7 @@ from .middleware import (
     CSRFProtectionMiddleware,
     RebootSimulatorMiddleware,
     RequiredHeadersMiddleware,
+    SharedStateMiddleware,
 )
 from .routes import router
 
@@ -178,6 +179,8 @@ app.add_middleware(
 # 1. Required headers middleware (runs first)
 # 2. CSRF protection middleware (runs second)
 # 3. Reboot simulator middleware (runs last)
+# The shared state middleware wraps them all, so every request sees the state
+# changed by the other server processes
 
 # Add required headers middleware
 app.add_middleware(
@@ -203,6 +206,9 @@ app.add_middleware(
     reset_probability=1.0,  # Always reset during reboot task
 )
 
+# Add shared state middleware
+app.add_middleware(SharedStateMiddleware)
+
 # Include API routes
 app.include_router(router)
 
@@ -215,96 +221,154 @@ async def startup_event():
 
     # Load all state
     import asyncio
+    from contextlib import nullcontext
+
+    from .models.storage import (
+        candidate_software_versions,
+        sessions,
+        system_config,
+        upgrade_sessions,
+        uploaded_files,
+    )
+    from .schemas.base import UpgradeStatusEnum
+    from .utils.lazy_progress import is_lazy, running_lazy_sessions
+    from .utils.shared_state import (
+        last_shared_change,
+        shared_state_enabled,
+        start_shared_state,
+        startup_lock,
+    )
+    from .utils.state_persistence import (
+        SESSION_FILES_DIR,
+        STATE_DATABASE_FILE,
+        enable_state_database,
+        enable_state_files,
+        enable_state_log,
+        get_state_database,
+        load_candidate_software,
+        load_upgrade_sessions_into,
+        start_state_writer,
+    )
+    from .utils.upgrade_simulator import (
+        active_session_ids,
+        running_task_sessions,
+        session_speed_factors,
+        start_upgrade_simulation,
+        track_running_tasks,
+    )
 
-    from .models.storage import candidate_software_versions, upgrade_sessions
-    from .schemas.base import TaskStatusEnum, UpgradeStatusEnum
-    from .utils.state_persistence import load_state
-    from .utils.upgrade_simulator import start_upgrade_simulation
+    # Processes sharing their state load it one at a time, and the first one moves
+    # it to the state database
+    shared = shared_state_enabled()
+    with startup_lock() if shared else nullcontext():
+        since = last_shared_change() if shared else 0
 
-    saved_sessions, saved_candidates = load_state()
+        # State saved one file per record or in the state database keeps being saved
+        # that way, and shared state is saved in the state database
+        if shared or STATE_DATABASE_FILE.exists():
+            system_config["persistence_mode"] = "sqlite"
+        elif SESSION_FILES_DIR.is_dir():
+            system_config["persistence_mode"] = "files"
 
-    # Update candidate software versions first (needed for upgrade sessions)
-    if saved_candidates:
-        candidate_software_versions.update(saved_candidates)
-        logger.info(
-            f"Loaded {len(saved_candidates)} candidate software versions from disk"
-        )
+        saved_candidates = load_candidate_software()
 
-    # Then update upgrade sessions
-    if saved_sessions:
-        # Update the in-memory upgrade_sessions with the loaded data
-        upgrade_sessions.update(saved_sessions)
-        logger.info(f"Loaded {len(saved_sessions)} upgrade sessions from disk")
-
-        # Restart upgrade simulations for in-progress sessions
-        in_progress_sessions = []
-
-        for session_id, session in saved_sessions.items():
-            session_status = session.get("status")
-
-            # Handle different representations of the status
-            if isinstance(session_status, dict) and "_value_" in session_status:
-                session_status = session_status["_value_"]
-            elif hasattr(session_status, "_value_"):
-                session_status = session_status._value_
-
-            # Check if session is in progress or has an in-progress task
-            if session_status == UpgradeStatusEnum.IN_PROGRESS or session_status == 1:
-                # Check if any task is in progress
-                has_in_progress_task = False
-                for task in session.get("tasks", []):
-                    task_status = (
-                        task.get("status")
-                        if isinstance(task, dict)
-                        else getattr(task, "status", None)
-                    )
-
-                    # Handle different representations of the status
-                    if isinstance(task_status, dict) and "_value_" in task_status:
-                        task_status = task_status["_value_"]
-                    elif hasattr(task_status, "_value_"):
-                        task_status = task_status._value_
-
-                    if task_status == TaskStatusEnum.IN_PROGRESS or task_status == 1:
-                        has_in_progress_task = True
-                        break
-
-                if has_in_progress_task:
-                    in_progress_sessions.append(session_id)
-
-        if in_progress_sessions:
+        # Update candidate software versions first (needed for upgrade sessions)
+        if saved_candidates:
+            candidate_software_versions.update(saved_candidates)
             logger.info(
-                f"Found {len(in_progress_sessions)} in-progress upgrade sessions to restart"
+                f"Loaded {len(saved_candidates)} candidate software versions from disk"
             )
 
-            # Schedule the restart of upgrade simulations after a short delay
-            # to ensure the server is fully started
-            async def restart_simulations():
-                await asyncio.sleep(2)  # Wait for 2 seconds to ensure server is ready
-                for session_id in in_progress_sessions:
-                    logger.info(
-                        f"Restarting upgrade simulation for session {session_id}"
-                    )
-                    try:
-                        # Start the upgrade simulation in the background
-                        start_upgrade_simulation(session_id)
-                    except Exception as e:
-                        logger.error(
-                            f"Failed to restart upgrade simulation for session {session_id}: {e}"
+        # Then load upgrade sessions. With an up-to-date index, only the index is read
+        # now; each session is read from disk when it is first accessed.
+        if load_upgrade_sessions_into(upgrade_sessions):
+            logger.info(f"Loaded {len(upgrade_sessions)} upgrade sessions from disk")
+
+            # Register the tasks that were running when the state was saved. Only
+            # sessions that have not finished can have running tasks, and they are
+            # found through the status index without visiting (or reading) the
+            # upgrade history.
+            for session_id in active_session_ids():
+                track_running_tasks(session_id)
+                if is_lazy(upgrade_sessions[session_id]):
+                    running_lazy_sessions.add(session_id)
+
+            # Restart upgrade simulations for in-progress sessions with a task in progress
+            sessions_with_running_task = set().union(*running_task_sessions.values())
+            in_progress_sessions = [
+                session_id
+                for session_id in upgrade_sessions.in_insertion_order(
+                    upgrade_sessions.keys_where("status", UpgradeStatusEnum.IN_PROGRESS)
+                )
+                if session_id in sessions_with_running_task
+            ]
+
+            # Processes sharing their state leave this to the elected leader
+            if in_progress_sessions and not shared:
+                logger.info(
+                    f"Found {len(in_progress_sessions)} in-progress upgrade sessions to restart"
+                )
+
+                # Schedule the restart of upgrade simulations after a short delay
+                # to ensure the server is fully started
+                async def restart_simulations():
+                    # Wait for 2 seconds to ensure server is ready
+                    await asyncio.sleep(2)
+                    for session_id in in_progress_sessions:
+                        logger.info(
+                            f"Restarting upgrade simulation for session {session_id}"
                         )
+                        try:
+                            # Start the upgrade simulation in the background
+                            start_upgrade_simulation(session_id)
+                        except Exception as e:
+                            logger.error(
+                                f"Failed to restart upgrade simulation for session {session_id}: {e}"
+                            )
+
+                # Schedule the restart task
+                asyncio.create_task(restart_simulations())
+
+        # Log changes from now on if configured to; this saves a snapshot of the loaded state
+        if system_config.get("persistence_mode") == "log":
+            enable_state_log(upgrade_sessions)
+        elif system_config.get("persistence_mode") == "files":
+            enable_state_files(upgrade_sessions, candidate_software_versions)
+        elif system_config.get("persistence_mode") == "sqlite":
+            enable_state_database(upgrade_sessions, candidate_software_versions)
+
+        if shared:
+            start_shared_state(
+                get_state_database(upgrade_sessions),
+                sessions,
+                {
+                    "system_config": system_config,
+                    "uploaded_files": uploaded_files,
+                    "session_speed_factors": session_speed_factors,
+                },
+                since,
+            )
 
-            # Schedule the restart task
-            asyncio.create_task(restart_simulations())
+    # Save further changes in the background as they happen
+    start_state_writer(upgrade_sessions, candidate_software_versions)
 
 
 # Save state on shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Save state on shutdown."""
-    logger.info("Saving state on shutdown")
+    """Stop running simulations and save state on shutdown."""
     from .models.storage import candidate_software_versions, upgrade_sessions
-    from .utils.state_persistence import save_state
+    from .utils.shared_state import stop_shared_state
+    from .utils.state_persistence import save_state, stop_state_writer
+    from .utils.upgrade_simulator import scheduler
 
+    # Cancelled sessions keep their in-progress status so they resume on restart,
+    # or in another process sharing the state
+    await stop_shared_state()
+    await scheduler.shutdown()
+    stop_state_writer(upgrade_sessions)
+
+    logger.info("Saving state on shutdown")
     save_state(upgrade_sessions, candidate_software_versions)
 
 
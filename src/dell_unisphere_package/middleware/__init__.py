@@ -3,9 +3,11 @@
 from .csrf import CSRFProtectionMiddleware
 from .headers import RequiredHeadersMiddleware
 from .reboot_simulator import RebootSimulatorMiddleware
+from .shared_state import SharedStateMiddleware
 
 __all__ = [
     "CSRFProtectionMiddleware",
     "RequiredHeadersMiddleware",
     "RebootSimulatorMiddleware",
+    "SharedStateMiddleware",
 ]
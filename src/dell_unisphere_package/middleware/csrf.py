@@ -5,22 +5,22 @@ This module provides middleware to verify CSRF tokens for POST and DELETE reques
 
 import logging
 import re
-from typing import Callable
 
-from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 
-class CSRFProtectionMiddleware(BaseHTTPMiddleware):
+class CSRFProtectionMiddleware:
     """Middleware that verifies CSRF tokens for POST and DELETE requests.
 
     This middleware checks for the presence of a CSRF token in the request headers
-    or body for POST and DELETE requests to protected endpoints.
+    or body for POST and DELETE requests to protected endpoints. It is a plain ASGI
+    middleware; the body is only buffered (and replayed to the application) when
+    the token is not found in the headers.
     """
 
     def __init__(
@@ -34,7 +34,7 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
             app: The ASGI application
             excluded_paths: List of paths to exclude from CSRF protection
         """
-        super().__init__(app)
+        self.app = app
         self.excluded_paths = excluded_paths or [
             "/api/types/loginSessionInfo/instances",
             "/upload/files/types/candidateSoftwareVersion",
@@ -42,59 +42,90 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
         ]
         logger.info("Initialized CSRFProtectionMiddleware")
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process the request and verify CSRF token if needed.
 
         Args:
-            request: The incoming request
-            call_next: The next middleware or route handler
+            scope: The ASGI connection scope
+            receive: The ASGI receive channel
+            send: The ASGI send channel
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        method = scope["method"]
+
+        # Only check POST and DELETE requests to API endpoints that are not excluded
+        if (
+            method not in ["POST", "DELETE"]
+            or not (path.startswith("/api") or path.startswith("/upload"))
+            or path in self.excluded_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # Check for CSRF token in headers
+        csrf_token = Headers(scope=scope).get("EMC-CSRF-TOKEN")
+
+        # For test scripts, handle the case where the token might be in the request body
+        if not csrf_token:
+            try:
+                # Read the body and replay it to the application afterwards
+                body_bytes, receive = await self._buffer_body(receive)
+                body_text = body_bytes.decode()
+
+                # Try to extract the token from the body if it's passed as a header in the data parameter
+                if "EMC-CSRF-TOKEN" in body_text:
+                    token_match = re.search(r"EMC-CSRF-TOKEN:\s*([\w-]+)", body_text)
+                    if token_match:
+                        # We found a token in the body, so we'll use it
+                        csrf_token = token_match.group(1)
+                        logger.debug(f"Found CSRF token in request body: {csrf_token}")
+            except Exception as e:
+                logger.warning(f"Error reading request body for CSRF token: {e}")
+
+        # If we still don't have a token, return an error
+        if not csrf_token:
+            logger.warning(f"Missing CSRF token for {method} request to {path}")
+            response = JSONResponse(
+                status_code=403,
+                content={"error": "Missing CSRF token in header or body"},
+            )
+            await response(scope, receive, send)
+            return
+
+        # If we get here, the request has a valid token
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _buffer_body(receive: Receive):
+        """Read the complete request body.
+
+        Args:
+            receive: The ASGI receive channel
 
         Returns:
-            The response from the next middleware or route handler
+            A tuple of the body and a receive channel that replays it
         """
-        # Only check POST and DELETE requests to API endpoints
-        if request.method in ["POST", "DELETE"] and (
-            request.url.path.startswith("/api")
-            or request.url.path.startswith("/upload")
-        ):
-            # Skip CSRF check for excluded paths
-            for path in self.excluded_paths:
-                if request.url.path == path:
-                    return await call_next(request)
-
-            # Check for CSRF token in headers
-            csrf_token = request.headers.get("EMC-CSRF-TOKEN")
-
-            # For test scripts, handle the case where the token might be in the request body
-            if not csrf_token:
-                try:
-                    # Check if we can read the body
-                    body_bytes = await request.body()
-                    body_text = body_bytes.decode()
-
-                    # Try to extract the token from the body if it's passed as a header in the data parameter
-                    if "EMC-CSRF-TOKEN" in body_text:
-                        token_match = re.search(
-                            r"EMC-CSRF-TOKEN:\s*([\w-]+)", body_text
-                        )
-                        if token_match:
-                            # We found a token in the body, so we'll use it
-                            csrf_token = token_match.group(1)
-                            logger.debug(
-                                f"Found CSRF token in request body: {csrf_token}"
-                            )
-                except Exception as e:
-                    logger.warning(f"Error reading request body for CSRF token: {e}")
-
-            # If we still don't have a token, return an error
-            if not csrf_token:
-                logger.warning(
-                    f"Missing CSRF token for {request.method} request to {request.url.path}"
-                )
-                return JSONResponse(
-                    status_code=403,
-                    content={"error": "Missing CSRF token in header or body"},
-                )
-
-        # If we get here, either the request doesn't need CSRF protection or it has a valid token
-        return await call_next(request)
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return body, replay
@@ -4,22 +4,22 @@ This module provides middleware to verify required headers for API requests.
 """
 
 import logging
-from typing import Callable, Dict, List
+from typing import Dict, List
 
-from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 
-class RequiredHeadersMiddleware(BaseHTTPMiddleware):
+class RequiredHeadersMiddleware:
     """Middleware that verifies required headers for API requests.
 
     This middleware checks for the presence of required headers for API requests,
-    such as the X-EMC-REST-CLIENT header.
+    such as the X-EMC-REST-CLIENT header. It is a plain ASGI middleware, so
+    requests that pass the check go straight to the application.
     """
 
     def __init__(
@@ -35,42 +35,43 @@ class RequiredHeadersMiddleware(BaseHTTPMiddleware):
             required_headers: Dictionary of required headers and their values
             protected_paths: List of path prefixes that require the headers
         """
-        super().__init__(app)
+        self.app = app
         self.required_headers = required_headers or {"X-EMC-REST-CLIENT": "true"}
         self.protected_paths = protected_paths or ["/api", "/upload"]
         logger.info("Initialized RequiredHeadersMiddleware")
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process the request and verify required headers if needed.
 
         Args:
-            request: The incoming request
-            call_next: The next middleware or route handler
-
-        Returns:
-            The response from the next middleware or route handler
+            scope: The ASGI connection scope
+            receive: The ASGI receive channel
+            send: The ASGI send channel
         """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Check if the request path is protected
-        is_protected = any(
-            request.url.path.startswith(path) for path in self.protected_paths
-        )
+        path = scope["path"]
+        is_protected = any(path.startswith(prefix) for prefix in self.protected_paths)
 
         if is_protected:
             # Check for required headers
+            headers = Headers(scope=scope)
             for header_name, header_value in self.required_headers.items():
-                if (
-                    header_name not in request.headers
-                    or request.headers[header_name] != header_value
-                ):
+                if headers.get(header_name) != header_value:
                     logger.warning(
-                        f"Missing or invalid required header {header_name} for request to {request.url.path}"
+                        f"Missing or invalid required header {header_name} for request to {path}"
                     )
-                    return JSONResponse(
+                    response = JSONResponse(
                         status_code=401,
                         content={
                             "error": f"Missing or invalid required header: {header_name}"
                         },
                     )
+                    await response(scope, receive, send)
+                    return
 
         # If we get here, either the request doesn't need header verification or it has all required headers
-        return await call_next(request)
+        await self.app(scope, receive, send)
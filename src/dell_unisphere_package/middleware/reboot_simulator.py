@@ -5,26 +5,28 @@ during the system reboot phase of an upgrade process.
 """
 
 import logging
-from typing import Callable
+from typing import Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from fastapi import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from ..models.storage import upgrade_sessions
-from ..schemas.base import TaskStatusEnum
+from ..utils.lazy_progress import refresh_running_sessions
+from ..utils.upgrade_simulator import find_session_running_task
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 
-class RebootSimulatorMiddleware(BaseHTTPMiddleware):
+class RebootSimulatorMiddleware:
     """Middleware that simulates connection resets during system reboot.
 
     This middleware checks if any upgrade session has a task with the caption
     "Rebooting the primary SP" that is currently in progress. If such a task
     is found, the middleware will close the connection to simulate a real
     system reboot.
+
+    The state is saved once when a reboot begins, not on every reset request.
     """
 
     def __init__(
@@ -40,11 +42,13 @@ class RebootSimulatorMiddleware(BaseHTTPMiddleware):
             reboot_task_caption: The caption of the task that triggers the connection reset
             reset_probability: Probability of resetting the connection (0.0 to 1.0)
         """
-        super().__init__(app)
+        self.app = app
         self.reboot_task_caption = reboot_task_caption
         self.reset_probability = min(
             max(reset_probability, 0.0), 1.0
         )  # Ensure between 0 and 1
+        # Session whose reboot the state was last saved for
+        self._saved_reboot_session: Optional[str] = None
         self.excluded_paths = [
             "/docs",
             "/openapi.json",
@@ -55,53 +59,49 @@ class RebootSimulatorMiddleware(BaseHTTPMiddleware):
             f"Initialized RebootSimulatorMiddleware with reboot task caption: {reboot_task_caption}"
         )
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process the request and simulate connection resets if needed.
 
         Args:
-            request: The incoming request
-            call_next: The next middleware or route handler
-
-        Returns:
-            The response from the next middleware or route handler
+            scope: The ASGI connection scope
+            receive: The ASGI receive channel
+            send: The ASGI send channel
         """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Skip middleware for excluded paths
-        for path in self.excluded_paths:
-            if request.url.path.startswith(path):
-                return await call_next(request)
+        path = scope["path"]
+        for excluded_path in self.excluded_paths:
+            if path.startswith(excluded_path):
+                await self.app(scope, receive, send)
+                return
 
         # Check if any session has the reboot task in progress
         should_reset = self._check_for_reboot_task()
 
         if should_reset:
             # Log the connection reset
-            client_host = request.client.host if request.client else "unknown"
+            client = scope.get("client")
+            client_host = client[0] if client else "unknown"
             logger.info(
                 f"Simulating connection reset for {client_host} during system reboot"
             )
 
-            # Save the current state before simulating the connection reset
-            # This ensures we can recover the state when the server restarts
-            try:
-                from ..models.storage import candidate_software_versions
-                from ..utils.state_persistence import save_state
-
-                logger.info("Saving state before simulating reboot")
-                save_state(upgrade_sessions, candidate_software_versions)
-            except Exception as e:
-                logger.error(f"Failed to save state before reboot: {e}")
-
             # Return a response that will cause a connection reset
             # This is done by returning a response with an invalid status code
             # that will cause the server to close the connection
-            return Response(
+            response = Response(
                 content="Connection reset by peer",
                 status_code=444,  # Nginx's "Connection Closed Without Response" code
                 headers={"Connection": "close"},
             )
+            await response(scope, receive, send)
+            return
 
         # If no reset is needed, proceed with the normal request
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
     def _check_for_reboot_task(self) -> bool:
         """Check if any upgrade session has the reboot task in progress.
@@ -111,45 +111,42 @@ class RebootSimulatorMiddleware(BaseHTTPMiddleware):
         """
         import random
 
-        # First check if we should apply the probability filter
+        # Sessions in lazy progress mode only update their tasks when read
+        refresh_running_sessions()
+
+        # The simulator keeps track of the sessions running each task
+        session_id = find_session_running_task(self.reboot_task_caption)
+        if session_id != self._saved_reboot_session:
+            self._saved_reboot_session = session_id
+            if session_id is not None:
+                logger.info(
+                    f"Found active reboot task in session {session_id}: {self.reboot_task_caption}"
+                )
+                self._save_state_before_reboot()
+
+        if session_id is None:
+            return False
+
+        # Apply the probability filter
         if self.reset_probability < 1.0 and random.random() > self.reset_probability:
             return False
 
-        # Check all active upgrade sessions
-        for session_id, session in upgrade_sessions.items():
-            # Skip sessions that don't have tasks
-            if "tasks" not in session:
-                continue
-
-            # Check each task in the session
-            for task in session["tasks"]:
-                # Handle different task representations (dict, Pydantic model, or enum values)
-                if isinstance(task, dict):
-                    task_caption = task.get("caption")
-                    task_status = task.get("status")
-
-                    # Handle case where status is a dict with _value_ (serialized enum)
-                    if isinstance(task_status, dict) and "_value_" in task_status:
-                        task_status = task_status["_value_"]
-                    # Handle case where status is already an enum
-                    elif hasattr(task_status, "_value_"):
-                        task_status = task_status._value_
-                else:
-                    # Access attributes directly for Pydantic models
-                    task_caption = task.caption
-                    task_status = task.status
-
-                    # Handle case where status is an enum
-                    if hasattr(task_status, "_value_"):
-                        task_status = task_status._value_
-
-                # Compare with enum value directly (1 = IN_PROGRESS)
-                if task_caption == self.reboot_task_caption and (
-                    task_status == TaskStatusEnum.IN_PROGRESS or task_status == 1
-                ):
-                    logger.info(
-                        f"Found active reboot task in session {session_id}: {task_caption}"
-                    )
-                    return True
-
-        return False
+        return True
+
+    def _save_state_before_reboot(self):
+        """Save the current state when a reboot begins.
+
+        This ensures we can recover the state when the server restarts. It runs once
+        per reboot, so clients retrying during the reboot do not cause disk I/O.
+        When the background state writer runs, it is asked to write the pending
+        changes instead, off the request path.
+        """
+        try:
+            from ..models.storage import candidate_software_versions
+            from ..utils.state_persistence import request_state_flush, save_state
+
+            logger.info("Saving state before simulating reboot")
+            if not request_state_flush():
+                save_state(upgrade_sessions, candidate_software_versions)
+        except Exception as e:
+            logger.error(f"Failed to save state before reboot: {e}")
@@ -0,0 +1,64 @@
+"""Shared state middleware for Dell Unisphere API.
+
+This module provides middleware keeping the state of a server process in step
+with the other processes it shares the state with (see utils/shared_state.py).
+"""
+
+import logging
+
+import anyio
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.shared_state import get_shared_state
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class SharedStateMiddleware:
+    """Middleware reading the state other processes changed before each request
+    and saving the changes of the request before its response is sent.
+
+    It does nothing unless the state is shared, and it is a plain ASGI
+    middleware, so requests go straight to the application. The database is used
+    in worker threads, so a process holding it locked does not stall the event
+    loop, and a request is still handled when it cannot be read.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """Initialize the middleware.
+
+        Args:
+            app: The ASGI application
+        """
+        self.app = app
+        logger.info("Initialized SharedStateMiddleware")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Process the request between a refresh and a publication of the state.
+
+        Args:
+            scope: The ASGI connection scope
+            receive: The ASGI receive channel
+            send: The ASGI send channel
+        """
+        shared_state = get_shared_state()
+        if scope["type"] != "http" or shared_state is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await shared_state.refresh_in_thread()
+        except Exception as e:
+            logger.error(f"Failed to read the shared state: {e}")
+
+        async def send_published(message: Message):
+            # A client's next request may reach another process
+            if message["type"] == "http.response.start":
+                try:
+                    await anyio.to_thread.run_sync(shared_state.publish)
+                except Exception as e:
+                    logger.error(f"Failed to save the shared state: {e}")
+            await send(message)
+
+        await self.app(scope, receive, send_published)
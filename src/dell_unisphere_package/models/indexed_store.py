@@ -0,0 +1,572 @@
+"""Indexed in-memory store for Dell Unisphere API.
+
+This module provides a dictionary of records that keeps secondary indexes on some
+of their fields, so collections can be filtered and ordered by those fields
+without scanning every record. Records are dictionaries that report changes of
+indexed fields to their store, so indexes stay current however a record is
+updated. A store can also have a journal, which is told about every write, e.g.
+to persist changes as they happen.
+
+Records can also be added unloaded, with only the values of their indexed fields:
+their data is read by the store's loader when they are first accessed, so a large
+saved state can be served without reading all of it first.
+
+Collections are served from records(), which lists the keys of the records and
+loads only the records a page shows.
+
+Records written elsewhere, such as by another server process sharing the state,
+are stored with merge() and removed with discard(), which do not tell the journal.
+"""
+
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+
+# Marker for fields a record does not have
+_MISSING = object()
+
+# Value stored for the keys of records that have not been loaded yet
+_UNLOADED = object()
+
+
+def _sort_value(value: Any) -> Any:
+    """Return the value an ordered index sorts a field value by."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class Record(dict):
+    """Dictionary stored in an IndexedStore.
+
+    Writes to indexed fields are reported to the store holding the record, and
+    every write is reported to the store's journal if it has one. Storing a value
+    equal to the current one is not journaled.
+    """
+
+    # Store holding the record and the record's key in it
+    _store = None
+    _key = None
+
+    def _journal(self):
+        return None if self._store is None else self._store.journal
+
+    def _indexed_values(self) -> Dict[str, Any]:
+        return {field: self.get(field, _MISSING) for field in self._store.fields}
+
+    def _changed(self, before: Dict[str, Any]):
+        for field, old in before.items():
+            self._store._reindex(self._key, field, old, self.get(field, _MISSING))
+
+    def changed(self, name):
+        """Report a value that was changed in place, such as a list appended to."""
+        journal = self._journal()
+        if journal is not None:
+            journal.set(self._key, name, self[name])
+
+    def __setitem__(self, name, value):
+        store = self._store
+        if store is None or (name not in store.fields and store.journal is None):
+            super().__setitem__(name, value)
+            return
+
+        old = self.get(name, _MISSING)
+        super().__setitem__(name, value)
+        if name in store.fields:
+            store._reindex(self._key, name, old, value)
+        if store.journal is not None and (old is _MISSING or old != value):
+            store.journal.set(self._key, name, value)
+
+    def __delitem__(self, name):
+        store = self._store
+        if store is None or (name not in store.fields and store.journal is None):
+            super().__delitem__(name)
+            return
+
+        old = self[name]
+        super().__delitem__(name)
+        if name in store.fields:
+            store._reindex(self._key, name, old, _MISSING)
+        if store.journal is not None:
+            store.journal.unset(self._key, name)
+
+    def pop(self, name, *default):
+        store = self._store
+        if store is None or (name not in store.fields and store.journal is None):
+            return super().pop(name, *default)
+
+        old = self.get(name, _MISSING)
+        value = super().pop(name, *default)
+        if name in store.fields:
+            store._reindex(self._key, name, old, _MISSING)
+        if store.journal is not None and old is not _MISSING:
+            store.journal.unset(self._key, name)
+        return value
+
+    def popitem(self):
+        if self._store is None:
+            return super().popitem()
+
+        before = self._indexed_values()
+        item = super().popitem()
+        self._changed(before)
+        if self._store.journal is not None:
+            self._store.journal.unset(self._key, item[0])
+        return item
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        if self._store is None:
+            super().update(*args, **kwargs)
+            return
+
+        before = self._indexed_values()
+        changes = dict(*args, **kwargs)
+        super().update(changes)
+        self._changed(before)
+        if self._store.journal is not None:
+            for name, value in changes.items():
+                self._store.journal.set(self._key, name, value)
+
+    def clear(self):
+        if self._store is None:
+            super().clear()
+            return
+
+        before = self._indexed_values()
+        super().clear()
+        self._changed(before)
+        if self._store.journal is not None:
+            self._store.journal.put(self._key, self)
+
+
+class KeyedRecords(Sequence):
+    """Records listed by their keys and loaded only when accessed.
+
+    Slicing it loads the records in the slice only, so a page of a collection
+    costs the same however many records the collection has. Records removed
+    after the keys were listed are skipped.
+    """
+
+    def __init__(self, keys: List[str], load: Callable[[str], Optional[Record]]):
+        """Initialize the sequence.
+
+        Args:
+            keys: Keys of the records, in order
+            load: Function returning the record of a key, or None if it was removed
+        """
+        self.keys = keys
+        self.load = load
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            records = (self.load(key) for key in self.keys[index])
+            return [record for record in records if record is not None]
+        return self.load(self.keys[index])
+
+    def __iter__(self) -> Iterator[Record]:
+        for key in self.keys:
+            record = self.load(key)
+            if record is not None:
+                yield record
+
+
+class IndexedStore(dict):
+    """Dictionary of records with secondary indexes on some of their fields.
+
+    Stored dictionaries are copied into Records (or instances of a given Record
+    subclass). Hash indexes map each value of a
+    field to the keys of the records having it, and ordered indexes keep the keys
+    sorted by the value of a field.
+
+    Unloaded records are loaded on access through the store (e.g. store[key],
+    get(), values() or copy()); repr() shows them as unloaded without reading them.
+    """
+
+    def __init__(
+        self,
+        indexes: Iterable[str] = (),
+        ordered: Iterable[str] = (),
+        record_type: Type[Record] = Record,
+    ):
+        """Initialize the store.
+
+        Args:
+            indexes: Fields looked up by value
+            ordered: Fields records are ordered by
+            record_type: Record subclass stored dictionaries are copied into
+        """
+        super().__init__()
+        self.record_type = record_type
+        self._hashed: Dict[str, Dict[Hashable, Set[str]]] = {
+            field: {} for field in indexes
+        }
+        self._ordered: Dict[str, List[Tuple[Any, str]]] = {
+            field: [] for field in ordered
+        }
+        # Keys of the records missing a hash indexed field, or whose value of it
+        # is unhashable
+        self._unindexed: Dict[str, Set[str]] = {field: set() for field in indexes}
+        # Object told about every write: put(key, record), set(key, field, value),
+        # unset(key, field), delete(key) and clear()
+        self.journal = None
+        # Object whose load(key) returns the data of a record added unloaded
+        self.loader = None
+        # Indexed values of the records that have not been loaded yet
+        self._unloaded: Dict[str, Record] = {}
+        self.indexed_fields = frozenset(self._hashed)
+        self.ordered_fields = frozenset(self._ordered)
+        self.fields = self.indexed_fields | self.ordered_fields
+        # Insertion sequence numbers, giving the dictionary order of any keys
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+
+    def _index(self, key: str, field: str, value: Any):
+        if field in self._hashed:
+            if value is _MISSING:
+                self._unindexed[field].add(key)
+            else:
+                try:
+                    self._hashed[field].setdefault(value, set()).add(key)
+                except TypeError:
+                    # Unhashable values are not indexed
+                    self._unindexed[field].add(key)
+        if value is _MISSING:
+            return
+        if field in self._ordered and value is not None:
+            insort(self._ordered[field], (_sort_value(value), key))
+
+    def _unindex(self, key: str, field: str, value: Any):
+        if field in self._hashed:
+            self._unindexed[field].discard(key)
+            try:
+                keys = self._hashed[field].get(value)
+            except TypeError:
+                keys = None
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._hashed[field][value]
+        if value is _MISSING:
+            return
+        if field in self._ordered and value is not None:
+            entries = self._ordered[field]
+            entry = (_sort_value(value), key)
+            position = bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    def _reindex(self, key: str, field: str, old: Any, new: Any):
+        if old is new:
+            return
+        self._unindex(key, field, old)
+        self._index(key, field, new)
+
+    def _unindex_record(self, key: str, record: Record):
+        for field in self.fields:
+            self._unindex(key, field, record.get(field, _MISSING))
+        record._store = None
+
+    def _load(self, key: str) -> Record:
+        """Replace an unloaded record by a record of its data."""
+        record = self.record_type(self.loader.load(key))
+        record._store = self
+        record._key = key
+        # The record is stored before it stops being unloaded, so indexed_values()
+        # finds either of them from another thread
+        super().__setitem__(key, record)
+        indexed = self._unloaded.pop(key)
+        for field in self.fields:
+            old = indexed.get(field, _MISSING)
+            new = record.get(field, _MISSING)
+            if old != new:
+                self._reindex(key, field, old, new)
+        return record
+
+    def _detach(self, key: str) -> Record:
+        if key in self._unloaded:
+            self._load(key)
+        record = super().pop(key)
+        self._unindex_record(key, record)
+        del self._sequence[key]
+        if self.journal is not None:
+            self.journal.delete(key)
+        return record
+
+    def __setitem__(self, key: str, value: Dict[str, Any]):
+        record = self._put(key, value)
+        if self.journal is not None:
+            self.journal.put(key, record)
+
+    def _put(self, key: str, value: Dict[str, Any]) -> Record:
+        previous = super().get(key)
+        if previous is _UNLOADED:
+            # Replaced records keep their position, as in a dict
+            self._unindex_record(key, self._unloaded.pop(key))
+        elif previous is not None:
+            self._unindex_record(key, previous)
+        else:
+            self._sequence[key] = self._next_sequence
+            self._next_sequence += 1
+
+        record = self.record_type(value)
+        record._store = self
+        record._key = key
+        super().__setitem__(key, record)
+        for field in self.fields:
+            self._index(key, field, record.get(field, _MISSING))
+        return record
+
+    def __getitem__(self, key: str) -> Record:
+        record = super().__getitem__(key)
+        if record is _UNLOADED:
+            return self._load(key)
+        return record
+
+    def get(self, key: str, default=None):
+        record = super().get(key, default)
+        if record is _UNLOADED:
+            return self._load(key)
+        return record
+
+    def values(self):
+        self.load_all()
+        return super().values()
+
+    def items(self):
+        self.load_all()
+        return super().items()
+
+    def copy(self) -> Dict[str, Record]:
+        """Return the records as a plain dictionary, loading those not loaded yet."""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        records = ", ".join(
+            f"{key!r}: {'<unloaded>' if record is _UNLOADED else repr(record)}"
+            for key, record in super().items()
+        )
+        return f"{type(self).__name__}({{{records}}})"
+
+    def __delitem__(self, key: str):
+        self._detach(key)
+
+    def pop(self, key: str, *default):
+        if key not in self:
+            return super().pop(key, *default)
+        return self._detach(key)
+
+    def popitem(self):
+        key = next(reversed(self))
+        return key, self._detach(key)
+
+    def setdefault(self, key: str, default=None):
+        if key not in self:
+            self[key] = {} if default is None else default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        if args and isinstance(args[0], IndexedStore):
+            # dict() would read the markers of another store's unloaded records
+            args = (args[0].items(),)
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for record in super().values():
+            if record is not _UNLOADED:
+                record._store = None
+        super().clear()
+        self._unloaded.clear()
+        self._sequence.clear()
+        for index in self._hashed.values():
+            index.clear()
+        for keys in self._unindexed.values():
+            keys.clear()
+        for entries in self._ordered.values():
+            entries.clear()
+        if self.journal is not None:
+            self.journal.clear()
+
+    def add_unloaded(self, records: Iterable[Tuple[str, Dict[str, Any]]]):
+        """Add records whose data is loaded by the loader when first accessed.
+
+        Ordered indexes are sorted once for all the records, so adding many records
+        at once is faster than storing them one at a time.
+
+        Args:
+            records: Pairs of a key that is not stored yet and the values of the
+                record's indexed fields
+        """
+        hashed = {field: self._hashed[field] for field in self.indexed_fields}
+        ordered = {field: [] for field in self.ordered_fields}
+        for key, indexed_values in records:
+            indexed = self.record_type(indexed_values)
+            super().__setitem__(key, _UNLOADED)
+            self._unloaded[key] = indexed
+            self._sequence[key] = self._next_sequence
+            self._next_sequence += 1
+            for field, index in hashed.items():
+                value = indexed.get(field, _MISSING)
+                if value is _MISSING:
+                    self._unindexed[field].add(key)
+                    continue
+                try:
+                    index.setdefault(value, set()).add(key)
+                except TypeError:
+                    # Unhashable values are not indexed
+                    self._unindexed[field].add(key)
+            for field, entries in ordered.items():
+                value = indexed.get(field)
+                if value is not None:
+                    entries.append((_sort_value(value), key))
+        for field, entries in ordered.items():
+            self._ordered[field].extend(entries)
+            self._ordered[field].sort()
+
+    def indexed_values(self, key: str) -> Dict[str, Any]:
+        """Return the values of a record's indexed fields without loading it."""
+        record = super().get(key)
+        if record is _UNLOADED:
+            record = self._unloaded.get(key)
+            if record is None:
+                record = super().get(key)  # Loaded meanwhile
+        if record is None:
+            return {}
+        return {field: record[field] for field in self.fields if field in record}
+
+    def merge(self, key: str, value: Dict[str, Any]):
+        """Store a record written elsewhere, without telling the journal.
+
+        A loaded record is updated in place, so code holding it, such as a running
+        upgrade simulation, sees the new values. Its tasks are updated in place too
+        when their number has not changed.
+
+        Args:
+            key: Key of the record
+            value: The record's new data
+        """
+        record = super().get(key)
+        if record is None or record is _UNLOADED:
+            self._put(key, value)
+            return
+        new = self.record_type(value)
+        tasks, new_tasks = record.get("tasks"), new.get("tasks")
+        if isinstance(tasks, list) and isinstance(new_tasks, list):
+            if len(tasks) == len(new_tasks) and all(
+                is_dataclass(task) and type(task) is type(new_task)
+                for task, new_task in zip(tasks, new_tasks)
+            ):
+                for task, new_task in zip(tasks, new_tasks):
+                    for field in fields(task):
+                        setattr(task, field.name, getattr(new_task, field.name))
+            else:
+                tasks[:] = new_tasks
+            dict.__setitem__(new, "tasks", tasks)
+        before = record._indexed_values()
+        dict.clear(record)
+        dict.update(record, new)
+        record._changed(before)
+
+    def discard(self, key: str):
+        """Remove a record deleted elsewhere, if stored, without telling the
+        journal."""
+        record = super().get(key)
+        if record is None:
+            return
+        if record is _UNLOADED:
+            record = self._unloaded.pop(key)
+        self._unindex_record(key, record)
+        super().__delitem__(key)
+        del self._sequence[key]
+
+    def is_loaded(self, key: str) -> bool:
+        """Check whether a stored record has been loaded."""
+        return key not in self._unloaded
+
+    def load_all(self):
+        """Load every record that has not been loaded yet."""
+        for key in list(self._unloaded):
+            if key in self._unloaded:
+                self._load(key)
+
+    def keys_where(self, field: str, value: Any) -> Set[str]:
+        """Return the keys of the records whose field equals a value.
+
+        Args:
+            field: A field with a hash index
+            value: The value looked up
+        """
+        try:
+            return set(self._hashed[field].get(value, ()))
+        except TypeError:
+            return set()
+
+    def keys_where_not(self, field: str, values: Iterable[Any]) -> Set[str]:
+        """Return the keys of the records whose field has none of the given values.
+
+        The cost depends on the number of distinct values of the field and of
+        matching records, not on the size of the store. Records without the field,
+        or with an unhashable value of it, are included.
+
+        Args:
+            field: A field with a hash index
+            values: The values excluded
+        """
+        excluded = list(values)
+        keys = set(self._unindexed[field])
+        for value, value_keys in self._hashed[field].items():
+            if value not in excluded:
+                keys |= value_keys
+        return keys
+
+    def records(self, keys: Optional[Iterable[str]] = None) -> KeyedRecords:
+        """Return the records of some keys, or of every key in the store's order,
+        as a sequence loading only the records that are accessed.
+
+        Args:
+            keys: Keys of the records, in the order to list them
+        """
+        return KeyedRecords(list(self if keys is None else keys), self.get)
+
+    def in_insertion_order(self, keys: Iterable[str]) -> List[str]:
+        """Return stored keys in the order the store iterates them."""
+        return sorted(keys, key=self._sequence.__getitem__)
+
+    def keys_ordered_by(self, field: str, descending: bool = False) -> Iterator[str]:
+        """Iterate the keys ordered by a field; records without it come last.
+
+        Args:
+            field: A field with an ordered index
+            descending: Whether to start with the largest value
+        """
+        entries = self._ordered[field]
+        ordered = reversed(entries) if descending else iter(entries)
+        seen = set()
+        for _, key in ordered:
+            seen.add(key)
+            yield key
+        for key in list(self):
+            if key not in seen:
+                yield key
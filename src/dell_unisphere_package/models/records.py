@@ -0,0 +1,146 @@
+"""Upgrade session records for Dell Unisphere API.
+
+This module defines how upgrade sessions are held in memory. Tasks are stored as
+slotted TaskRecord instances and statuses as enum members, whatever form they are
+given in (Pydantic models, dictionaries loaded from disk or plain integers), so
+the code reading stored sessions deals with a single representation. Records are
+turned into JSON only when a response or the saved state is encoded.
+
+Messages and task changes are reported through UpgradeSessionRecord.add_message()
+and task_changed(), so that a journal of the store (see IndexedStore) records them
+without rewriting the whole message or task list.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from enum import Enum
+from typing import Any, Iterator, Optional, Type
+
+from pydantic import BaseModel
+
+from ..schemas.base import TaskStatusEnum, TaskTypeEnum, UpgradeStatusEnum
+from .indexed_store import Record
+
+
+def _enum_member(enum_class: Type[Enum], value: Any) -> Any:
+    """Return the member of an enum for a value, or the value if it has none."""
+    if isinstance(value, enum_class):
+        return value
+    try:
+        return enum_class(value)
+    except ValueError:
+        return value
+
+
+@dataclass(slots=True, kw_only=True)
+class TaskRecord(Mapping):
+    """Task of a stored upgrade session.
+
+    Fields can be read and written as attributes or, like the dictionaries tasks
+    used to be stored as, by name.
+    """
+
+    status: TaskStatusEnum
+    type: Optional[TaskTypeEnum] = None
+    caption: str
+    creationTime: Optional[str] = None
+    estRemainTime: str = "00:03:30.000"
+
+    def __post_init__(self):
+        self.status = _enum_member(TaskStatusEnum, self.status)
+        self.type = _enum_member(TaskTypeEnum, self.type)
+
+    @classmethod
+    def from_value(cls, value: Any) -> "TaskRecord":
+        """Return the record of a task given as a record, model or mapping."""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, BaseModel):
+            value = value.model_dump()
+        data = {name: value[name] for name in TASK_FIELDS if name in value}
+        if "estRemainTime" not in data and "estimatedTime" in value:
+            data["estRemainTime"] = value["estimatedTime"]
+        if hasattr(data.get("creationTime"), "isoformat"):
+            data["creationTime"] = data["creationTime"].isoformat()
+        return cls(**data)
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in TASK_FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name: str, value: Any):
+        if name not in TASK_FIELDS:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(TASK_FIELDS)
+
+    def __len__(self) -> int:
+        return len(TASK_FIELDS)
+
+
+TASK_FIELDS = tuple(field.name for field in fields(TaskRecord))
+
+
+def _task_records(tasks: Any) -> Any:
+    """Convert the tasks of a session into TaskRecords.
+
+    Lists are converted in place, so references to a session's task list stay
+    valid.
+    """
+    if not isinstance(tasks, (list, tuple)):
+        return tasks
+    records = [TaskRecord.from_value(task) for task in tasks]
+    if isinstance(tasks, list):
+        tasks[:] = records
+        return tasks
+    return records
+
+
+# Conversion of the session fields that have a single stored representation
+_CONVERTERS = {
+    "status": lambda status: _enum_member(UpgradeStatusEnum, status),
+    "tasks": _task_records,
+}
+
+
+def _converted(name: str, value: Any) -> Any:
+    convert = _CONVERTERS.get(name)
+    return value if convert is None else convert(value)
+
+
+class UpgradeSessionRecord(Record):
+    """Stored upgrade session, whose tasks and status are converted on write."""
+
+    def __init__(self, *args, **kwargs):
+        data = dict(*args, **kwargs)
+        super().__init__(
+            {name: _converted(name, value) for name, value in data.items()}
+        )
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, _converted(name, value))
+
+    def update(self, *args, **kwargs):
+        data = dict(*args, **kwargs)
+        super().update({name: _converted(name, value) for name, value in data.items()})
+
+    def add_message(self, message: Any):
+        """Append a message to the session, reporting it to the store's journal."""
+        messages = self.setdefault("messages", [])
+        messages.append(message)
+        journal = self._journal()
+        if journal is not None:
+            journal.message(self._key, len(messages) - 1, message)
+
+    def task_changed(self, task: TaskRecord):
+        """Report a change of one of the session's tasks to the store's journal."""
+        journal = self._journal()
+        if journal is None:
+            return
+        for index, stored in enumerate(self.get("tasks", ())):
+            if stored is task:
+                journal.task(self._key, index, task)
+                return
@@ -0,0 +1,263 @@
+"""Login session store for Dell Unisphere API.
+
+This module provides a bounded in-memory store for login sessions. Sessions expire
+after being idle for longer than the idle timeout advertised in LoginSessionInfo,
+and the least recently used sessions are evicted once the store is full.
+
+Server processes sharing their state (see utils/shared_state.py) give the store a
+backend holding the sessions of every process: sessions are saved to it when
+created and removed from it on logout, and a session the store does not have is
+looked up there, so a client can log in through one process and go on through
+another.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+# Seconds a login session may stay unused, as advertised by LoginSessionInfo
+DEFAULT_IDLE_TIMEOUT = 3600
+
+# Maximum number of live login sessions
+DEFAULT_MAX_SESSIONS = 10000
+
+# Seconds between two records of a session's use in the backend
+BACKEND_TOUCH_INTERVAL = 60
+
+
+class _Entry:
+    """A stored login session."""
+
+    __slots__ = ("data", "last_access", "client", "touched")
+
+    def __init__(self, data: Any, last_access: float, client: Optional[Hashable]):
+        self.data = data
+        self.last_access = last_access
+        self.client = client
+        # Wall clock time the session's use was last recorded in the backend
+        self.touched = time.time()
+
+
+class SessionStore(MutableMapping):
+    """Mapping of login session IDs to session data with expiry and LRU eviction.
+
+    Entries are kept in least recently used order, so both expired and evicted
+    sessions are always taken from the front and every operation is O(1) amortized.
+    Sessions created for HTTP Basic authentication can be bound to a client, which
+    lets repeated requests from that client reuse their session.
+
+    Sync route dependencies use the store from threadpool threads, so its entries
+    are only read and changed while holding its lock.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the store.
+
+        Args:
+            idle_timeout: Seconds after which an unused session expires
+            max_sessions: Maximum number of sessions kept
+            clock: Function returning a monotonic timestamp in seconds
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._clients: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        # Object with the login session methods of RecordDatabase, holding the
+        # sessions shared with other processes
+        self.backend = None
+        self.expired = 0
+        self.evicted = 0
+        self.backend_reads = 0
+
+    def _is_expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.last_access > self.idle_timeout
+
+    def _remove(self, session_id: str) -> Optional[_Entry]:
+        # The entry may already have been purged by another thread
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return None
+        if entry.client is not None and self._clients.get(entry.client) == session_id:
+            del self._clients[entry.client]
+        return entry
+
+    def _purge_expired(self, now: float):
+        """Drop expired sessions, which are all at the front of the LRU order."""
+        while self._entries:
+            session_id, entry = next(iter(self._entries.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._remove(session_id)
+            self.expired += 1
+
+    def _use(self, session_id: str) -> Optional[_Entry]:
+        """Return the entry of a live session, marking it as used; the caller holds
+        the lock."""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        now = self._clock()
+        if self._is_expired(entry, now):
+            self._remove(session_id)
+            self.expired += 1
+            return None
+
+        entry.last_access = now
+        self._entries.move_to_end(session_id)
+        return entry
+
+    def __getitem__(self, session_id: str) -> Any:
+        with self._lock:
+            entry = self._use(session_id)
+        if entry is None:
+            # Another process may have created or used the session
+            entry = self._load(session_id)
+        backend = self.backend
+        if backend is not None:
+            wall_time = time.time()
+            # Only the thread that updates touched writes to the backend
+            with self._lock:
+                touch = wall_time - entry.touched > BACKEND_TOUCH_INTERVAL
+                if touch:
+                    entry.touched = wall_time
+            if touch:
+                backend.touch_login_session(session_id, wall_time)
+        return entry.data
+
+    def _load(self, session_id: str, client: Optional[Hashable] = None) -> _Entry:
+        """Store a session found in the backend.
+
+        Raises:
+            KeyError: If the backend has no live session with this ID
+        """
+        if self.backend is None:
+            raise KeyError(session_id)
+        found = self.backend.read_login_session(session_id)
+        if found is None:
+            raise KeyError(session_id)
+        data, last_access = found
+        if time.time() - last_access > self.idle_timeout:
+            raise KeyError(session_id)
+        with self._lock:
+            self.backend_reads += 1
+            return self._store(session_id, data, client)
+
+    def __setitem__(self, session_id: str, data: Any):
+        self.add(session_id, data)
+
+    def __delitem__(self, session_id: str):
+        if self.backend is not None:
+            self.backend.delete_login_sessions([session_id])
+        with self._lock:
+            entry = self._remove(session_id)
+        if entry is None and self.backend is None:
+            raise KeyError(session_id)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            self._purge_expired(self._clock())
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired(self._clock())
+            return len(self._entries)
+
+    def add(self, session_id: str, data: Any, client: Optional[Hashable] = None):
+        """Store a session, evicting the least recently used ones if full.
+
+        Args:
+            session_id: ID of the login session
+            data: Session data
+            client: Optional key identifying the client the session belongs to
+        """
+        if self.backend is not None:
+            self.backend.put_login_session(session_id, data, client, time.time())
+        with self._lock:
+            self._store(session_id, data, client)
+
+    def _store(self, session_id: str, data: Any, client: Optional[Hashable]) -> _Entry:
+        """Store a session; the caller holds the lock."""
+        now = self._clock()
+        self._remove(session_id)
+        entry = self._entries[session_id] = _Entry(data, now, client)
+        if client is not None:
+            self._clients[client] = session_id
+
+        self._purge_expired(now)
+        while len(self._entries) > self.max_sessions:
+            self._remove(next(iter(self._entries)))
+            self.evicted += 1
+        return entry
+
+    def create(self, data: Any, client: Optional[Hashable] = None) -> str:
+        """Store a session under a new random ID.
+
+        Args:
+            data: Session data
+            client: Optional key identifying the client the session belongs to
+
+        Returns:
+            The ID of the new session
+        """
+        session_id = str(uuid.uuid4())
+        self.add(session_id, data, client)
+        return session_id
+
+    def find_client_session(self, client: Hashable) -> Optional[str]:
+        """Return the ID of the live session bound to a client, if any."""
+        with self._lock:
+            session_id = self._clients.get(client)
+            if session_id is not None and self._use(session_id) is not None:
+                return session_id
+        if self.backend is None:
+            return None
+        session_id = self.backend.find_login_session(client)
+        if session_id is None:
+            return None
+        try:
+            self._load(session_id, client)
+        except KeyError:
+            return None
+        return session_id
+
+    def forget(self, session_id: str):
+        """Remove a session ended elsewhere, such as by another process, without
+        removing it from the backend."""
+        with self._lock:
+            self._remove(session_id)
+
+    def copy(self) -> Dict[str, Any]:
+        """Return the live sessions as a plain dictionary."""
+        with self._lock:
+            self._purge_expired(self._clock())
+            return {
+                session_id: entry.data for session_id, entry in self._entries.items()
+            }
+
+    def clear(self):
+        """Remove all sessions."""
+        with self._lock:
+            self._entries.clear()
+            self._clients.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters describing the store."""
+        return {
+            "live_sessions": len(self),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "backend_reads": self.backend_reads,
+        }
@@ -6,8 +6,12 @@ This module provides in-memory storage for the API.
 from datetime import datetime
 from typing import Any, Dict
 
+from .indexed_store import IndexedStore
+from .records import UpgradeSessionRecord
+from .session_store import SessionStore
+
 # In-memory storage
-sessions: Dict[str, Any] = {}
+sessions = SessionStore()  # Login sessions, expiring after their idle timeout
 users = {
     "admin": {
         "id": "user_admin",
@@ -30,7 +34,10 @@ users = {
 }
 # Initially empty, will be populated when software is uploaded and prepared
 candidate_software_versions: Dict[str, Any] = {}
-upgrade_sessions: Dict[str, Any] = {}
+# Indexed by status and creationTime for filtered and ordered queries
+upgrade_sessions: Dict[str, Any] = IndexedStore(
+    indexes=("status",), ordered=("creationTime",), record_type=UpgradeSessionRecord
+)
 uploaded_files: Dict[str, Any] = {}
 
 # System configuration for controlling mock behavior
@@ -40,6 +47,14 @@ system_config: Dict[str, Any] = {
         "flr::check_server_connectivity_2"
     ],  # List of failure codes to use
     "auto_failure_threshold": 0.3,  # Probability of failure in 'auto' mode (0.0 to 1.0)
+    "clock_mode": "real",  # Can be 'real' or 'virtual' (time only moves when advanced)
+    "simulation_speed_factor": None,  # None uses the simulator's built-in default
+    "progress_tick_interval": 0.25,  # Seconds between two upgrade progress updates
+    "progress_mode": "background",  # 'background' or 'lazy' (progress computed on read)
+    # 'snapshot', 'log' (changes appended as they happen), 'files' (one file per
+    # record) or 'sqlite' (one row per record in a SQLite database)
+    "persistence_mode": "snapshot",
+    "persistence_interval": 1.0,  # Seconds between two background saves of the state
 }
 
 # Installed software versions
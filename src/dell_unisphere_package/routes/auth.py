@@ -25,8 +25,10 @@ def get_login_session_info(
     # Get or create a session ID
     session_id = request.cookies.get("EMC-CSRF-TOKEN")
     if not session_id or session_id not in sessions:
-        # If no valid session cookie exists, create a new one
-        # This should rarely happen since get_current_user would have created a session
+        # Use the session get_current_user created for HTTP Basic authentication
+        session_id = getattr(request.state, "login_session_id", None)
+    if not session_id or session_id not in sessions:
+        # If no valid session exists, create a new one
         session_id = str(uuid.uuid4())
         sessions[session_id] = {
             "username": current_user["username"],
@@ -64,8 +66,12 @@ def get_login_session_info(
 @router.get("/types/user/instances")
 def get_users(request: Request, current_user=Depends(get_current_user)):
     """Get list of users."""
-    user_list = [{"id": user_info["id"]} for user_info in users.values()]
-    return format_response(user_list, request, instance_type="user")
+    return format_response(
+        users.values(),
+        request,
+        instance_type="user",
+        convert=lambda user_info: {"id": user_info["id"]},
+    )
 
 
 @router.delete("/types/loginSessionInfo/instances/{session_id}")
@@ -5,11 +5,12 @@ This module defines the API endpoints for installed software information.
 
 from fastapi import APIRouter, Depends, HTTPException, Request
 
-from ..controllers.auth import format_response, get_current_user
+from ..controllers.auth import format_json_response, get_current_user
 from ..models.storage import installed_software_versions
 from ..schemas.base import InstalledSoftwareVersion
+from ..utils.json_response import UnisphereJSONResponse
 
-router = APIRouter(prefix="/api")
+router = APIRouter(prefix="/api", default_response_class=UnisphereJSONResponse)
 
 
 @router.get("/types/installedSoftwareVersion/instances")
@@ -17,11 +18,12 @@ def get_installed_software_versions(
     request: Request, current_user=Depends(get_current_user)
 ):
     """Get all installed software versions."""
-    versions = [
-        InstalledSoftwareVersion(**version)
-        for version in installed_software_versions.values()
-    ]
-    return format_response(versions, request, instance_type="installedSoftwareVersion")
+    return format_json_response(
+        installed_software_versions.values(),
+        request,
+        instance_type="installedSoftwareVersion",
+        model=InstalledSoftwareVersion,
+    )
 
 
 @router.get("/instances/installedSoftwareVersion/{id}")
@@ -34,7 +36,10 @@ def get_installed_software_version(
             status_code=404, detail="Installed software version not found"
         )
 
-    version = InstalledSoftwareVersion(**installed_software_versions[id])
-    return format_response(
-        version, request, instance_type="installedSoftwareVersion", instance_id=id
+    return format_json_response(
+        installed_software_versions[id],
+        request,
+        instance_type="installedSoftwareVersion",
+        instance_id=id,
+        model=InstalledSoftwareVersion,
     )
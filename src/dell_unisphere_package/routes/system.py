@@ -9,8 +9,28 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
 from ..controllers.auth import format_response, get_current_user
-from ..models.storage import system_config
+from ..models.storage import (
+    candidate_software_versions,
+    sessions,
+    system_config,
+    upgrade_sessions,
+)
 from ..schemas.base import BasicSystemInfo
+from ..utils.clock import RealClock, VirtualClock, get_clock, set_clock
+from ..utils.shared_state import get_shared_state
+from ..utils.state_persistence import (
+    disable_state_database,
+    disable_state_files,
+    disable_state_log,
+    enable_state_database,
+    enable_state_files,
+    enable_state_log,
+    get_state_database,
+    get_state_files,
+    get_state_log,
+    get_state_writer,
+)
+from ..utils.upgrade_simulator import progress_engine, scheduler
 
 router = APIRouter(prefix="/api")
 
@@ -24,6 +44,18 @@ class SystemConfigUpdate(BaseModel):
     eligibility_status: Optional[str] = None  # 'success', 'failure', or 'auto'
     failure_codes: Optional[List[str]] = None
     auto_failure_threshold: Optional[float] = None
+    clock_mode: Optional[str] = None  # 'real' or 'virtual'
+    simulation_speed_factor: Optional[float] = None
+    progress_tick_interval: Optional[float] = None
+    progress_mode: Optional[str] = None  # 'background' or 'lazy'
+    persistence_mode: Optional[str] = None  # 'snapshot', 'log', 'files' or 'sqlite'
+    persistence_interval: Optional[float] = None
+
+
+class ClockAdvance(BaseModel):
+    """Model for advancing the virtual simulation clock."""
+
+    seconds: float
 
 
 @router.get("/types/basicSystemInfo/instances")
@@ -39,6 +71,34 @@ def get_system_config(request: Request, current_user=Depends(get_current_user)):
     return {"content": system_config}
 
 
+@router.get("/types/systemMetrics/instances")
+def get_system_metrics(request: Request, current_user=Depends(get_current_user)):
+    """Get runtime metrics of the mock for monitoring."""
+    state_log = get_state_log(upgrade_sessions)
+    state_files = get_state_files(upgrade_sessions)
+    state_database = get_state_database(upgrade_sessions)
+    state_writer = get_state_writer()
+    shared_state = get_shared_state()
+    return {
+        "content": {
+            "login_sessions": sessions.stats(),
+            "upgrade_scheduler": scheduler.stats(),
+            "progress_engine": progress_engine.stats(),
+            "state_log": state_log.stats() if state_log is not None else None,
+            "state_files": state_files.stats() if state_files is not None else None,
+            "state_database": (
+                state_database.stats() if state_database is not None else None
+            ),
+            "state_writer": (
+                state_writer.stats() if state_writer is not None else None
+            ),
+            "shared_state": (
+                shared_state.stats() if shared_state is not None else None
+            ),
+        }
+    }
+
+
 @router.post("/types/systemConfig/action/update")
 def update_system_config(
     request: Request, config: SystemConfigUpdate, current_user=Depends(get_current_user)
@@ -48,23 +108,141 @@ def update_system_config(
     This endpoint allows toggling between success and failure modes for testing,
     as well as configuring other system behaviors.
     """
-    # Update only the provided fields
-    if config.eligibility_status is not None:
-        if config.eligibility_status not in ["success", "failure", "auto"]:
+    # Validate every provided field before changing anything, so a rejected
+    # request leaves the configuration and the persistence mode as they were
+    if config.eligibility_status is not None and config.eligibility_status not in [
+        "success",
+        "failure",
+        "auto",
+    ]:
+        raise HTTPException(
+            status_code=400,
+            detail="eligibility_status must be one of: 'success', 'failure', 'auto'",
+        )
+
+    if config.auto_failure_threshold is not None and not (
+        0 <= config.auto_failure_threshold <= 1
+    ):
+        raise HTTPException(
+            status_code=400, detail="auto_failure_threshold must be between 0 and 1"
+        )
+
+    if (
+        config.simulation_speed_factor is not None
+        and config.simulation_speed_factor <= 0
+    ):
+        raise HTTPException(
+            status_code=400, detail="simulation_speed_factor must be positive"
+        )
+
+    if config.progress_tick_interval is not None and config.progress_tick_interval <= 0:
+        raise HTTPException(
+            status_code=400, detail="progress_tick_interval must be positive"
+        )
+
+    if config.progress_mode is not None and config.progress_mode not in [
+        "background",
+        "lazy",
+    ]:
+        raise HTTPException(
+            status_code=400,
+            detail="progress_mode must be one of: 'background', 'lazy'",
+        )
+
+    if config.persistence_mode is not None:
+        if config.persistence_mode not in ["snapshot", "log", "files", "sqlite"]:
             raise HTTPException(
                 status_code=400,
-                detail="eligibility_status must be one of: 'success', 'failure', 'auto'",
+                detail=(
+                    "persistence_mode must be one of: 'snapshot', 'log', 'files', "
+                    "'sqlite'"
+                ),
+            )
+        if get_shared_state() is not None and config.persistence_mode != "sqlite":
+            raise HTTPException(
+                status_code=400,
+                detail="persistence_mode must stay 'sqlite' while the state is shared",
             )
-        system_config["eligibility_status"] = config.eligibility_status
 
-    if config.failure_codes is not None:
-        system_config["failure_codes"] = config.failure_codes
+    if config.persistence_interval is not None and config.persistence_interval <= 0:
+        raise HTTPException(
+            status_code=400, detail="persistence_interval must be positive"
+        )
 
-    if config.auto_failure_threshold is not None:
-        if not 0 <= config.auto_failure_threshold <= 1:
+    if config.clock_mode is not None:
+        if config.clock_mode not in ["real", "virtual"]:
+            raise HTTPException(
+                status_code=400,
+                detail="clock_mode must be one of: 'real', 'virtual'",
+            )
+        # A virtual clock would only move in the process advancing it
+        if get_shared_state() is not None and config.clock_mode == "virtual":
             raise HTTPException(
-                status_code=400, detail="auto_failure_threshold must be between 0 and 1"
+                status_code=400,
+                detail="clock_mode must stay 'real' while the state is shared",
             )
-        system_config["auto_failure_threshold"] = config.auto_failure_threshold
+
+    # Update only the provided fields
+    for field in [
+        "eligibility_status",
+        "failure_codes",
+        "auto_failure_threshold",
+        "simulation_speed_factor",
+        "progress_tick_interval",
+        "progress_mode",
+        "persistence_interval",
+    ]:
+        value = getattr(config, field)
+        if value is not None:
+            system_config[field] = value
+
+    if config.clock_mode is not None:
+        if config.clock_mode != get_clock().mode:
+            set_clock(VirtualClock() if config.clock_mode == "virtual" else RealClock())
+        system_config["clock_mode"] = config.clock_mode
+
+    # Switched last, as it migrates the saved state and removes the other modes' files
+    if config.persistence_mode is not None:
+        if config.persistence_mode == "log":
+            enable_state_log(upgrade_sessions)
+        elif config.persistence_mode == "files":
+            enable_state_files(upgrade_sessions, candidate_software_versions)
+        elif config.persistence_mode == "sqlite":
+            enable_state_database(upgrade_sessions, candidate_software_versions)
+        else:
+            disable_state_log(upgrade_sessions)
+            disable_state_files(upgrade_sessions)
+            disable_state_database(upgrade_sessions)
+        system_config["persistence_mode"] = config.persistence_mode
 
     return {"content": system_config}
+
+
+@router.post("/types/systemConfig/action/advanceClock")
+async def advance_clock(
+    request: Request, advance: ClockAdvance, current_user=Depends(get_current_user)
+):
+    """Advance the virtual simulation clock.
+
+    Every upgrade simulation progresses as if the given number of seconds had
+    passed, e.g. {"seconds": 900} to skip 15 minutes. Only available when
+    clock_mode is 'virtual'.
+    """
+    clock = get_clock()
+    if not isinstance(clock, VirtualClock):
+        raise HTTPException(
+            status_code=400,
+            detail="The simulation clock can only be advanced in 'virtual' clock_mode",
+        )
+    if advance.seconds < 0:
+        raise HTTPException(status_code=400, detail="seconds must not be negative")
+
+    await clock.advance(advance.seconds)
+
+    return {
+        "content": {
+            "clock_mode": clock.mode,
+            "time": clock.time(),
+            "now": clock.now().isoformat(),
+        }
+    }
@@ -10,7 +10,9 @@ from typing import List, Optional
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 
-from ..controllers.auth import format_response, get_current_user
+from ..controllers.auth import format_json_response, get_current_user
+from ..controllers.projection import parse_fields
+from ..controllers.query import query_collection
 from ..models.storage import (
     candidate_software_versions,
     upgrade_sessions,
@@ -25,17 +27,29 @@ from ..schemas.base import (
 from ..schemas.upgrade import (
     CandidateSoftwareVersion,
     UpgradeMessage,
-    UpgradeTask,
 )
+from ..utils.clock import get_clock
+from ..utils.json_response import UnisphereJSONResponse
+from ..utils.lazy_progress import (
+    LAZY_PROGRESS_KEY,
+    pause_lazy_progress,
+    refresh_running_sessions,
+    refresh_session,
+    resume_lazy_progress,
+)
+from ..utils.state_persistence import CANDIDATE_SOFTWARE, notify_state_changed
 from ..utils.upgrade_simulator import (
+    active_session_ids,
     create_realistic_upgrade_tasks,
+    notify_session_resumed,
+    set_task_status,
     start_upgrade_simulation,
 )
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=UnisphereJSONResponse)
 
 MSG = (
     "The health check has failed. If an SP has to fail over, one or more of your "
@@ -51,12 +65,11 @@ def get_candidate_software_versions(
 ):
     """Get list of candidate software versions."""
     # Return the current list of candidate software versions (empty initially)
-    candidates = [
-        CandidateSoftwareVersion(**candidate)
-        for candidate in candidate_software_versions.values()
-    ]
-    return format_response(
-        candidates, request, instance_type="candidateSoftwareVersion"
+    return format_json_response(
+        query_collection(candidate_software_versions, request),
+        request,
+        instance_type="candidateSoftwareVersion",
+        model=CandidateSoftwareVersion,
     )
 
 
@@ -66,34 +79,35 @@ def get_upgrade_sessions(
     current_user=Depends(get_current_user),
     fields: Optional[str] = None,
 ):
-    """Get list of upgrade sessions."""
-    # Parse fields parameter if provided
-    selected_fields = None
-    if fields:
-        selected_fields = fields.split(",")
-
-    sessions_list = []
-    for session_id, session_data in upgrade_sessions.items():
+    """Get list of upgrade sessions.
+
+    When fields are requested, format_response picks them out of the stored
+    sessions directly; otherwise every session is copied without its messages.
+    """
+
+    def session_content(session_data):
+        # Bring lazily computed progress up to date
+        session_data = refresh_session(session_data)
+        if parse_fields(fields) is not None:
+            return session_data
+
         # Create a copy of the session data to avoid modifying the original
         session_copy = session_data.copy()
+        session_copy.pop(LAZY_PROGRESS_KEY, None)
 
         # Remove messages unless explicitly requested
-        if "messages" in session_copy and (
-            not selected_fields or "messages" not in selected_fields
-        ):
+        if "messages" in session_copy:
             session_copy["messages"] = []
-
-        # Filter fields if requested
-        if selected_fields:
-            filtered_data = {}
-            for field in selected_fields:
-                if field in session_copy:
-                    filtered_data[field] = session_copy[field]
-            sessions_list.append(filtered_data)
-        else:
-            sessions_list.append(session_copy)
-
-    return format_response(sessions_list, request, instance_type="upgradeSession")
+        return session_copy
+
+    # Statuses of lazily progressed sessions are only current once refreshed
+    refresh_running_sessions()
+    return format_json_response(
+        query_collection(upgrade_sessions, request),
+        request,
+        instance_type="upgradeSession",
+        convert=session_content,
+    )
 
 
 @router.post("/api/types/upgradeSession/action/verifyUpgradeEligibility")
@@ -191,6 +205,7 @@ def prepare_software(request: Request, current_user=Depends(get_current_user)):
         "rebootRequired": True,
         "canPauseBeforeReboot": True,
     }
+    notify_state_changed(CANDIDATE_SOFTWARE)
 
     return {"id": candidate_id, "status": "SUCCESS"}
 
@@ -200,19 +215,25 @@ async def create_upgrade_session(
     request: Request,
     background_tasks: BackgroundTasks,
     current_user=Depends(get_current_user),
+    speedFactor: Optional[float] = None,
 ):
-    """Create a new upgrade session."""
-    # Check if there's already an active upgrade session
-    active_session_exists = False
-    active_session_id = None
-
-    for session_id, session in upgrade_sessions.items():
-        status = session.get("status")
-        # Consider sessions that are not COMPLETED or FAILED as active
-        if status not in [UpgradeStatusEnum.COMPLETED, UpgradeStatusEnum.FAILED]:
-            active_session_exists = True
-            active_session_id = session_id
-            break
+    """Create a new upgrade session.
+
+    Args:
+        request: The request object
+        background_tasks: Background tasks used to start the simulation
+        current_user: The authenticated user
+        speedFactor: Override the simulation speed factor for this session only
+    """
+    if speedFactor is not None and speedFactor <= 0:
+        raise HTTPException(status_code=400, detail="speedFactor must be positive")
+
+    # Check if there's already an active upgrade session, i.e. one that is not
+    # COMPLETED or FAILED, using the status index instead of scanning the history
+    refresh_running_sessions()
+    active_sessions = active_session_ids()
+    active_session_exists = bool(active_sessions)
+    active_session_id = active_sessions[0] if active_sessions else None
 
     if active_session_exists:
         raise HTTPException(
@@ -255,6 +276,7 @@ async def create_upgrade_session(
             "rebootRequired": True,
             "canPauseBeforeReboot": True,
         }
+        notify_state_changed(CANDIDATE_SOFTWARE)
     # If no candidate is specified or found, check if any exist
     elif not candidate_id:
         if not candidate_software_versions:
@@ -275,11 +297,8 @@ async def create_upgrade_session(
     candidate_version = candidate_software_versions[candidate_id]["version"]
     session_id = f"Upgrade_{candidate_version}"
 
-    # Create realistic tasks for the upgrade session
-    task_dicts = create_realistic_upgrade_tasks()
-
-    # Convert task dictionaries to UpgradeTask objects
-    tasks = [UpgradeTask(**task) for task in task_dicts]
+    # Create realistic tasks for the upgrade session; they are stored as TaskRecords
+    tasks = create_realistic_upgrade_tasks()
 
     # Initialize empty messages list
     messages: List[UpgradeMessage] = []
@@ -291,9 +310,9 @@ async def create_upgrade_session(
         "candidate": candidate_id,
         "caption": f"Upgrade to {candidate_version}",
         "status": UpgradeStatusEnum.IN_PROGRESS,  # Set to IN_PROGRESS immediately to fix the progress issue
-        "startTime": datetime.now().isoformat(),  # Add startTime immediately
+        "startTime": get_clock().now().isoformat(),  # Add startTime immediately
         "messages": messages,
-        "creationTime": datetime.now().isoformat(),
+        "creationTime": get_clock().now().isoformat(),
         "elapsedTime": "PT0M",
         "percentComplete": 0,
         "tasks": tasks,
@@ -305,7 +324,9 @@ async def create_upgrade_session(
     )
 
     # Start upgrade simulation in background
-    background_tasks.add_task(start_upgrade_simulation, session_id)
+    background_tasks.add_task(
+        start_upgrade_simulation, session_id, speed_factor=speedFactor
+    )
 
     return {"id": session_id}
 
@@ -322,30 +343,24 @@ def get_upgrade_session(
     if session_id not in upgrade_sessions:
         raise HTTPException(status_code=404, detail=f"Session {session_id} not found.")
 
-    # Get the session data
-    session_data = upgrade_sessions[session_id]
+    # Get the session data, bringing lazily computed progress up to date
+    session_data = refresh_session(upgrade_sessions[session_id])
 
     # Log the session data for debugging
     logger.debug(f"Session data for {session_id}: {session_data}")
 
-    # Create a dictionary for the response
-    response_data = {}
-
-    # If fields parameter is provided, filter the response
-    if fields:
-        requested_fields = fields.split(",")
-        for field in requested_fields:
-            if field in session_data:
-                response_data[field] = session_data[field]
-    else:
+    # Requested fields are picked out of the session by format_response
+    response_data = session_data
+    if parse_fields(fields) is None:
         # Use all fields from session_data except messages by default
         response_data = session_data.copy()
+        response_data.pop(LAZY_PROGRESS_KEY, None)
         # Remove messages unless explicitly requested
         if "messages" in response_data and fields is None:
             response_data["messages"] = []
 
     # Format the response according to Dell Unisphere API standards
-    return format_response(
+    return format_json_response(
         response_data, request, instance_type="upgradeSession", instance_id=session_id
     )
 
@@ -370,14 +385,11 @@ async def resume_upgrade_session(
         # For test script compatibility, create a default session for specific test case
         if session_id == "Upgrade_5.3.0.120":
             # Create realistic tasks for the upgrade session
-            task_dicts = create_realistic_upgrade_tasks()
-
-            # Convert task dictionaries to UpgradeTask objects
-            tasks = [UpgradeTask(**task) for task in task_dicts]
+            tasks = create_realistic_upgrade_tasks()
 
             # Set the first task as completed and the second as paused
-            tasks[0].status = TaskStatusEnum.COMPLETED
-            tasks[1].status = TaskStatusEnum.PAUSED
+            tasks[0]["status"] = TaskStatusEnum.COMPLETED
+            tasks[1]["status"] = TaskStatusEnum.PAUSED
 
             # Initialize empty messages list
             messages: List[UpgradeMessage] = []
@@ -401,6 +413,8 @@ async def resume_upgrade_session(
                 detail=f"Session {session_id} not found. Please create an upgrade session first.",
             )
 
+    refresh_session(upgrade_sessions[session_id])
+
     # Check if the session is in a paused state
     if (
         upgrade_sessions[session_id]["status"] != UpgradeStatusEnum.PAUSED
@@ -419,23 +433,15 @@ async def resume_upgrade_session(
         f"Resuming session {session_id} from {upgrade_sessions[session_id]['status']} to IN_PROGRESS"
     )
     upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.IN_PROGRESS
+    resume_lazy_progress(upgrade_sessions[session_id])
 
     # Update tasks
     current_task_index = None
     for i, task in enumerate(upgrade_sessions[session_id]["tasks"]):
-        # Check if task is a Pydantic model or a dictionary
-        if isinstance(task, UpgradeTask):
-            # Task is a Pydantic model
-            if task.status == TaskStatusEnum.PAUSED:
-                task.status = TaskStatusEnum.IN_PROGRESS
-                current_task_index = i
-                break
-        else:
-            # Task is a dictionary
-            if task["status"] == TaskStatusEnum.PAUSED:
-                task["status"] = TaskStatusEnum.IN_PROGRESS
-                current_task_index = i
-                break
+        if task.status == TaskStatusEnum.PAUSED:
+            set_task_status(session_id, task, TaskStatusEnum.IN_PROGRESS)
+            current_task_index = i
+            break
 
     # Add resume message
     resume_message = UpgradeMessage(
@@ -443,9 +449,12 @@ async def resume_upgrade_session(
         message=f"Resumed upgrade at task {current_task_index + 1}",
         severity=0,
     )
-    upgrade_sessions[session_id]["messages"].append(resume_message)
+    upgrade_sessions[session_id].add_message(resume_message)
+
+    # Wake the simulation if it is still waiting for the session to be resumed
+    notify_session_resumed(session_id)
 
-    # Restart the upgrade simulation
+    # Restart the upgrade simulation if it is no longer running
     background_tasks.add_task(start_upgrade_simulation, session_id)
 
     return {"status": "SUCCESS"}
@@ -470,6 +479,8 @@ async def pause_upgrade_session(
             detail=f"Session {session_id} not found. Please create an upgrade session first.",
         )
 
+    refresh_session(upgrade_sessions[session_id])
+
     # Check if the session is in an in-progress state
     if upgrade_sessions[session_id]["status"] != UpgradeStatusEnum.IN_PROGRESS:
         raise HTTPException(
@@ -479,23 +490,15 @@ async def pause_upgrade_session(
 
     # Pause session
     upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.PAUSED
+    pause_lazy_progress(upgrade_sessions[session_id])
 
     # Find the current in-progress task and pause it
     current_task_index = None
     for i, task in enumerate(upgrade_sessions[session_id]["tasks"]):
-        # Check if task is a Pydantic model or a dictionary
-        if isinstance(task, UpgradeTask):
-            # Task is a Pydantic model
-            if task.status == TaskStatusEnum.IN_PROGRESS:
-                task.status = TaskStatusEnum.PAUSED
-                current_task_index = i
-                break
-        else:
-            # Task is a dictionary
-            if task["status"] == TaskStatusEnum.IN_PROGRESS:
-                task["status"] = TaskStatusEnum.PAUSED
-                current_task_index = i
-                break
+        if task.status == TaskStatusEnum.IN_PROGRESS:
+            set_task_status(session_id, task, TaskStatusEnum.PAUSED)
+            current_task_index = i
+            break
 
     # Add pause message
     message = "Paused upgrade"
@@ -507,6 +510,6 @@ async def pause_upgrade_session(
         message=message,
         severity=0,
     )
-    upgrade_sessions[session_id]["messages"].append(pause_message)
+    upgrade_sessions[session_id].add_message(pause_message)
 
     return {"status": "SUCCESS"}
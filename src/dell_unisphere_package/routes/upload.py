@@ -12,6 +12,7 @@ from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
 
 from ..controllers.auth import get_current_user
 from ..models.storage import candidate_software_versions, uploaded_files
+from ..utils.state_persistence import CANDIDATE_SOFTWARE, notify_state_changed
 
 router = APIRouter()
 
@@ -68,6 +69,7 @@ async def upload_candidate_software(
                 "rebootRequired": True,
                 "canPauseBeforeReboot": True,
             }
+            notify_state_changed(CANDIDATE_SOFTWARE)
 
             return {"id": file_id, "filename": file.filename, "size": len(content)}
 
@@ -75,4 +77,5 @@ async def upload_candidate_software(
             # If anything fails during upload, ensure we don't leave partial state
             uploaded_files.pop(file_id, None)
             candidate_software_versions.pop(file_id, None)
+            notify_state_changed(CANDIDATE_SOFTWARE)
             raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,167 @@
+"""Simulation clocks for Dell Unisphere API.
+
+This module provides the clock used by the upgrade simulator. The real clock follows
+wall time, while the virtual clock only moves when it is explicitly advanced, which
+lets test harnesses run complete upgrade flows without waiting.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Number of consecutive idle event loop passes after which woken coroutines are
+# considered blocked again while advancing a virtual clock
+_SETTLE_PASSES = 3
+_MAX_SETTLE_ITERATIONS = 1000
+
+
+class RealClock:
+    """Clock backed by wall time and asyncio.sleep."""
+
+    mode = "real"
+
+    def time(self) -> float:
+        """Return a monotonic timestamp in seconds."""
+        return time.monotonic()
+
+    def now(self) -> datetime:
+        """Return the current date and time."""
+        return datetime.now()
+
+    async def sleep(self, seconds: float):
+        """Sleep for the given number of seconds."""
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """Clock whose time only moves when advance() is called.
+
+    Sleepers are kept in a heap ordered by deadline. Advancing the clock wakes them
+    in deadline order and lets each woken coroutine run until it blocks again, so
+    chains of sleeps (such as the tasks of an upgrade session) progress exactly as
+    they would in real time.
+    """
+
+    mode = "virtual"
+
+    def __init__(self, start: Optional[datetime] = None):
+        """Initialize the clock.
+
+        Args:
+            start: Date and time corresponding to virtual time zero
+        """
+        self._start = start or datetime.now()
+        self._time = 0.0
+        self._sleepers: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._registrations = 0
+
+    def time(self) -> float:
+        """Return the virtual time in seconds since the clock was created."""
+        return self._time
+
+    def now(self) -> datetime:
+        """Return the virtual date and time."""
+        return self._start + timedelta(seconds=self._time)
+
+    @property
+    def pending(self) -> int:
+        """Number of coroutines currently sleeping on this clock."""
+        return sum(1 for _, _, future in self._sleepers if not future.done())
+
+    async def sleep(self, seconds: float):
+        """Sleep until the clock has been advanced by the given number of seconds."""
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._sleepers, (self._time + seconds, next(self._sequence), future)
+        )
+        self._registrations += 1
+        await future
+
+    async def advance(self, seconds: float):
+        """Move the clock forward, waking sleepers whose deadline has passed.
+
+        Args:
+            seconds: Number of virtual seconds to advance by
+        """
+        if seconds < 0:
+            raise ValueError("Cannot advance the clock by a negative amount")
+
+        target = self._time + seconds
+        await self._settle()
+        while self._sleepers and self._sleepers[0][0] <= target:
+            deadline = self._sleepers[0][0]
+            self._time = max(self._time, deadline)
+            while self._sleepers and self._sleepers[0][0] <= deadline:
+                _, _, future = heapq.heappop(self._sleepers)
+                _wake(future)
+            await self._settle()
+        self._time = target
+
+    async def _settle(self):
+        """Let woken coroutines run until no new sleeps are being registered."""
+        idle_passes = 0
+        for _ in range(_MAX_SETTLE_ITERATIONS):
+            registrations = self._registrations
+            await asyncio.sleep(0)
+            if self._registrations == registrations:
+                idle_passes += 1
+                if idle_passes >= _SETTLE_PASSES:
+                    return
+            else:
+                idle_passes = 0
+
+    def release_all(self):
+        """Wake every sleeper immediately, e.g. when switching back to real time.
+
+        It may be called from any thread, such as that of a sync route; the
+        sleepers are woken on the event loops they sleep on.
+        """
+        sleepers, self._sleepers = self._sleepers, []
+        for _, _, future in sleepers:
+            future.get_loop().call_soon_threadsafe(_wake, future)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+_clock = RealClock()
+
+
+def get_clock():
+    """Return the clock currently driving the simulator."""
+    return _clock
+
+
+def set_clock(clock):
+    """Replace the clock driving the simulator.
+
+    Coroutines sleeping on a virtual clock that is being replaced are woken so
+    they continue on the new clock instead of sleeping forever.
+
+    Args:
+        clock: The new clock
+
+    Returns:
+        The new clock
+    """
+    global _clock
+    previous = _clock
+    _clock = clock
+    if isinstance(previous, VirtualClock) and previous is not clock:
+        previous.release_all()
+    logger.info(f"Simulation clock set to {clock.mode} time")
+    return clock
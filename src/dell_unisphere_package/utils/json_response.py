@@ -0,0 +1,40 @@
+"""Fast JSON responses for Dell Unisphere API.
+
+This module provides the response class used for the large Unisphere envelopes.
+When the optional orjson package is installed, content is encoded directly by
+orjson, which serializes the enums from schemas.base and datetimes natively and
+skips FastAPI's jsonable_encoder pass. Otherwise the standard encoding is used.
+"""
+
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the installed extras
+    orjson = None
+
+
+def _encode_default(obj: Any) -> Any:
+    """Encode the objects orjson does not support natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return jsonable_encoder(obj)
+
+
+class UnisphereJSONResponse(JSONResponse):
+    """JSON response encoded with orjson when it is available.
+
+    The content may contain Pydantic models, enums and datetimes, and is encoded
+    the same way as FastAPI would encode it for a plain JSONResponse.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(jsonable_encoder(content))
+        return orjson.dumps(
+            content, default=_encode_default, option=orjson.OPT_NON_STR_KEYS
+        )
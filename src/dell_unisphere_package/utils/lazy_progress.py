@@ -0,0 +1,238 @@
+"""Lazy upgrade progress for Dell Unisphere API.
+
+This module implements the 'lazy' progress mode. Instead of being advanced by a
+background simulation, a session only stores when it started, when it was paused
+and how long each of its tasks takes. Status, task states and percentComplete are
+derived from the clock whenever the session is read, so idle sessions cost nothing.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Set, Tuple
+
+from ..models.storage import candidate_software_versions, upgrade_sessions
+from ..schemas.base import TaskStatusEnum, UpgradeStatusEnum
+from .clock import get_clock
+from .state_persistence import CANDIDATE_SOFTWARE, notify_state_changed
+from .upgrade_simulator import (
+    forget_speed_factor,
+    format_timedelta,
+    get_speed_factor,
+    parse_time_to_seconds,
+    set_task_status,
+)
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Key under which a lazily progressed session keeps its schedule
+LAZY_PROGRESS_KEY = "_progress"
+
+# IDs of the lazily progressed sessions that have not finished yet
+running_lazy_sessions: Set[str] = set()
+
+
+def is_lazy(session: Dict[str, Any]) -> bool:
+    """Check whether the session's progress is computed on read."""
+    return LAZY_PROGRESS_KEY in session
+
+
+def start_lazy_progress(session_id: str):
+    """Record the task schedule of a session so its progress can be derived on read.
+
+    Tasks that are already completed are skipped; every other task starts over.
+
+    Args:
+        session_id: ID of the upgrade session
+    """
+    session = upgrade_sessions.get(session_id)
+    if session is None:
+        logger.error(f"Session {session_id} not found")
+        return
+    if is_lazy(session):
+        logger.warning(f"Lazy progress for session {session_id} is already tracked")
+        return
+
+    speed_factor = get_speed_factor(session_id)
+    schedule = []
+    for task in session.get("tasks", []):
+        if task.status == TaskStatusEnum.COMPLETED:
+            schedule.append(None)
+        else:
+            duration = parse_time_to_seconds(task.estRemainTime) / speed_factor
+            schedule.append(duration)
+
+    now = get_clock().now()
+    session.setdefault("startTime", now.isoformat())
+    session.setdefault("messages", [])
+    session[LAZY_PROGRESS_KEY] = {
+        "startTime": now.isoformat(),
+        "schedule": schedule,
+        "pauses": [],  # [active seconds at pause, paused seconds] of past pauses
+        "pausedAt": None,  # Seconds since startTime at which the current pause began
+        "reported": 0,  # Number of task transitions already added to the messages
+    }
+    if session.get("status") == UpgradeStatusEnum.PAUSED:
+        session[LAZY_PROGRESS_KEY]["pausedAt"] = 0.0
+    running_lazy_sessions.add(session_id)
+
+    logger.info(f"Started lazy progress for session {session_id}")
+
+
+def _seconds_since_start(progress: Dict[str, Any]) -> float:
+    """Return the clock seconds elapsed since the lazy progress was started."""
+    started = datetime.fromisoformat(progress["startTime"])
+    return (get_clock().now() - started).total_seconds()
+
+
+def _active_seconds(progress: Dict[str, Any]) -> float:
+    """Return the seconds the session has spent running, excluding pauses."""
+    wall = progress["pausedAt"]
+    if wall is None:
+        wall = _seconds_since_start(progress)
+    return wall - sum(length for _, length in progress["pauses"])
+
+
+def _wall_time(progress: Dict[str, Any], active: float) -> datetime:
+    """Return the date and time at which the session had run for `active` seconds."""
+    offset = active + sum(length for at, length in progress["pauses"] if at < active)
+    return datetime.fromisoformat(progress["startTime"]) + timedelta(seconds=offset)
+
+
+def _transitions(schedule) -> Iterator[Tuple[float, int, str]]:
+    """Yield (active seconds, task index, verb) for every task start and end."""
+    offset = 0.0
+    for index, duration in enumerate(schedule):
+        if duration is None:
+            continue
+        yield offset, index, "Starting"
+        offset += duration
+        yield offset, index, "Completed"
+
+
+def refresh_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Bring a lazily progressed session up to date with the clock.
+
+    Sessions in background mode are returned unchanged.
+
+    Args:
+        session: The upgrade session
+
+    Returns:
+        The same session
+    """
+    progress = session.get(LAZY_PROGRESS_KEY)
+    if progress is None:
+        return session
+
+    if session["status"] in [
+        UpgradeStatusEnum.COMPLETED,
+        UpgradeStatusEnum.FAILED,
+        UpgradeStatusEnum.CANCELLED,
+    ]:
+        del session[LAZY_PROGRESS_KEY]
+        running_lazy_sessions.discard(session["id"])
+        return session
+
+    active = _active_seconds(progress)
+    schedule = progress["schedule"]
+    tasks = session["tasks"]
+
+    # Report every task transition that has happened since the last read
+    reported = progress["reported"]
+    for position, (offset, index, verb) in enumerate(_transitions(schedule)):
+        if offset > active:
+            break
+        if position < progress["reported"]:
+            continue
+        session.add_message(
+            {
+                "timestamp": _wall_time(progress, offset).isoformat(),
+                "message": f"{verb} task: {tasks[index].caption}",
+                "severity": 0,
+            }
+        )
+        progress["reported"] = position + 1
+    if progress["reported"] != reported:
+        session.changed(LAZY_PROGRESS_KEY)
+
+    # Derive task states and the overall percentage
+    completed = 0
+    fraction = 0.0
+    offset = 0.0
+    for task, duration in zip(tasks, schedule):
+        if duration is None:
+            completed += 1
+            continue
+
+        if active >= offset + duration:
+            status = TaskStatusEnum.COMPLETED
+            completed += 1
+        elif active >= offset:
+            if session["status"] == UpgradeStatusEnum.PAUSED:
+                status = TaskStatusEnum.PAUSED
+            else:
+                status = TaskStatusEnum.IN_PROGRESS
+            fraction = (active - offset) / duration
+        else:
+            status = TaskStatusEnum.PENDING
+        if task.status != status:
+            set_task_status(session["id"], task, status)
+        offset += duration
+
+    if completed < len(tasks):
+        session["percentComplete"] = int((completed + fraction) / len(tasks) * 100)
+        return session
+
+    # All tasks are done
+    end_time = _wall_time(progress, offset)
+    session["status"] = UpgradeStatusEnum.COMPLETED
+    session["percentComplete"] = 100
+    session["endTime"] = end_time.isoformat()
+    session["elapsedTime"] = format_timedelta(
+        end_time - datetime.fromisoformat(session["startTime"])
+    )
+    del session[LAZY_PROGRESS_KEY]
+    running_lazy_sessions.discard(session["id"])
+    forget_speed_factor(session["id"])
+
+    # Remove candidate after successful upgrade
+    candidate_id = session.get("candidate")
+    if candidate_id in candidate_software_versions:
+        del candidate_software_versions[candidate_id]
+        notify_state_changed(CANDIDATE_SOFTWARE)
+        logger.info(f"Removed candidate {candidate_id} after successful upgrade")
+
+    logger.info(f"Upgrade session {session.get('id')} completed successfully")
+    return session
+
+
+def refresh_running_sessions():
+    """Bring every lazily progressed session that has not finished up to date."""
+    for session_id in list(running_lazy_sessions):
+        session = upgrade_sessions.get(session_id)
+        if session is None or not is_lazy(session):
+            running_lazy_sessions.discard(session_id)
+        else:
+            refresh_session(session)
+
+
+def pause_lazy_progress(session: Dict[str, Any]):
+    """Freeze the derived progress of a session that has just been paused."""
+    progress = session.get(LAZY_PROGRESS_KEY)
+    if progress is not None and progress["pausedAt"] is None:
+        progress["pausedAt"] = _seconds_since_start(progress)
+        session.changed(LAZY_PROGRESS_KEY)
+
+
+def resume_lazy_progress(session: Dict[str, Any]):
+    """Let the derived progress of a resumed session continue."""
+    progress = session.get(LAZY_PROGRESS_KEY)
+    if progress is None or progress["pausedAt"] is None:
+        return
+
+    active = _active_seconds(progress)
+    paused_for = _seconds_since_start(progress) - progress["pausedAt"]
+    progress["pauses"].append([active, paused_for])
+    progress["pausedAt"] = None
+    session.changed(LAZY_PROGRESS_KEY)
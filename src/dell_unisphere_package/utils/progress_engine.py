@@ -0,0 +1,182 @@
+"""Progress engine for Dell Unisphere API.
+
+This module drives the progress of every running upgrade task from a single
+coroutine, so the number of timers stays constant regardless of how many upgrade
+sessions are being simulated.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from ..models.storage import system_config, upgrade_sessions
+from ..schemas.base import UpgradeStatusEnum
+from .clock import get_clock
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Default interval in seconds between two progress ticks. Task completion is
+# detected on tick boundaries, so this is also the timing granularity of tasks.
+PROGRESS_TICK_INTERVAL = 0.25
+
+
+class _TaskEntry:
+    """A running task registered with the progress engine."""
+
+    __slots__ = ("session_id", "task_index", "total_tasks", "duration", "deadline")
+
+    def __init__(self, session_id, task_index, total_tasks, duration, deadline):
+        self.session_id = session_id
+        self.task_index = task_index
+        self.total_tasks = total_tasks
+        self.duration = duration
+        self.deadline = deadline
+
+
+class ProgressEngine:
+    """Advances all running upgrade tasks on a shared tick.
+
+    Each running task is an entry keyed by its completion deadline in engine time
+    (the sum of clock time elapsed while the engine had work). On every tick the
+    engine updates percentComplete of every session in one batch and completes
+    the tasks whose deadline has passed, popping them from a heap. Tasks of paused
+    sessions are handed back to their simulation along with the time they still
+    need, so paused sessions cost nothing while they wait.
+    """
+
+    def __init__(self):
+        """Initialize the engine."""
+        self._entries: Dict[_TaskEntry, asyncio.Future] = {}
+        self._deadlines: List[Tuple[float, int, _TaskEntry]] = []
+        self._sequence = itertools.count()
+        self._driver: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clock = None
+        self._clock_time = 0.0
+        self._engine_time = 0.0
+        self.ticks = 0
+
+    @property
+    def tick_interval(self) -> float:
+        """Seconds between two progress ticks, as configured."""
+        return system_config.get("progress_tick_interval") or PROGRESS_TICK_INTERVAL
+
+    def _now(self) -> float:
+        """Return the current engine time."""
+        clock = get_clock()
+        if clock is not self._clock:
+            # The clock was swapped (e.g. real to virtual time); restart the time base
+            self._clock = clock
+            self._clock_time = clock.time()
+        now = clock.time()
+        self._engine_time += max(now - self._clock_time, 0.0)
+        self._clock_time = now
+        return self._engine_time
+
+    def _ensure_driver(self):
+        """Start the driver coroutine on the running loop if it is not running."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Entries of a previous (closed) loop can never be completed
+            self._loop = loop
+            self._entries.clear()
+            self._deadlines.clear()
+            self._driver = None
+        if self._driver is None or self._driver.done():
+            self._clock = None
+            self._now()
+            self._driver = loop.create_task(self._drive(), name="progress-engine")
+
+    async def run_task(
+        self,
+        session_id: str,
+        task_index: int,
+        total_tasks: int,
+        duration: float,
+        remaining: Optional[float] = None,
+    ) -> float:
+        """Run a task until it completes or its session is paused.
+
+        Args:
+            session_id: ID of the upgrade session
+            task_index: Index of the task in the session's tasks list
+            total_tasks: Total number of tasks in the session
+            duration: Full duration of the task in clock seconds
+            remaining: Time the task still needs, if it was interrupted before
+
+        Returns:
+            The remaining duration: 0.0 when the task completed, otherwise the time
+            still needed once the session is resumed
+        """
+        if remaining is None:
+            remaining = duration
+        if remaining <= 0:
+            return 0.0
+
+        self._ensure_driver()
+        entry = _TaskEntry(
+            session_id, task_index, total_tasks, duration, self._now() + remaining
+        )
+        future = asyncio.get_running_loop().create_future()
+        self._entries[entry] = future
+        heapq.heappush(self._deadlines, (entry.deadline, next(self._sequence), entry))
+        try:
+            return await future
+        finally:
+            # Completed entries are already gone; cancelled ones are dropped here
+            # and lazily skipped when they surface in the deadline heap
+            self._entries.pop(entry, None)
+
+    async def _drive(self):
+        """Tick until no task is registered any more."""
+        while self._entries:
+            await get_clock().sleep(self.tick_interval)
+            self._tick()
+
+    def _tick(self):
+        """Update progress of all running tasks and complete the due ones."""
+        now = self._now()
+        self.ticks += 1
+
+        # Complete every task whose deadline has passed
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, entry = heapq.heappop(self._deadlines)
+            future = self._entries.pop(entry, None)
+            if future is None or future.done():
+                continue
+            session = upgrade_sessions.get(entry.session_id)
+            if session is not None:
+                session["percentComplete"] = int(
+                    (entry.task_index + 1) / entry.total_tasks * 100
+                )
+            future.set_result(0.0)
+
+        # Batch the progress update of every task that is still running
+        for entry, future in list(self._entries.items()):
+            if future.done():
+                del self._entries[entry]
+                continue
+
+            session = upgrade_sessions.get(entry.session_id)
+            remaining = entry.deadline - now
+            if session is None or session["status"] == UpgradeStatusEnum.PAUSED:
+                # Hand the task back; the simulation waits for the resume event
+                del self._entries[entry]
+                future.set_result(remaining)
+                continue
+
+            progress = 1 - remaining / entry.duration if entry.duration else 1
+            session["percentComplete"] = int(
+                (entry.task_index + progress) / entry.total_tasks * 100
+            )
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters describing the engine's current load."""
+        return {
+            "running_tasks": len(self._entries),
+            "tick_interval": self.tick_interval,
+            "ticks": self.ticks,
+        }
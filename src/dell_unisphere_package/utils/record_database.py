@@ -0,0 +1,546 @@
+"""Record database for Dell Unisphere API.
+
+This module stores the upgrade sessions and candidate software versions in a
+SQLite database, one row per record holding its JSON. The values of the upgrade
+sessions' indexed fields are kept in columns of their own with an index each, so
+sessions can be listed by status or creation time without reading their JSON.
+
+The database is opened in WAL mode: a write commits by appending to the
+write-ahead log, so a crash loses nothing that was committed, and readers in
+other connections or processes are not blocked while it is written. Statements
+are parameterized, and the sqlite3 module keeps them compiled between calls.
+
+Processes sharing the database (see utils/shared_state.py) also use it for login
+sessions and leases, and give their connection an origin: the records it writes
+are then listed in a table of changes, from which the other processes learn what
+to read again.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+# Version of the database schema, kept in its user_version
+SCHEMA_VERSION = 2
+
+# Table names
+SESSIONS_TABLE = "upgrade_sessions"
+CANDIDATES_TABLE = "candidate_software"
+LOGIN_SESSIONS_TABLE = "login_sessions"
+VALUES_TABLE = "shared_values"
+CHANGES_TABLE = "changes"
+LEASES_TABLE = "leases"
+
+# Kinds of records listed in the table of changes
+SESSION_CHANGE = "session"
+CANDIDATE_CHANGE = "candidate"
+LOGIN_SESSION_CHANGE = "login_session"
+
+
+def _column(field: str) -> str:
+    """Return the quoted name of the column holding a field's values."""
+    return '"' + field.replace('"', '""') + '"'
+
+
+def _column_value(value: Any) -> Any:
+    """Return the value stored in an indexed column for a field's value."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    # Values SQLite has no type for are compared as their text
+    return str(value)
+
+
+class RecordDatabase:
+    """SQLite database holding the upgrade sessions and candidate software versions.
+
+    A connection is shared by the threads of the process; calls are serialized by a
+    lock, and writes made within transaction() are committed together.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        fields: Iterable[str] = (),
+        decode_session: Callable[[Any], Any] = None,
+        decode_candidate: Callable[[Any], Any] = None,
+    ):
+        """Open the database, creating its tables if needed.
+
+        Args:
+            path: The database file
+            fields: Indexed fields of the upgrade sessions, stored in columns
+            decode_session: Function restoring an upgrade session loaded from JSON
+            decode_candidate: Function restoring a candidate software version
+        """
+        self.path = Path(path)
+        self.fields: List[str] = sorted(fields)
+        self.decode_session = decode_session
+        self.decode_candidate = decode_candidate
+        # Name of the process writing through the connection; when set, the
+        # records it writes are listed in the table of changes
+        self.origin: Optional[str] = None
+        self._lock = threading.RLock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are managed by transaction(), not by the sqlite3 module
+        self._connection = sqlite3.connect(
+            str(self.path), isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # Committed transactions survive a crash of the process; only a power loss
+        # can lose the last ones
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._create_tables()
+
+        columns = ", ".join(_column(field) for field in self.fields)
+        placeholders = ", ".join("?" for _ in self.fields)
+        updates = ", ".join(
+            f"{_column(field)} = excluded.{_column(field)}" for field in self.fields
+        )
+        # New sessions are placed after every other; updated ones keep their place
+        self._put_session_sql = (
+            f"INSERT INTO {SESSIONS_TABLE} (id, position, data"
+            f"{', ' + columns if columns else ''}) "
+            f"VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM {SESSIONS_TABLE}), "
+            f"?{', ' + placeholders if placeholders else ''}) "
+            f"ON CONFLICT(id) DO UPDATE SET data = excluded.data"
+            f"{', ' + updates if updates else ''}"
+        )
+        self._index_sql = (
+            f"SELECT id{', ' + columns if columns else ''} "
+            f"FROM {SESSIONS_TABLE} ORDER BY position"
+        )
+
+    def _create_tables(self):
+        with self.transaction():
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            # Version 1 lacks the tables of shared state, which are added below
+            if version not in (0, 1, SCHEMA_VERSION):
+                raise ValueError(
+                    f"Unsupported state database version {version} in {self.path}"
+                )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE} ("
+                "id TEXT PRIMARY KEY, position INTEGER NOT NULL, data TEXT NOT NULL)"
+            )
+            existing = {
+                row[1]
+                for row in self._connection.execute(
+                    f"PRAGMA table_info({SESSIONS_TABLE})"
+                )
+            }
+            for field in self.fields:
+                if field not in existing:
+                    self._connection.execute(
+                        f"ALTER TABLE {SESSIONS_TABLE} ADD COLUMN {_column(field)}"
+                    )
+                self._connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS "
+                    f"{_column(SESSIONS_TABLE + '_' + field)} "
+                    f"ON {SESSIONS_TABLE} ({_column(field)})"
+                )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {SESSIONS_TABLE}_position "
+                f"ON {SESSIONS_TABLE} (position)"
+            )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {CANDIDATES_TABLE} ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {LOGIN_SESSIONS_TABLE} ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, client TEXT, "
+                "last_access REAL NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {LOGIN_SESSIONS_TABLE}_client "
+                f"ON {LOGIN_SESSIONS_TABLE} (client)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {LOGIN_SESSIONS_TABLE}_last_access "
+                f"ON {LOGIN_SESSIONS_TABLE} (last_access)"
+            )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {VALUES_TABLE} ("
+                "name TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (name, id))"
+            )
+            # Sequence numbers only grow, even after the oldest changes are removed
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, "
+                "id TEXT NOT NULL, origin TEXT NOT NULL, time REAL NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {LEASES_TABLE} ("
+                "name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def transaction(self):
+        """Commit the writes made within the block together, or none of them."""
+        with self._lock:
+            if self._connection.in_transaction:
+                yield  # Part of an enclosing transaction
+                return
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def put_sessions(self, sessions: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """Insert or replace upgrade sessions.
+
+        Args:
+            sessions: Tuples of a session's ID, its encoded JSON and the values of
+                its indexed fields
+        """
+        rows = [
+            (key, data, *(_column_value(indexed.get(field)) for field in self.fields))
+            for key, data, indexed in sessions
+        ]
+        with self.transaction():
+            self._connection.executemany(self._put_session_sql, rows)
+            self._record_changes(SESSION_CHANGE, (row[0] for row in rows))
+
+    def delete_sessions(self, keys: Iterable[str]):
+        """Delete upgrade sessions, if they exist."""
+        keys = list(keys)
+        with self.transaction():
+            self._connection.executemany(
+                f"DELETE FROM {SESSIONS_TABLE} WHERE id = ?", ((key,) for key in keys)
+            )
+            self._record_changes(SESSION_CHANGE, keys)
+
+    def _record_changes(self, kind: str, keys: Iterable[str]):
+        """List written records in the table of changes, if the connection has an
+        origin."""
+        if self.origin is None:
+            return
+        now = time.time()
+        self._connection.executemany(
+            f"INSERT INTO {CHANGES_TABLE} (kind, id, origin, time) VALUES (?, ?, ?, ?)",
+            ((kind, key, self.origin, now) for key in keys),
+        )
+
+    def session_index(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Iterate the upgrade sessions' IDs and indexed fields, in the order they
+        were added, without reading their JSON."""
+        with self._lock:
+            rows = self._connection.execute(self._index_sql).fetchall()
+        for key, *values in rows:
+            yield key, {
+                field: value
+                for field, value in zip(self.fields, values)
+                if value is not None
+            }
+
+    def session_ids_where(self, field: str, value: Any) -> List[str]:
+        """Return the IDs of the upgrade sessions whose indexed field has a value."""
+        if field not in self.fields:
+            raise KeyError(f"Field is not indexed: {field}")
+        with self._lock:
+            return [
+                row[0]
+                for row in self._connection.execute(
+                    f"SELECT id FROM {SESSIONS_TABLE} WHERE {_column(field)} = ? "
+                    "ORDER BY position",
+                    (_column_value(value),),
+                )
+            ]
+
+    def read(self, key: str) -> str:
+        """Return the encoded JSON of an upgrade session."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT data FROM {SESSIONS_TABLE} WHERE id = ?", (key,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def load(self, key: str) -> Any:
+        """Read and decode an upgrade session, as the loader of an IndexedStore."""
+        session = json.loads(self.read(key))
+        return session if self.decode_session is None else self.decode_session(session)
+
+    def put_candidates(self, candidates: Iterable[Tuple[str, str]]):
+        """Insert or replace candidate software versions, given with their JSON."""
+        candidates = list(candidates)
+        with self.transaction():
+            self._connection.executemany(
+                f"INSERT INTO {CANDIDATES_TABLE} (id, data) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data",
+                candidates,
+            )
+            self._record_changes(CANDIDATE_CHANGE, (key for key, _ in candidates))
+
+    def delete_candidates(self, keys: Iterable[str]):
+        """Delete candidate software versions, if they exist."""
+        keys = list(keys)
+        with self.transaction():
+            self._connection.executemany(
+                f"DELETE FROM {CANDIDATES_TABLE} WHERE id = ?", ((key,) for key in keys)
+            )
+            self._record_changes(CANDIDATE_CHANGE, keys)
+
+    def read_candidate(self, key: str) -> Optional[str]:
+        """Return the encoded JSON of a candidate software version, if it exists."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT data FROM {CANDIDATES_TABLE} WHERE id = ?", (key,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def read_candidates(self) -> Dict[str, str]:
+        """Return the encoded JSON of every candidate software version."""
+        with self._lock:
+            return dict(
+                self._connection.execute(f"SELECT id, data FROM {CANDIDATES_TABLE}")
+            )
+
+    def load_candidates(self) -> Dict[str, Any]:
+        """Read and decode every candidate software version."""
+        candidates = {}
+        for key, data in self.read_candidates().items():
+            candidate = json.loads(data)
+            if self.decode_candidate is not None:
+                candidate = self.decode_candidate(candidate)
+            candidates[key] = candidate
+        return candidates
+
+    # Named collections of values shared by the processes using the database,
+    # such as the system configuration; changes are listed under their name
+
+    def put_values(self, name: str, values: Iterable[Tuple[str, str]]):
+        """Insert or replace values of a collection, given with their JSON."""
+        values = list(values)
+        with self.transaction():
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {VALUES_TABLE} (name, id, data) "
+                "VALUES (?, ?, ?)",
+                ((name, key, data) for key, data in values),
+            )
+            self._record_changes(name, (key for key, _ in values))
+
+    def delete_values(self, name: str, keys: Iterable[str]):
+        """Delete values of a collection, if they exist."""
+        keys = list(keys)
+        with self.transaction():
+            self._connection.executemany(
+                f"DELETE FROM {VALUES_TABLE} WHERE name = ? AND id = ?",
+                ((name, key) for key in keys),
+            )
+            self._record_changes(name, keys)
+
+    def read_value(self, name: str, key: str) -> Optional[str]:
+        """Return the encoded JSON of a value of a collection, if it exists."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT data FROM {VALUES_TABLE} WHERE name = ? AND id = ?",
+                (name, key),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def read_values(self, name: str) -> Dict[str, str]:
+        """Return the encoded JSON of every value of a collection."""
+        with self._lock:
+            return dict(
+                self._connection.execute(
+                    f"SELECT id, data FROM {VALUES_TABLE} WHERE name = ?", (name,)
+                )
+            )
+
+    # Login sessions, shared by the processes using the database
+
+    def put_login_session(
+        self, key: str, data: Any, client: Optional[Hashable], last_access: float
+    ):
+        """Insert or replace a login session.
+
+        Args:
+            key: ID of the login session
+            data: Session data, encoded as JSON
+            client: Optional key of the client the session belongs to
+            last_access: Time the session was last used, in seconds since the epoch
+        """
+        with self.transaction():
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {LOGIN_SESSIONS_TABLE} "
+                "(id, data, client, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(data), _client_key(client), last_access),
+            )
+
+    def touch_login_session(self, key: str, last_access: float):
+        """Record that a login session has been used."""
+        with self.transaction():
+            self._connection.execute(
+                f"UPDATE {LOGIN_SESSIONS_TABLE} SET last_access = ? WHERE id = ?",
+                (last_access, key),
+            )
+
+    def read_login_session(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return the data of a login session and the time it was last used."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT data, last_access FROM {LOGIN_SESSIONS_TABLE} WHERE id = ?",
+                (key,),
+            ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def find_login_session(self, client: Hashable) -> Optional[str]:
+        """Return the ID of the most recently used login session of a client."""
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT id FROM {LOGIN_SESSIONS_TABLE} WHERE client = ? "
+                "ORDER BY last_access DESC LIMIT 1",
+                (_client_key(client),),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def delete_login_sessions(self, keys: Iterable[str]):
+        """Delete login sessions, as when their users log out."""
+        keys = list(keys)
+        with self.transaction():
+            self._connection.executemany(
+                f"DELETE FROM {LOGIN_SESSIONS_TABLE} WHERE id = ?",
+                ((key,) for key in keys),
+            )
+            self._record_changes(LOGIN_SESSION_CHANGE, keys)
+
+    def delete_idle_login_sessions(self, last_access: float) -> int:
+        """Delete the login sessions unused since a time.
+
+        Returns:
+            The number of deleted sessions
+        """
+        with self.transaction():
+            return self._connection.execute(
+                f"DELETE FROM {LOGIN_SESSIONS_TABLE} WHERE last_access < ?",
+                (last_access,),
+            ).rowcount
+
+    # Changes and leases, for the processes sharing the database
+
+    def data_version(self) -> int:
+        """Return a number that changes when another connection commits a write."""
+        with self._lock:
+            return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def last_change(self) -> int:
+        """Return the sequence number of the last change listed."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGES_TABLE,)
+            ).fetchone()
+        return 0 if row is None else row[0]
+
+    def changes_since(self, seq: int) -> Tuple[bool, List[Tuple[int, str, str, str]]]:
+        """Return the changes listed after a sequence number.
+
+        Returns:
+            Whether every change after the sequence number is still listed, and the
+            (sequence number, kind, ID, origin) of those listed
+        """
+        with self._lock:
+            first = self._connection.execute(
+                f"SELECT MIN(seq) FROM {CHANGES_TABLE}"
+            ).fetchone()[0]
+            changes = self._connection.execute(
+                f"SELECT seq, kind, id, origin FROM {CHANGES_TABLE} WHERE seq > ? "
+                "ORDER BY seq",
+                (seq,),
+            ).fetchall()
+        complete = first is None or first <= seq + 1
+        return complete, changes
+
+    def trim_changes(self, before: float) -> int:
+        """Remove the changes listed before a time.
+
+        Returns:
+            The number of removed changes
+        """
+        with self.transaction():
+            return self._connection.execute(
+                f"DELETE FROM {CHANGES_TABLE} WHERE time < ?", (before,)
+            ).rowcount
+
+    def acquire_lease(
+        self, name: str, holder: str, duration: float, now: float = None
+    ) -> bool:
+        """Take or renew a lease, unless another holder's lease is still running.
+
+        Args:
+            name: Name of the lease
+            holder: Name of the process asking for it
+            duration: Seconds the lease lasts unless renewed
+            now: Current time in seconds since the epoch
+
+        Returns:
+            True if the holder has the lease
+        """
+        now = time.time() if now is None else now
+        with self.transaction():
+            return (
+                self._connection.execute(
+                    f"INSERT INTO {LEASES_TABLE} (name, holder, expires) "
+                    "VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+                    "holder = excluded.holder, expires = excluded.expires "
+                    f"WHERE {LEASES_TABLE}.holder = excluded.holder "
+                    f"OR {LEASES_TABLE}.expires < ?",
+                    (name, holder, now + duration, now),
+                ).rowcount
+                > 0
+            )
+
+    def lease_holder(self, name: str, now: float = None) -> Optional[str]:
+        """Return the holder of a lease that is still running, if any."""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT holder FROM {LEASES_TABLE} WHERE name = ? AND expires >= ?",
+                (name, now),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def release_lease(self, name: str, holder: str):
+        """Give up a lease, if the holder has it."""
+        with self.transaction():
+            self._connection.execute(
+                f"DELETE FROM {LEASES_TABLE} WHERE name = ? AND holder = ?",
+                (name, holder),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _client_key(client: Optional[Hashable]) -> Optional[str]:
+    """Return the text a login session's client key is stored as."""
+    return None if client is None else json.dumps(client)
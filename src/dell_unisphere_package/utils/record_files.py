@@ -0,0 +1,136 @@
+"""Record files for Dell Unisphere API.
+
+This module stores a collection of records, such as the upgrade sessions, as a
+directory holding one JSON file per record. Each file is written to a temporary
+file and atomically renamed over the previous one, so a crash leaves every record
+either at its old or at its new version, and changing a record only rewrites that
+record.
+
+A directory can also hold an index, with the values of some fields of every
+record, so the records can be added to a store without being read (see
+IndexedStore.add_unloaded). Keeping it up to date is left to the caller.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote, unquote
+
+# Suffix of the record files
+RECORD_SUFFIX = ".json"
+
+# Name of the index file, which cannot be the name of a record file
+INDEX_FILE_NAME = ".index"
+
+
+class RecordFiles:
+    """Directory holding one JSON file per record."""
+
+    def __init__(self, directory: Path, decode: Callable[[Any], Any] = None):
+        """Initialize the record files.
+
+        Args:
+            directory: The directory holding the files
+            decode: Function restoring a record loaded from JSON
+        """
+        self.directory = Path(directory)
+        self.decode = decode
+
+    def _path(self, key: str) -> Path:
+        # Keys are quoted so they make valid file names that cannot clash
+        return self.directory / (quote(key, safe="") + RECORD_SUFFIX)
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / INDEX_FILE_NAME
+
+    def exists(self) -> bool:
+        """Check whether the directory exists."""
+        return self.directory.is_dir()
+
+    def scan(self) -> Iterator[Tuple[str, int]]:
+        """Iterate the keys of the stored records with the time their file changed.
+
+        Yields:
+            (key, modification time in nanoseconds) pairs
+        """
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith(".") or not name.endswith(RECORD_SUFFIX):
+                    continue
+                try:
+                    mtime_ns = entry.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue  # Deleted while scanning
+                yield unquote(name[: -len(RECORD_SUFFIX)]), mtime_ns
+
+    def _write(self, path: Path, data: bytes) -> int:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=str(self.directory), prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, str(path))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return len(data)
+
+    def write(self, key: str, data: bytes) -> int:
+        """Replace the file of a record with its encoded JSON.
+
+        Returns:
+            The number of bytes written
+        """
+        return self._write(self._path(key), data)
+
+    def delete(self, key: str):
+        """Remove the file of a record, if it exists."""
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def read(self, key: str) -> bytes:
+        """Return the encoded JSON of a record."""
+        return self._path(key).read_bytes()
+
+    def load(self, key: str) -> Any:
+        """Read and decode a record, as the loader of an IndexedStore."""
+        record = json.loads(self.read(key))
+        return record if self.decode is None else self.decode(record)
+
+    def load_all(self) -> Dict[str, Any]:
+        """Read and decode every record."""
+        return {key: self.load(key) for key, _ in self.scan()}
+
+    def write_index(self, data: bytes) -> int:
+        """Replace the index with its encoded JSON.
+
+        Returns:
+            The number of bytes written
+        """
+        return self._write(self.index_path, data)
+
+    def delete_index(self):
+        """Remove the index, if it exists."""
+        try:
+            self.index_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def read_index(self) -> Optional[Dict[str, Any]]:
+        """Read the index.
+
+        Returns:
+            The index, or None if there is no valid index
+        """
+        try:
+            with open(self.index_path, "rb") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,518 @@
+"""Shared state for Dell Unisphere API.
+
+Several server processes, such as the workers of `uvicorn --workers N`, can serve
+the mock behind one port when they share its state. Each process keeps its state
+in memory as usual and saves it in the state database (the 'sqlite' persistence
+mode), whose connection then lists every record it writes in a table of changes.
+Before handling a request, a process reads the records other processes changed
+since it last looked, and it saves its own changes before sending the response,
+so a client sees the same upgrade sessions whichever process answers it. Records
+changed concurrently by two processes keep the last version saved. The database
+is read and written in worker threads, as another process may keep it locked for
+a while, and the records read are then stored on the event loop.
+
+Login sessions are kept in the database as well, so a client can log in through
+one process and go on through another. The system configuration, the uploaded
+files and the per-session simulation speeds are shared as named collections of
+values.
+
+Upgrade simulations run in a single process, the leader, which holds a lease in
+the database and renews it every SHARED_STATE_INTERVAL seconds. Other processes
+leave the simulation of the sessions they create or resume to it, and when it
+stops renewing its lease, e.g. because it crashed, another process takes over
+the upgrade sessions in progress. Sessions in lazy progress mode have no
+background simulation and progress in whichever process reads them.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import anyio
+
+from ..models.session_store import SessionStore
+from ..schemas.base import UpgradeStatusEnum
+from . import state_persistence
+from .lazy_progress import is_lazy, running_lazy_sessions
+from .record_database import (
+    CANDIDATE_CHANGE,
+    LOGIN_SESSION_CHANGE,
+    SESSION_CHANGE,
+    RecordDatabase,
+)
+from .state_codec import encode_state
+from .state_persistence import StateDatabase
+from .upgrade_simulator import (
+    forget_running_tasks,
+    notify_session_resumed,
+    scheduler,
+    start_upgrade_simulation,
+    track_running_tasks,
+)
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Environment variable turning the shared state on, e.g. UNISPHERE_SHARED_STATE=1
+SHARED_STATE_ENV = "UNISPHERE_SHARED_STATE"
+
+# Name of the lease held by the process running the upgrade simulations
+SIMULATOR_LEASE = "simulator"
+
+# Seconds a lease lasts unless renewed
+LEASE_DURATION = 5.0
+
+# Seconds between two rounds of reading changes, saving them and renewing the lease
+SHARED_STATE_INTERVAL = 0.5
+
+# Seconds changes stay listed; a process that has not looked for longer reads
+# the whole state again
+CHANGE_RETENTION = 600.0
+
+# Seconds between two removals of old changes and idle login sessions by the leader
+MAINTENANCE_INTERVAL = 60.0
+
+# Name of the file locked while a process loads the state on startup
+STARTUP_LOCK_FILE = "startup.lock"
+
+# Records read from the database as (kind of change, key, record or None if it was
+# deleted), and whether they are the whole state rather than the changed records
+_Records = Tuple[bool, List[Tuple[str, str, Any]]]
+
+
+def shared_state_enabled() -> bool:
+    """Check whether the environment asks for the state to be shared."""
+    return os.environ.get(SHARED_STATE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+@contextmanager
+def startup_lock() -> Iterator[None]:
+    """Hold a lock on the state directory, so processes starting together load
+    and migrate the saved state one at a time."""
+    state_persistence.STATE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(state_persistence.STATE_DIR / STARTUP_LOCK_FILE, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def last_shared_change() -> int:
+    """Return the sequence number of the last change listed in the state database.
+
+    It is read before the state is loaded, so that the changes other processes
+    make while it loads are read afterwards.
+    """
+    if not state_persistence.STATE_DATABASE_FILE.exists():
+        return 0
+    database = RecordDatabase(state_persistence.STATE_DATABASE_FILE)
+    try:
+        return database.last_change()
+    finally:
+        database.close()
+
+
+class SharedState:
+    """State of a process shared with the other processes using the database."""
+
+    def __init__(
+        self,
+        state_database: StateDatabase,
+        login_sessions: SessionStore,
+        collections: Dict[str, Dict[str, Any]],
+        since: int = 0,
+    ):
+        """Initialize the shared state.
+
+        Args:
+            state_database: State database the upgrade sessions are saved in
+            login_sessions: The login session store
+            collections: Dictionaries shared as named collections of values
+            since: Sequence number of the last change reflected in the loaded state
+        """
+        self.state_database = state_database
+        self.database = state_database.database
+        self.upgrade_sessions = state_database.upgrade_sessions
+        self.login_sessions = login_sessions
+        self.collections = collections
+        self.origin = uuid.uuid4().hex
+        self.is_leader = False
+        self._last_change = since
+        self._data_version: Optional[int] = None
+        # Encoded values of the collections, as last read or saved
+        self._saved_values: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.RLock()
+        self._last_maintenance = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.changes_read = 0
+        self.resyncs = 0
+        self.terms = 0
+
+    def attach(self):
+        """Start listing changes and sharing login sessions and collections.
+
+        Collections saved by processes that are still running, as shown by a
+        running simulator lease, replace the local values; otherwise the local
+        values replace the saved ones, as they would on a restart.
+        """
+        self.database.origin = self.origin
+        self.login_sessions.backend = self.database
+        running = self.database.lease_holder(SIMULATOR_LEASE) is not None
+        for name, collection in self.collections.items():
+            saved = self.database.read_values(name)
+            if running:
+                collection.clear()
+                collection.update(
+                    (key, json.loads(data)) for key, data in saved.items()
+                )
+            self._saved_values[name] = saved
+        self.publish()
+
+    def detach(self):
+        """Stop sharing the state, giving up the lease if held."""
+        if self.is_leader:
+            self.is_leader = False
+            self.database.release_lease(SIMULATOR_LEASE, self.origin)
+        self.login_sessions.backend = None
+        self.database.origin = None
+
+    # Changes made by other processes
+
+    def refresh(self) -> int:
+        """Read the records other processes changed since the last refresh.
+
+        It only queries the database's data version when nothing was committed by
+        another connection, so it is cheap enough to call before every request.
+
+        Returns:
+            The number of changed records read
+        """
+        return self._store(self._read())
+
+    async def refresh_in_thread(self) -> int:
+        """Refresh, reading the database in a worker thread; see refresh()."""
+        return self._store(await anyio.to_thread.run_sync(self._read))
+
+    def _read(self) -> Optional[_Records]:
+        """Read the records changed since the last refresh, or the whole state when
+        changes were removed before this process read them."""
+        with self._lock:
+            data_version = self.database.data_version()
+            if data_version == self._data_version:
+                return None
+            self._data_version = data_version
+            self.refreshes += 1
+
+            complete, changes = self.database.changes_since(self._last_change)
+            if changes:
+                self._last_change = changes[-1][0]
+            if not complete:
+                logger.warning("Reading the whole shared state again")
+                return True, self._read_all()
+
+            # Each record is read once, however many times it changed
+            changed = {
+                (kind, key): None
+                for _, kind, key, origin in changes
+                if origin != self.origin
+            }
+            return False, [
+                (kind, key, self._read_record(kind, key)) for kind, key in changed
+            ]
+
+    def _read_record(self, kind: str, key: str) -> Any:
+        if kind == SESSION_CHANGE:
+            try:
+                return self.database.load(key)
+            except KeyError:
+                return None
+        if kind == CANDIDATE_CHANGE:
+            return self.database.read_candidate(key)
+        if kind in self.collections:
+            return self.database.read_value(kind, key)
+        # Only logouts are listed; new login sessions are read when first used
+        return None
+
+    def _read_all(self) -> List[Tuple[str, str, Any]]:
+        records = [
+            (SESSION_CHANGE, key, self.database.load(key))
+            for key, _ in self.database.session_index()
+        ]
+        records += [
+            (CANDIDATE_CHANGE, key, data)
+            for key, data in self.database.read_candidates().items()
+        ]
+        for name in self.collections:
+            records += [
+                (name, key, data)
+                for key, data in self.database.read_values(name).items()
+            ]
+        return records
+
+    def _store(self, read: Optional[_Records]) -> int:
+        """Store the records read, on the event loop as simulations may start.
+
+        It does not wait for the lock, which is held while the database is read
+        or written.
+        """
+        if read is None:
+            return 0
+        whole_state, records = read
+        for kind, key, record in records:
+            self._store_record(kind, key, record)
+        if whole_state:
+            self._remove_unsaved(records)
+            return 0
+        self.changes_read += len(records)
+        return len(records)
+
+    def _store_record(self, kind: str, key: str, record: Any):
+        if kind == SESSION_CHANGE:
+            if record is None:
+                self._session_deleted(key)
+            else:
+                self._session_changed(key, record)
+        elif kind == CANDIDATE_CHANGE:
+            self.state_database.merge_candidate(key, record)
+        elif kind == LOGIN_SESSION_CHANGE:
+            self.login_sessions.forget(key)
+        elif kind in self.collections:
+            self._value_changed(kind, key, record)
+
+    def _session_changed(self, key: str, session: Dict[str, Any]):
+        self.upgrade_sessions.merge(key, session)
+        track_running_tasks(key)
+        session = self.upgrade_sessions[key]
+        if is_lazy(session):
+            running_lazy_sessions.add(key)
+        elif self.is_leader:
+            if scheduler.is_active(key):
+                # The session may have been resumed
+                notify_session_resumed(key)
+            elif session.get("status") == UpgradeStatusEnum.IN_PROGRESS:
+                start_upgrade_simulation(key)
+
+    def _session_deleted(self, key: str):
+        self.upgrade_sessions.discard(key)
+        scheduler.cancel(key)
+        forget_running_tasks(key)
+        running_lazy_sessions.discard(key)
+
+    def _value_changed(self, name: str, key: str, data: Optional[str]):
+        collection, saved = self.collections[name], self._saved_values[name]
+        if data is None:
+            collection.pop(key, None)
+            saved.pop(key, None)
+        else:
+            collection[key] = json.loads(data)
+            saved[key] = data
+
+    def resync(self):
+        """Read the whole state again, as when changes were removed before this
+        process read them."""
+        logger.warning("Reading the whole shared state again")
+        with self._lock:
+            self._store((True, self._read_all()))
+
+    def _remove_unsaved(self, records: List[Tuple[str, str, Any]]):
+        """Remove what is not in the whole state read."""
+        self.resyncs += 1
+        saved = {(kind, key) for kind, key, _ in records}
+        for key in list(self.upgrade_sessions):
+            if (SESSION_CHANGE, key) not in saved:
+                self._session_deleted(key)
+        for key in list(self.state_database.candidate_software_versions):
+            if (CANDIDATE_CHANGE, key) not in saved:
+                self.state_database.merge_candidate(key, None)
+        for name, collection in self.collections.items():
+            for key in list(collection):
+                if (name, key) not in saved:
+                    self._value_changed(name, key, None)
+
+        # Login sessions are read again from the database when next used
+        self.login_sessions.clear()
+
+    # Changes made by this process
+
+    def publish(self) -> int:
+        """Save the changes of this process, so other processes can read them.
+
+        Returns:
+            The number of bytes written
+        """
+        with self._lock:
+            written = self.state_database.flush()
+            written += self.state_database.save_candidates()
+            for name, collection in self.collections.items():
+                written += self._save_values(name, collection)
+            return written
+
+    def _save_values(self, name: str, collection: Dict[str, Any]) -> int:
+        saved = self._saved_values[name]
+        values = {key: encode_state(value) for key, value in list(collection.items())}
+        changed = {key: data for key, data in values.items() if saved.get(key) != data}
+        # Values read from other processes may be stored meanwhile
+        removed = [key for key in list(saved) if key not in values]
+        if not (changed or removed):
+            return 0
+        with self.database.transaction():
+            self.database.put_values(name, changed.items())
+            self.database.delete_values(name, removed)
+        saved.update(changed)
+        for key in removed:
+            saved.pop(key, None)
+        return sum(len(data) for data in changed.values())
+
+    # Upgrade simulations
+
+    def elect(self, now: float = None) -> bool:
+        """Take or renew the simulator lease, taking over the upgrade sessions in
+        progress when it is taken and stopping the simulations when it is lost.
+
+        Returns:
+            True if this process is the leader
+        """
+        return self._follow_lease(self._acquire_lease(now))
+
+    def _acquire_lease(self, now: float = None) -> bool:
+        return self.database.acquire_lease(
+            SIMULATOR_LEASE, self.origin, LEASE_DURATION, now
+        )
+
+    def _follow_lease(self, leader: bool) -> bool:
+        """Start or stop the simulations as the lease was taken or lost."""
+        if leader and not self.is_leader:
+            self.is_leader = True
+            self.terms += 1
+            logger.info(f"Process {os.getpid()} now runs the upgrade simulations")
+            self._take_over()
+        elif not leader and self.is_leader:
+            self.is_leader = False
+            logger.warning(
+                f"Process {os.getpid()} lost the simulator lease, stopping simulations"
+            )
+            for key in list(scheduler.tasks):
+                scheduler.cancel(key)
+        return leader
+
+    def _take_over(self):
+        """Start the simulations of the upgrade sessions in progress."""
+        keys = self.upgrade_sessions.keys_where("status", UpgradeStatusEnum.IN_PROGRESS)
+        for key in self.upgrade_sessions.in_insertion_order(keys):
+            session = self.upgrade_sessions.get(key)
+            if session is None or is_lazy(session) or scheduler.is_active(key):
+                continue
+            track_running_tasks(key)
+            logger.info(f"Taking over upgrade simulation for session {key}")
+            start_upgrade_simulation(key)
+
+    def _maintain(self, now: float):
+        """Remove old changes and idle login sessions."""
+        if now - self._last_maintenance < MAINTENANCE_INTERVAL:
+            return
+        self._last_maintenance = now
+        self.database.trim_changes(now - CHANGE_RETENTION)
+        self.database.delete_idle_login_sessions(now - self.login_sessions.idle_timeout)
+
+    async def run(self):
+        """Read and save changes and renew the lease until cancelled."""
+        while True:
+            try:
+                await self.refresh_in_thread()
+                await anyio.to_thread.run_sync(self.publish)
+                leader = await anyio.to_thread.run_sync(self._acquire_lease)
+                if self._follow_lease(leader):
+                    await anyio.to_thread.run_sync(self._maintain, time.time())
+            except Exception as e:
+                logger.error(f"Failed to share the state: {e}")
+            await asyncio.sleep(SHARED_STATE_INTERVAL)
+
+    def start(self):
+        """Run the shared state's loop on the running event loop."""
+        self._task = asyncio.create_task(self.run(), name="shared-state")
+
+    async def stop(self):
+        """Stop the loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters describing the shared state."""
+        return {
+            "origin": self.origin,
+            "pid": os.getpid(),
+            "leader": self.is_leader,
+            "terms": self.terms,
+            "last_change": self._last_change,
+            "refreshes": self.refreshes,
+            "changes_read": self.changes_read,
+            "resyncs": self.resyncs,
+        }
+
+
+# The shared state of this process, while it runs
+_shared_state: Optional[SharedState] = None
+
+
+def start_shared_state(
+    state_database: StateDatabase,
+    login_sessions: SessionStore,
+    collections: Dict[str, Dict[str, Any]],
+    since: int = 0,
+) -> SharedState:
+    """Start sharing the state with the other processes using the state database.
+
+    The first process to start is elected right away. Must be called from the
+    event loop; see SharedState for the arguments.
+
+    Returns:
+        The running shared state
+    """
+    global _shared_state
+    if _shared_state is None:
+        _shared_state = SharedState(state_database, login_sessions, collections, since)
+        _shared_state.attach()
+        _shared_state.elect()
+        _shared_state.start()
+        logger.info(f"Sharing the state in {state_persistence.STATE_DATABASE_FILE}")
+    return _shared_state
+
+
+async def stop_shared_state():
+    """Stop sharing the state, saving the last changes and giving up the lease.
+
+    Upgrade simulations are stopped first, so the process taking over reads the
+    sessions as they were left.
+    """
+    global _shared_state
+    shared_state, _shared_state = _shared_state, None
+    if shared_state is not None:
+        await shared_state.stop()
+        await scheduler.shutdown()
+        shared_state.publish()
+        shared_state.detach()
+
+
+def get_shared_state() -> Optional[SharedState]:
+    """Return the shared state, if it runs."""
+    return _shared_state
+
+
+def runs_simulations() -> bool:
+    """Check whether this process runs upgrade simulations, as it does unless it
+    shares the state and another process is the leader."""
+    return _shared_state is None or _shared_state.is_leader
@@ -0,0 +1,144 @@
+"""Saved state encoding for Dell Unisphere API.
+
+This module converts the upgrade sessions and candidate software versions to and
+from the JSON saved on disk. Encoding is a single pass of the standard library's
+C encoder: the enums from schemas.base are int or str subclasses and are written as
+their values, and only task records, models, datetimes and sets go through a
+Python hook; other objects raise a TypeError rather than being saved as text that
+would not load back. The encoder takes a snapshot of each dictionary before
+writing it, so the state can be encoded from the state writer's thread while it
+changes.
+
+Decoding knows which fields of sessions, tasks and candidates hold enums, and
+restores them along with the task records, so a loaded session is stored as it
+was before it was saved.
+"""
+
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel
+
+from ..models.records import TASK_FIELDS, TaskRecord
+from ..schemas.base import (
+    TaskStatusEnum,
+    TaskTypeEnum,
+    UpgradeSessionTypeEnum,
+    UpgradeStatusEnum,
+    UpgradeTypeEnum,
+)
+
+# Enums of the upgrade session, task and candidate software version fields
+SESSION_ENUMS: Dict[str, Type[Enum]] = {
+    "status": UpgradeStatusEnum,
+    "type": UpgradeSessionTypeEnum,
+}
+TASK_ENUMS: Dict[str, Type[Enum]] = {
+    "status": TaskStatusEnum,
+    "type": TaskTypeEnum,
+}
+CANDIDATE_ENUMS: Dict[str, Type[Enum]] = {
+    "type": UpgradeTypeEnum,
+}
+
+
+def _encode_default(obj: Any) -> Any:
+    """Encode the objects the JSON encoder does not support natively."""
+    if isinstance(obj, TaskRecord):
+        return {name: getattr(obj, name) for name in TASK_FIELDS}
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), default=_encode_default)
+
+
+def encode_state(value: Any) -> str:
+    """Encode a part of the state, such as an upgrade session, as compact JSON."""
+    return _encoder.encode(value)
+
+
+def _enum_value(enum_class: Type[Enum], value: Any) -> Any:
+    """Return the enum member a saved value stands for, or the value if none."""
+    if isinstance(value, dict) and "_value_" in value:
+        # Enums were saved as their attributes by early versions
+        value = value["_value_"]
+    try:
+        return enum_class(value)
+    except ValueError:
+        return value
+
+
+def _decode_enums(data: Dict[str, Any], enums: Dict[str, Type[Enum]]):
+    for field, enum_class in enums.items():
+        if field in data:
+            data[field] = _enum_value(enum_class, data[field])
+
+
+def decode_task(task: Any) -> Any:
+    """Return the TaskRecord of a saved task."""
+    if not isinstance(task, dict):
+        return task
+    _decode_enums(task, TASK_ENUMS)
+    return TaskRecord.from_value(task)
+
+
+def decode_session_field(field: str, value: Any) -> Any:
+    """Return the value of a saved upgrade session field as it is stored."""
+    if field == "tasks" and isinstance(value, list):
+        return [decode_task(task) for task in value]
+    enum_class = SESSION_ENUMS.get(field)
+    if enum_class is not None:
+        return _enum_value(enum_class, value)
+    return value
+
+
+def decode_session(session: Any) -> Any:
+    """Restore the enums and task records of a saved upgrade session, in place."""
+    if isinstance(session, dict):
+        for field in ("tasks", *SESSION_ENUMS):
+            if field in session:
+                session[field] = decode_session_field(field, session[field])
+    return session
+
+
+def decode_sessions(sessions: Dict[str, Any]) -> Dict[str, Any]:
+    """Restore the saved upgrade sessions, in place."""
+    for session in sessions.values():
+        decode_session(session)
+    return sessions
+
+
+def decode_candidate(candidate: Any) -> Any:
+    """Restore the enums of a saved candidate software version, in place."""
+    if isinstance(candidate, dict):
+        _decode_enums(candidate, CANDIDATE_ENUMS)
+    return candidate
+
+
+def decode_candidates(candidates: Dict[str, Any]) -> Dict[str, Any]:
+    """Restore the enums of the saved candidate software versions, in place."""
+    for candidate in candidates.values():
+        decode_candidate(candidate)
+    return candidates
+
+
+def decode_change(change: Dict[str, Any]) -> Dict[str, Any]:
+    """Restore the values of a change read from the state log, in place."""
+    op = change.get("op")
+    if op == "put":
+        decode_session(change["value"])
+    elif op == "set":
+        change["value"] = decode_session_field(change["field"], change["value"])
+    elif op == "task":
+        change["value"] = decode_task(change["value"])
+    return change
@@ -1,15 +1,50 @@
 """State persistence utilities for Dell Unisphere API.
 
 This module provides utilities for persisting state to disk and loading it on server restart.
+
+In the 'log' persistence mode, changes to the upgrade sessions are also appended to a
+state log as they happen. The upgrade sessions file is the snapshot the log applies
+to: saving it empties the log, and loading replays the log on top of it.
+
+The upgrade sessions file holds one session per line and is saved with an index of
+where each session is in it, so on startup the sessions can be added to the store
+unloaded and each one read from the file when it is first accessed (see
+load_upgrade_sessions_into).
+
+In the 'files' persistence mode, each upgrade session and candidate software version
+is saved in a file of its own instead (see StateFiles), and only the files of the
+records that changed are rewritten. The 'sqlite' mode saves them as rows of a SQLite
+database in the same way (see StateDatabase). The layout found on disk on startup
+decides whether the state keeps being saved that way.
+
+While the server runs, a StateWriter saves the changed parts of the state in the
+background (see start_state_writer).
 """
 
 import json
 import logging
 import os
+import shutil
 import tempfile
-from datetime import datetime
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from functools import partial, wraps
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..models.indexed_store import IndexedStore
+from .record_database import RecordDatabase
+from .record_files import RecordFiles
+from .state_codec import (
+    decode_candidate,
+    decode_candidates,
+    decode_change,
+    decode_session,
+    decode_sessions,
+    encode_state,
+)
+from .state_writer import StateWriter
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -20,6 +55,41 @@ UPGRADE_SESSIONS_FILE = STATE_DIR / "upgrade_sessions.json"
 BACKUP_FILE = STATE_DIR / "upgrade_sessions.backup.json"
 CANDIDATE_SOFTWARE_FILE = STATE_DIR / "candidate_software.json"
 CANDIDATE_BACKUP_FILE = STATE_DIR / "candidate_software.backup.json"
+STATE_LOG_FILE = STATE_DIR / "upgrade_sessions.log"
+UPGRADE_SESSIONS_INDEX_FILE = STATE_DIR / "upgrade_sessions.index.json"
+# Directories of the 'files' persistence mode, holding one file per record
+SESSION_FILES_DIR = STATE_DIR / "upgrade_sessions"
+CANDIDATE_FILES_DIR = STATE_DIR / "candidate_software"
+# Database of the 'sqlite' persistence mode
+STATE_DATABASE_FILE = STATE_DIR / "state.db"
+
+# Version of the upgrade sessions index format
+SNAPSHOT_INDEX_VERSION = 1
+
+# The state log is compacted into a new snapshot once it is larger than both the
+# last snapshot and this many bytes, so compaction is amortized over the changes
+STATE_LOG_MIN_COMPACTION_SIZE = 1024 * 1024
+
+# Parts of the state saved separately by the state writer
+UPGRADE_SESSIONS = "upgrade_sessions"
+CANDIDATE_SOFTWARE = "candidate_software"
+
+# Held while state files are written, as the state writer saves from its own thread
+_write_lock = threading.RLock()
+
+# Background writer started by start_state_writer()
+_state_writer: Optional[StateWriter] = None
+
+
+def _holding_write_lock(function):
+    """Make a function that writes state files hold the write lock."""
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with _write_lock:
+            return function(*args, **kwargs)
+
+    return wrapper
 
 
 def _ensure_state_dir():
@@ -27,37 +97,153 @@ def _ensure_state_dir():
     STATE_DIR.mkdir(exist_ok=True, parents=True)
 
 
-def _make_json_serializable(obj):
-    """Convert an object to a JSON serializable format.
+class SessionSnapshot:
+    """Upgrade sessions file opened through its index.
 
-    Args:
-        obj: The object to convert
+    Sessions are read one at a time from the file, which makes the snapshot the
+    loader of an upgrade session store whose sessions were added unloaded. The
+    file stays open, so it can still be read while a new snapshot replaces it.
+    """
+
+    def __init__(self, file: BinaryIO, index: Dict[str, Any]):
+        """Initialize the snapshot.
+
+        Args:
+            file: The upgrade sessions file, opened for binary reading
+            index: The index saved with the file
+        """
+        self._file = file
+        self._lock = threading.Lock()
+        self._use_index(index)
+
+    def _use_index(self, index: Dict[str, Any]):
+        ids = index["ids"]
+        columns = index["values"]
+        rows = zip(*columns) if columns else (() for _ in ids)
+        # Offset and length of each session in the file
+        self.positions: Dict[str, Tuple[int, int]] = dict(
+            zip(ids, zip(index["offsets"], index["lengths"]))
+        )
+        self.fields: List[str] = index["fields"]
+        self._indexed_values = dict(zip(ids, rows))
+
+    @classmethod
+    def open(cls, fields: Iterable[str] = ()) -> Optional["SessionSnapshot"]:
+        """Open the upgrade sessions file through its index.
+
+        Args:
+            fields: Fields the index must have the values of
+
+        Returns:
+            The snapshot, or None if there is no index up to date with the file
+        """
+        if not (
+            UPGRADE_SESSIONS_FILE.exists() and UPGRADE_SESSIONS_INDEX_FILE.exists()
+        ):
+            return None
+        try:
+            with open(UPGRADE_SESSIONS_INDEX_FILE, "rb") as f:
+                index = json.load(f)
+            file = open(UPGRADE_SESSIONS_FILE, "rb")
+        except Exception as e:
+            logger.warning(f"Failed to read the upgrade sessions index: {e}")
+            return None
+
+        # The index is saved after the file, so it is stale if saving was interrupted
+        stat = os.fstat(file.fileno())
+        if (
+            index.get("version") != SNAPSHOT_INDEX_VERSION
+            or index.get("size") != stat.st_size
+            or index.get("mtime_ns") != stat.st_mtime_ns
+            or not set(fields) <= set(index["fields"])
+        ):
+            logger.info("The upgrade sessions index is out of date")
+            file.close()
+            return None
+        return cls(file, index)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def read_raw(self, key: str) -> bytes:
+        """Return the JSON text of a session."""
+        with self._lock:
+            offset, length = self.positions[key]
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def load(self, key: str) -> Dict[str, Any]:
+        """Read a session from the file."""
+        return decode_session(json.loads(self.read_raw(key)))
+
+    def indexed_values(self, key: str) -> Dict[str, Any]:
+        """Return the values of a session's indexed fields, as saved."""
+        return dict(zip(self.fields, self._indexed_values[key]))
+
+    def reopen(self, index: Dict[str, Any]):
+        """Switch to a newly saved upgrade sessions file and its index."""
+        file = open(UPGRADE_SESSIONS_FILE, "rb")
+        with self._lock:
+            self._file.close()
+            self._file = file
+            self._use_index(index)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _write_snapshot(
+    file: BinaryIO,
+    upgrade_sessions: Dict[str, Any],
+    snapshot: Optional[SessionSnapshot],
+) -> Dict[str, Any]:
+    """Write upgrade sessions as a JSON object holding one session per line.
+
+    Sessions that have not been loaded from the previous snapshot are copied from
+    it as they are.
 
     Returns:
-        A JSON serializable version of the object
+        The index of the written sessions
     """
-    if isinstance(obj, dict):
-        return {k: _make_json_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [_make_json_serializable(item) for item in obj]
-    elif isinstance(obj, datetime):
-        return obj.isoformat()
-    # Handle Enum values - check for _value_ and _name_ attributes which are common in Enum classes
-    elif hasattr(obj, "_value_") and hasattr(obj, "_name_"):
-        # Just store the value of the enum
-        return obj._value_
-    elif hasattr(obj, "__dict__"):
-        # Handle objects with __dict__ attribute (like Pydantic models)
-        return _make_json_serializable(obj.__dict__)
-    else:
-        # Try to convert to a basic type, or return as is if that's not possible
-        try:
-            json.dumps(obj)
-            return obj
-        except (TypeError, OverflowError):
-            # For objects that can't be serialized, just return their string representation
-            # but strip out memory addresses and other non-essential information
-            return str(obj).split(" at ")[0] + ">"
+    fields = sorted(getattr(upgrade_sessions, "fields", ()))
+    ids, offsets, lengths, values = [], [], [], []
+
+    file.write(b"{")
+    for key in list(upgrade_sessions):
+        if snapshot is not None and not upgrade_sessions.is_loaded(key):
+            data = snapshot.read_raw(key)
+            indexed = snapshot.indexed_values(key)
+        else:
+            session = upgrade_sessions.get(key)
+            if session is None:
+                continue  # Deleted while saving
+            data = encode_state(session).encode()
+            indexed = session
+
+        file.write(b"\n" if not ids else b",\n")
+        file.write(json.dumps(key).encode() + b":")
+        ids.append(key)
+        offsets.append(file.tell())
+        lengths.append(len(data))
+        values.append([indexed.get(field) for field in fields])
+        file.write(data)
+    file.write(b"\n}\n")
+
+    return {
+        "version": SNAPSHOT_INDEX_VERSION,
+        "fields": fields,
+        "ids": ids,
+        "offsets": offsets,
+        "lengths": lengths,
+        "values": [list(column) for column in zip(*values)] if values else [],
+    }
+
+
+def _session_snapshot(upgrade_sessions: Dict[str, Any]) -> Optional[SessionSnapshot]:
+    """Return the snapshot unloaded upgrade sessions are read from, if any."""
+    loader = getattr(upgrade_sessions, "loader", None)
+    return loader if isinstance(loader, SessionSnapshot) else None
 
 
 def save_state(
@@ -71,6 +257,14 @@ def save_state(
     """
     _ensure_state_dir()
 
+    # In the 'files' and 'sqlite' persistence modes, only the records that changed
+    # are written
+    changed_records = _changed_records(upgrade_sessions)
+    if changed_records is not None:
+        changed_records.flush()
+        changed_records.save_candidates()
+        return
+
     # Save upgrade sessions
     save_upgrade_sessions(upgrade_sessions)
 
@@ -78,11 +272,15 @@ def save_state(
     save_candidate_software(candidate_software_versions)
 
 
-def save_upgrade_sessions(upgrade_sessions: Dict[str, Any]):
+@_holding_write_lock
+def save_upgrade_sessions(upgrade_sessions: Dict[str, Any]) -> int:
     """Save upgrade sessions to disk using atomic file operations.
 
     Args:
         upgrade_sessions: The upgrade sessions to save
+
+    Returns:
+        The number of bytes written, or 0 if saving failed
     """
     _ensure_state_dir()
 
@@ -93,8 +291,8 @@ def save_upgrade_sessions(upgrade_sessions: Dict[str, Any]):
         except Exception as e:
             logger.warning(f"Failed to create backup file: {e}")
 
-    # Convert complex objects to JSON serializable format
-    serializable_sessions = _make_json_serializable(upgrade_sessions)
+    # Sessions not loaded yet are copied from the snapshot they would be read from
+    snapshot = _session_snapshot(upgrade_sessions)
 
     # Use atomic file operations to prevent corruption
     try:
@@ -104,12 +302,30 @@ def save_upgrade_sessions(upgrade_sessions: Dict[str, Any]):
         )
 
         # Write to the temporary file
+        with os.fdopen(fd, "wb") as temp_file:
+            index = _write_snapshot(temp_file, upgrade_sessions, snapshot)
+
+        # The index identifies the file it was saved with by its size and time
+        stat = os.stat(temp_path)
+        index["size"] = stat.st_size
+        index["mtime_ns"] = stat.st_mtime_ns
+        fd, index_temp_path = tempfile.mkstemp(
+            dir=str(STATE_DIR), prefix="upgrade_sessions_", suffix=".index.tmp"
+        )
         with os.fdopen(fd, "w") as temp_file:
-            json.dump(serializable_sessions, temp_file, indent=2)
+            temp_file.write(encode_state(index))
 
         # Atomically replace the target file with the temporary file
         # This ensures the file is either completely written or not at all
         os.replace(temp_path, str(UPGRADE_SESSIONS_FILE))
+        os.replace(index_temp_path, str(UPGRADE_SESSIONS_INDEX_FILE))
+        if snapshot is not None:
+            snapshot.reopen(index)
+
+        # The new snapshot holds every logged change. The log is truncated rather
+        # than removed, so an open state log keeps appending to it.
+        if STATE_LOG_FILE.exists():
+            open(STATE_LOG_FILE, "wb").close()
 
         logger.info(
             f"Saved {len(upgrade_sessions)} upgrade sessions to {UPGRADE_SESSIONS_FILE}"
@@ -119,6 +335,11 @@ def save_upgrade_sessions(upgrade_sessions: Dict[str, Any]):
         if BACKUP_FILE.exists():
             BACKUP_FILE.unlink()
 
+        return (
+            UPGRADE_SESSIONS_FILE.stat().st_size
+            + UPGRADE_SESSIONS_INDEX_FILE.stat().st_size
+        )
+
     except Exception as e:
         logger.error(f"Failed to save upgrade sessions: {e}")
 
@@ -129,13 +350,18 @@ def save_upgrade_sessions(upgrade_sessions: Dict[str, Any]):
                 logger.info("Restored upgrade sessions from backup file")
             except Exception as restore_error:
                 logger.error(f"Failed to restore from backup: {restore_error}")
+        return 0
 
 
-def save_candidate_software(candidate_software_versions: Dict[str, Any]):
+@_holding_write_lock
+def save_candidate_software(candidate_software_versions: Dict[str, Any]) -> int:
     """Save candidate software versions to disk using atomic file operations.
 
     Args:
         candidate_software_versions: The candidate software versions to save
+
+    Returns:
+        The number of bytes written, or 0 if saving failed
     """
     _ensure_state_dir()
 
@@ -146,9 +372,6 @@ def save_candidate_software(candidate_software_versions: Dict[str, Any]):
         except Exception as e:
             logger.warning(f"Failed to create candidate backup file: {e}")
 
-    # Convert complex objects to JSON serializable format
-    serializable_candidates = _make_json_serializable(candidate_software_versions)
-
     # Use atomic file operations to prevent corruption
     try:
         # Create a temporary file in the same directory
@@ -158,7 +381,7 @@ def save_candidate_software(candidate_software_versions: Dict[str, Any]):
 
         # Write to the temporary file
         with os.fdopen(fd, "w") as temp_file:
-            json.dump(serializable_candidates, temp_file, indent=2)
+            temp_file.write(encode_state(candidate_software_versions))
 
         # Atomically replace the target file with the temporary file
         # This ensures the file is either completely written or not at all
@@ -172,6 +395,8 @@ def save_candidate_software(candidate_software_versions: Dict[str, Any]):
         if CANDIDATE_BACKUP_FILE.exists():
             CANDIDATE_BACKUP_FILE.unlink()
 
+        return CANDIDATE_SOFTWARE_FILE.stat().st_size
+
     except Exception as e:
         logger.error(f"Failed to save candidate software versions: {e}")
 
@@ -182,75 +407,177 @@ def save_candidate_software(candidate_software_versions: Dict[str, Any]):
                 logger.info("Restored candidate software versions from backup file")
             except Exception as restore_error:
                 logger.error(f"Failed to restore from backup: {restore_error}")
+        return 0
+
+
+def load_state():
+    """Load all state from disk.
 
+    Returns:
+        A tuple containing (upgrade_sessions, candidate_software_versions)
+    """
+    upgrade_sessions = load_upgrade_sessions()
+    candidate_software_versions = load_candidate_software()
 
-def _convert_enum_values(data):
-    """Convert enum values from the loaded JSON back to their proper types.
+    return upgrade_sessions, candidate_software_versions
 
-    This function handles the conversion of enum values in the loaded data.
-    It looks for specific patterns in the data structure that indicate enum values.
 
-    Args:
-        data: The data loaded from JSON
+def load_upgrade_sessions() -> Dict[str, Any]:
+    """Load upgrade sessions from disk and apply the changes in the state log.
 
     Returns:
-        The data with enum values converted to their proper types
+        The loaded upgrade sessions, or an empty dict if no valid file exists
     """
-    from ..schemas.base import (
-        TaskStatusEnum,
-        TaskTypeEnum,
-        UpgradeSessionTypeEnum,
-        UpgradeStatusEnum,
-        UpgradeTypeEnum,
-    )
+    sessions = _load_upgrade_sessions_snapshot()
+    changes = _replay_state_log(sessions)
+    if changes:
+        logger.info(f"Applied {changes} changes from {STATE_LOG_FILE}")
+    return sessions
 
-    # Map of enum classes by name
-    enum_classes = {
-        "TaskStatusEnum": TaskStatusEnum,
-        "TaskTypeEnum": TaskTypeEnum,
-        "UpgradeStatusEnum": UpgradeStatusEnum,
-        "UpgradeSessionTypeEnum": UpgradeSessionTypeEnum,
-        "UpgradeTypeEnum": UpgradeTypeEnum,
-    }
 
-    if isinstance(data, dict):
-        # Check if this dict looks like an enum value
-        if "_value_" in data and "_name_" in data:
-            # Try to convert it to an enum value
-            for enum_name, enum_class in enum_classes.items():
-                if enum_name in str(data.get("__objclass__", "")):
-                    try:
-                        # Convert the value to the enum
-                        return enum_class(data["_value_"])
-                    except (ValueError, KeyError):
-                        # If conversion fails, just return the value
-                        return data["_value_"]
-            # If we couldn't determine the enum class, just return the value
-            return data["_value_"]
-
-        # Process each item in the dictionary
-        return {k: _convert_enum_values(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        # Process each item in the list
-        return [_convert_enum_values(item) for item in data]
-    else:
-        # Return other values as is
-        return data
+class _SnapshotSessions(MutableMapping):
+    """Upgrade sessions of a snapshot, read from it when accessed.
 
+    The state log is replayed on them, so only the sessions it changes are read.
+    """
 
-def load_state():
-    """Load all state from disk.
+    def __init__(self, snapshot: SessionSnapshot):
+        self.snapshot = snapshot
+        # Sessions by ID, None for those not read from the snapshot
+        self.sessions: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(
+            snapshot.positions
+        )
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        session = self.sessions[key]
+        if session is None:
+            session = self.sessions[key] = self.snapshot.load(key)
+        return session
+
+    def __setitem__(self, key: str, session: Dict[str, Any]):
+        self.sessions[key] = session
+
+    def __delitem__(self, key: str):
+        del self.sessions[key]
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def clear(self):
+        self.sessions.clear()
+
+
+def load_upgrade_sessions_into(upgrade_sessions: IndexedStore) -> int:
+    """Load the saved upgrade sessions into the upgrade session store.
+
+    If the upgrade sessions file has an index up to date with it, only the index is
+    read: the sessions are added to the store unloaded, and each one is read from
+    the file when it is first accessed. The state log is applied to the sessions it
+    changes. Otherwise, every session is loaded as by load_upgrade_sessions().
+
+    Sessions saved one file per session (see StateFiles) or in the state database
+    (see StateDatabase) are loaded in the same way, using the index saved with them
+    or the indexed columns of the database.
+
+    Args:
+        upgrade_sessions: The upgrade session store, which must be empty
 
     Returns:
-        A tuple containing (upgrade_sessions, candidate_software_versions)
+        The number of sessions loaded
     """
-    upgrade_sessions = load_upgrade_sessions()
-    candidate_software_versions = load_candidate_software()
+    if STATE_DATABASE_FILE.exists():
+        database = open_state_database(upgrade_sessions)
+        upgrade_sessions.loader = database
+        upgrade_sessions.add_unloaded(database.session_index())
+        logger.info(
+            f"Loaded the index of {len(upgrade_sessions)} upgrade sessions from "
+            f"{STATE_DATABASE_FILE}"
+        )
+        return len(upgrade_sessions)
+
+    session_files = RecordFiles(SESSION_FILES_DIR, decode_session)
+    if session_files.exists():
+        return _load_session_files(upgrade_sessions, session_files)
+
+    snapshot = SessionSnapshot.open(upgrade_sessions.fields)
+    if snapshot is None:
+        sessions = load_upgrade_sessions()
+        upgrade_sessions.update(sessions)
+        return len(sessions)
+
+    sessions = _SnapshotSessions(snapshot)
+    changes = _replay_state_log(sessions)
+    if changes:
+        logger.info(f"Applied {changes} changes from {STATE_LOG_FILE}")
+
+    upgrade_sessions.loader = snapshot
+    # Sessions read while replaying the log are stored in place of their unloaded
+    # records, which keeps the order of the sessions
+    upgrade_sessions.add_unloaded(
+        (key, snapshot.indexed_values(key) if session is None else session)
+        for key, session in sessions.sessions.items()
+    )
+    for key, session in sessions.sessions.items():
+        if session is not None:
+            upgrade_sessions[key] = session
+    logger.info(
+        f"Loaded the index of {len(upgrade_sessions)} upgrade sessions from "
+        f"{UPGRADE_SESSIONS_INDEX_FILE}"
+    )
+    return len(upgrade_sessions)
 
-    return upgrade_sessions, candidate_software_versions
 
+def _load_session_files(
+    upgrade_sessions: IndexedStore, session_files: RecordFiles
+) -> int:
+    """Load upgrade sessions saved one file per session into the store.
 
-def load_upgrade_sessions() -> Dict[str, Any]:
+    Sessions in the index are added unloaded; the others are read now, which only
+    happens when saving was interrupted.
+    """
+    saved = dict(session_files.scan())
+    index = session_files.read_index()
+    indexed: Dict[str, Dict[str, Any]] = {}
+    if index is not None and (
+        index.get("version") != SNAPSHOT_INDEX_VERSION
+        or not set(upgrade_sessions.fields) <= set(index["fields"])
+    ):
+        logger.info("The upgrade session files index is out of date")
+        index = None
+    if index is not None:
+        columns = index["values"]
+        rows = zip(*columns) if columns else (() for _ in index["ids"])
+        for key, row in zip(index["ids"], rows):
+            if key in saved:
+                indexed[key] = dict(zip(index["fields"], row))
+
+    # Sessions keep the order of the index, followed by the others by age
+    order = [key for key in (index or {}).get("ids", ()) if key in saved]
+    listed = set(order)
+    order += sorted((key for key in saved if key not in listed), key=saved.get)
+    sessions = {
+        key: None if key in indexed else session_files.load(key) for key in order
+    }
+
+    upgrade_sessions.loader = session_files
+    upgrade_sessions.add_unloaded(
+        (key, indexed[key] if session is None else session)
+        for key, session in sessions.items()
+    )
+    for key, session in sessions.items():
+        if session is not None:
+            upgrade_sessions[key] = session
+    logger.info(
+        f"Loaded {len(upgrade_sessions)} upgrade sessions from {SESSION_FILES_DIR}, "
+        f"{len(upgrade_sessions) - len(indexed)} of them read"
+    )
+    return len(upgrade_sessions)
+
+
+def _load_upgrade_sessions_snapshot() -> Dict[str, Any]:
     """Load upgrade sessions from disk with fallback to backup file.
 
     Returns:
@@ -262,8 +589,8 @@ def load_upgrade_sessions() -> Dict[str, Any]:
             with open(UPGRADE_SESSIONS_FILE, "r") as f:
                 sessions = json.load(f)
 
-            # Convert enum values in the loaded data
-            sessions = _convert_enum_values(sessions)
+            # Restore the enums and task records of the loaded sessions
+            sessions = decode_sessions(sessions)
 
             logger.info(
                 f"Loaded {len(sessions)} upgrade sessions from {UPGRADE_SESSIONS_FILE}"
@@ -279,8 +606,8 @@ def load_upgrade_sessions() -> Dict[str, Any]:
                     with open(BACKUP_FILE, "r") as f:
                         sessions = json.load(f)
 
-                    # Convert enum values in the loaded data
-                    sessions = _convert_enum_values(sessions)
+                    # Restore the enums and task records of the loaded sessions
+                    sessions = decode_sessions(sessions)
 
                     logger.info(
                         f"Loaded {len(sessions)} upgrade sessions from backup file"
@@ -300,8 +627,8 @@ def load_upgrade_sessions() -> Dict[str, Any]:
             with open(BACKUP_FILE, "r") as f:
                 sessions = json.load(f)
 
-            # Convert enum values in the loaded data
-            sessions = _convert_enum_values(sessions)
+            # Restore the enums and task records of the loaded sessions
+            sessions = decode_sessions(sessions)
 
             logger.info(f"Loaded {len(sessions)} upgrade sessions from backup file")
 
@@ -324,6 +651,27 @@ def load_candidate_software() -> Dict[str, Any]:
     Returns:
         The loaded candidate software versions, or an empty dict if no valid file exists
     """
+    if STATE_DATABASE_FILE.exists():
+        database = RecordDatabase(
+            STATE_DATABASE_FILE, decode_candidate=decode_candidate
+        )
+        try:
+            candidates = database.load_candidates()
+        finally:
+            database.close()
+        logger.info(
+            f"Loaded {len(candidates)} candidate software versions from {STATE_DATABASE_FILE}"
+        )
+        return candidates
+
+    candidate_files = RecordFiles(CANDIDATE_FILES_DIR, decode_candidate)
+    if candidate_files.exists():
+        candidates = candidate_files.load_all()
+        logger.info(
+            f"Loaded {len(candidates)} candidate software versions from {CANDIDATE_FILES_DIR}"
+        )
+        return candidates
+
     # Try to load from the main file first
     if CANDIDATE_SOFTWARE_FILE.exists():
         try:
@@ -331,7 +679,7 @@ def load_candidate_software() -> Dict[str, Any]:
                 candidates = json.load(f)
 
             # Convert enum values in the loaded data
-            candidates = _convert_enum_values(candidates)
+            candidates = decode_candidates(candidates)
 
             logger.info(
                 f"Loaded {len(candidates)} candidate software versions from {CANDIDATE_SOFTWARE_FILE}"
@@ -348,7 +696,7 @@ def load_candidate_software() -> Dict[str, Any]:
                         candidates = json.load(f)
 
                     # Convert enum values in the loaded data
-                    candidates = _convert_enum_values(candidates)
+                    candidates = decode_candidates(candidates)
 
                     logger.info(
                         f"Loaded {len(candidates)} candidate software versions from backup file"
@@ -373,7 +721,7 @@ def load_candidate_software() -> Dict[str, Any]:
                 candidates = json.load(f)
 
             # Convert enum values in the loaded data
-            candidates = _convert_enum_values(candidates)
+            candidates = decode_candidates(candidates)
 
             logger.info(
                 f"Loaded {len(candidates)} candidate software versions from backup file"
@@ -392,3 +740,842 @@ def load_candidate_software() -> Dict[str, Any]:
         )
 
     return {}
+
+
+def _apply_change(sessions: Dict[str, Any], change: Dict[str, Any]):
+    """Apply a change read from the state log to the upgrade sessions.
+
+    Every change sets a value rather than modifying one, so applying changes that
+    are already part of the snapshot leaves the sessions unchanged.
+    """
+    op = change["op"]
+    if op == "put":
+        sessions[change["id"]] = change["value"]
+        return
+    if op == "delete":
+        sessions.pop(change["id"], None)
+        return
+    if op == "clear":
+        sessions.clear()
+        return
+
+    session = sessions.get(change["id"])
+    if session is None:
+        return
+    if op == "set":
+        session[change["field"]] = change["value"]
+    elif op == "unset":
+        session.pop(change["field"], None)
+    elif op == "task":
+        tasks = session.get("tasks", [])
+        if change["index"] < len(tasks):
+            tasks[change["index"]] = change["value"]
+    elif op == "message":
+        messages = session.setdefault("messages", [])
+        if change["index"] < len(messages):
+            messages[change["index"]] = change["value"]
+        elif change["index"] == len(messages):
+            messages.append(change["value"])
+    else:
+        logger.warning(f"Ignoring unknown state log entry: {op}")
+
+
+def _replay_state_log(sessions: Dict[str, Any]) -> int:
+    """Apply the changes in the state log to sessions loaded from the snapshot.
+
+    Returns:
+        The number of changes applied
+    """
+    if not STATE_LOG_FILE.exists():
+        return 0
+
+    changes = 0
+    try:
+        with open(STATE_LOG_FILE, "rb") as f:
+            for line in f:
+                try:
+                    change = decode_change(json.loads(line))
+                except ValueError:
+                    # A write interrupted by a crash leaves an incomplete last entry
+                    logger.warning(
+                        "Ignoring incomplete entry at the end of the state log"
+                    )
+                    break
+                _apply_change(sessions, change)
+                changes += 1
+    except Exception as e:
+        logger.error(f"Failed to replay the state log: {e}")
+    return changes
+
+
+class StateLog:
+    """Append-only log of the changes to the upgrade sessions.
+
+    The log is attached to the upgrade session store as its journal (see
+    IndexedStore), so every write to a session becomes one JSON line. Its cost
+    depends on the size of the change, not on the number of sessions stored.
+
+    Lines are encoded when the change happens. With an on_change callback, such as
+    the state writer's, they are buffered until flush() is called; otherwise they
+    are written right away.
+    """
+
+    def __init__(self, upgrade_sessions: Dict[str, Any], on_change=None):
+        """Initialize the log.
+
+        Args:
+            upgrade_sessions: The upgrade sessions whose changes are logged
+            on_change: Optional function called when a change has been buffered
+        """
+        self.upgrade_sessions = upgrade_sessions
+        self.on_change = on_change
+        self._file = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self.snapshot_size = 0
+        self.changes = 0
+        self.compactions = 0
+
+    def _append(self, change: Dict[str, Any]):
+        line = encode_state(change).encode() + b"\n"
+        with self._lock:
+            self._pending.append(line)
+        self.changes += 1
+
+        if self.on_change is None:
+            self.flush()
+        else:
+            self.on_change()
+
+    @_holding_write_lock
+    def flush(self) -> int:
+        """Write the buffered changes, compacting the log if it has grown too large.
+
+        Returns:
+            The number of bytes written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        if self._file is None:
+            _ensure_state_dir()
+            self._file = open(STATE_LOG_FILE, "ab")
+        data = b"".join(pending)
+        self._file.write(data)
+        self._file.flush()
+        written = len(data)
+
+        if self._file.tell() > max(STATE_LOG_MIN_COMPACTION_SIZE, self.snapshot_size):
+            written += self.compact()
+        return written
+
+    @_holding_write_lock
+    def compact(self) -> int:
+        """Save a snapshot of the upgrade sessions, which empties the log.
+
+        Returns:
+            The number of bytes written
+        """
+        written = save_upgrade_sessions(self.upgrade_sessions)
+        if UPGRADE_SESSIONS_FILE.exists():
+            self.snapshot_size = UPGRADE_SESSIONS_FILE.stat().st_size
+        self.compactions += 1
+        return written
+
+    @_holding_write_lock
+    def close(self):
+        """Write the buffered changes and close the log file."""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters describing the log."""
+        return {
+            "changes": self.changes,
+            "pending": len(self._pending),
+            "compactions": self.compactions,
+            "log_size": self._file.tell() if self._file is not None else 0,
+            "snapshot_size": self.snapshot_size,
+        }
+
+    # Journal interface of IndexedStore and UpgradeSessionRecord
+
+    def put(self, key: str, record: Dict[str, Any]):
+        self._append({"op": "put", "id": key, "value": record})
+
+    def set(self, key: str, field: str, value: Any):
+        self._append({"op": "set", "id": key, "field": field, "value": value})
+
+    def unset(self, key: str, field: str):
+        self._append({"op": "unset", "id": key, "field": field})
+
+    def delete(self, key: str):
+        self._append({"op": "delete", "id": key})
+
+    def clear(self):
+        self._append({"op": "clear"})
+
+    def task(self, key: str, index: int, task: Any):
+        self._append({"op": "task", "id": key, "index": index, "value": task})
+
+    def message(self, key: str, index: int, message: Any):
+        self._append({"op": "message", "id": key, "index": index, "value": message})
+
+
+class _ChangedRecords(ABC):
+    """Journal of the upgrade session store saving the records that changed.
+
+    It only records which sessions changed; flush() then saves those sessions, and
+    the index of the sessions when a session was added or removed or an indexed
+    field changed. Candidate software versions are few; each save compares their
+    encoding with the saved one and saves those that changed. Subclasses store the
+    records.
+
+    With an on_change callback, such as the state writer's, changes wait for
+    flush() to be called; otherwise they are written right away.
+    """
+
+    def __init__(
+        self,
+        upgrade_sessions: Dict[str, Any],
+        candidate_software_versions: Dict[str, Any],
+        on_change=None,
+    ):
+        """Initialize the journal.
+
+        Args:
+            upgrade_sessions: The upgrade session store
+            candidate_software_versions: The candidate software versions
+            on_change: Optional function called when a session has changed
+        """
+        self.upgrade_sessions = upgrade_sessions
+        self.candidate_software_versions = candidate_software_versions
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._index_changed = False
+        self._cleared = False
+        # Encoded candidate software versions, as saved
+        self._saved_candidates: Dict[str, str] = self._read_candidates()
+        self.writes = 0
+        self.deletes = 0
+        self.index_writes = 0
+
+    @abstractmethod
+    def _read_candidates(self) -> Dict[str, str]:
+        """Return the encoded candidate software versions, as saved."""
+
+    @abstractmethod
+    def _write_sessions(
+        self, dirty: Set[str], index_changed: bool, cleared: bool
+    ) -> int:
+        """Save the changed sessions, and their index if it changed.
+
+        Returns:
+            The number of bytes written
+        """
+
+    @abstractmethod
+    def _write_candidates(self, changed: Dict[str, str], removed: List[str]) -> int:
+        """Save changed candidate software versions and delete removed ones.
+
+        Returns:
+            The number of bytes written
+        """
+
+    def _changed(self, key: Optional[str], index_changed: bool = False):
+        with self._lock:
+            if key is not None:
+                self._dirty.add(key)
+            self._index_changed |= index_changed
+
+        if self.on_change is None:
+            self.flush()
+        else:
+            self.on_change()
+
+    @_holding_write_lock
+    def flush(self) -> int:
+        """Save the sessions that changed, and their index if needed.
+
+        Returns:
+            The number of bytes written
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            index_changed, self._index_changed = self._index_changed, False
+            cleared, self._cleared = self._cleared, False
+        if not (dirty or index_changed or cleared):
+            return 0
+
+        try:
+            return self._write_sessions(dirty, index_changed, cleared)
+        except BaseException:
+            # Save the same sessions again on the next flush
+            with self._lock:
+                self._dirty |= dirty
+                self._index_changed |= index_changed
+                self._cleared |= cleared
+            raise
+
+    @_holding_write_lock
+    def save_candidates(self) -> int:
+        """Save the candidate software versions that changed.
+
+        Returns:
+            The number of bytes written
+        """
+        saved = self._saved_candidates
+        candidates = {
+            key: encode_state(candidate)
+            for key, candidate in list(self.candidate_software_versions.items())
+        }
+        changed = {
+            key: data for key, data in candidates.items() if saved.get(key) != data
+        }
+        removed = [key for key in saved if key not in candidates]
+        written = self._write_candidates(changed, removed)
+        saved.update(changed)
+        for key in removed:
+            del saved[key]
+        self.writes += len(changed)
+        self.deletes += len(removed)
+        return written
+
+    @_holding_write_lock
+    def merge_candidate(self, key: str, data: Optional[str]):
+        """Store a candidate software version saved elsewhere, such as by another
+        process, without saving it again.
+
+        Args:
+            key: ID of the candidate software version
+            data: Its encoded JSON, or None if it was deleted
+        """
+        if data is None:
+            self.candidate_software_versions.pop(key, None)
+            self._saved_candidates.pop(key, None)
+        else:
+            self.candidate_software_versions[key] = decode_candidate(json.loads(data))
+            self._saved_candidates[key] = data
+
+    @_holding_write_lock
+    def write_all(self) -> int:
+        """Save every session and candidate software version.
+
+        Returns:
+            The number of bytes written
+        """
+        with self._lock:
+            self._dirty.update(self.upgrade_sessions)
+            self._cleared = True
+        return self.flush() + self.save_candidates()
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters describing the saves."""
+        return {
+            "pending": len(self._dirty),
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "index_writes": self.index_writes,
+        }
+
+    # Journal interface of IndexedStore and UpgradeSessionRecord
+
+    def put(self, key: str, record: Dict[str, Any]):
+        self._changed(key, index_changed=True)
+
+    def set(self, key: str, field: str, value: Any):
+        self._changed(key, field in self.upgrade_sessions.fields)
+
+    def unset(self, key: str, field: str):
+        self._changed(key, field in self.upgrade_sessions.fields)
+
+    def delete(self, key: str):
+        self._changed(key, index_changed=True)
+
+    def clear(self):
+        with self._lock:
+            self._cleared = True
+        self._changed(None)
+
+    def task(self, key: str, index: int, task: Any):
+        self._changed(key)
+
+    def message(self, key: str, index: int, message: Any):
+        self._changed(key)
+
+
+class StateFiles(_ChangedRecords):
+    """Upgrade sessions and candidate software versions saved one file per record.
+
+    A flush rewrites the files of the sessions that changed, and the index of the
+    sessions when it changed. Sessions are read from their files when first
+    accessed, like those of an indexed snapshot.
+    """
+
+    def __init__(
+        self,
+        upgrade_sessions: Dict[str, Any],
+        candidate_software_versions: Dict[str, Any],
+        on_change=None,
+    ):
+        self.sessions = RecordFiles(SESSION_FILES_DIR, decode_session)
+        self.candidates = RecordFiles(CANDIDATE_FILES_DIR, decode_candidate)
+        super().__init__(upgrade_sessions, candidate_software_versions, on_change)
+
+    def _read_candidates(self) -> Dict[str, str]:
+        if not self.candidates.exists():
+            return {}
+        return {
+            key: self.candidates.read(key).decode() for key, _ in self.candidates.scan()
+        }
+
+    def _write_sessions(
+        self, dirty: Set[str], index_changed: bool, cleared: bool
+    ) -> int:
+        written = 0
+        self.sessions.directory.mkdir(parents=True, exist_ok=True)
+        # Without an index, every session is read on startup. The index is removed
+        # while the files it indexes change, so it is never stale.
+        if index_changed or cleared:
+            self.sessions.delete_index()
+        if cleared:
+            for key, _ in list(self.sessions.scan()):
+                if key not in self.upgrade_sessions:
+                    self.sessions.delete(key)
+                    self.deletes += 1
+        for key in dirty:
+            session = self.upgrade_sessions.get(key)
+            if session is None:
+                self.sessions.delete(key)
+                self.deletes += 1
+            else:
+                written += self.sessions.write(key, encode_state(session).encode())
+                self.writes += 1
+        if index_changed or cleared:
+            written += self.sessions.write_index(self._encode_index())
+            self.index_writes += 1
+        return written
+
+    def _encode_index(self) -> bytes:
+        fields = sorted(getattr(self.upgrade_sessions, "fields", ()))
+        ids, values = [], []
+        for key in list(self.upgrade_sessions):
+            indexed = self.upgrade_sessions.indexed_values(key)
+            ids.append(key)
+            values.append([indexed.get(field) for field in fields])
+        return encode_state(
+            {
+                "version": SNAPSHOT_INDEX_VERSION,
+                "fields": fields,
+                "ids": ids,
+                "values": [list(column) for column in zip(*values)] if values else [],
+            }
+        ).encode()
+
+    def _write_candidates(self, changed: Dict[str, str], removed: List[str]) -> int:
+        written = 0
+        for key, data in changed.items():
+            written += self.candidates.write(key, data.encode())
+        for key in removed:
+            self.candidates.delete(key)
+        # An empty directory still tells that the state is saved this way
+        self.candidates.directory.mkdir(parents=True, exist_ok=True)
+        return written
+
+
+class StateDatabase(_ChangedRecords):
+    """Upgrade sessions and candidate software versions saved in a SQLite database.
+
+    A flush saves the sessions that changed in one transaction, which also updates
+    the indexed columns of those sessions; there is no separate index to rewrite.
+    Sessions are read from the database when first accessed.
+    """
+
+    def __init__(
+        self,
+        upgrade_sessions: Dict[str, Any],
+        candidate_software_versions: Dict[str, Any],
+        database: RecordDatabase,
+        on_change=None,
+    ):
+        self.database = database
+        super().__init__(upgrade_sessions, candidate_software_versions, on_change)
+
+    def _read_candidates(self) -> Dict[str, str]:
+        return self.database.read_candidates()
+
+    def _write_sessions(
+        self, dirty: Set[str], index_changed: bool, cleared: bool
+    ) -> int:
+        written = 0
+        rows, deleted = [], []
+        stored = []
+        for key in dirty:
+            (stored if key in self.upgrade_sessions else deleted).append(key)
+        # New sessions are added to the database in the order of the store
+        for key in self.upgrade_sessions.in_insertion_order(stored):
+            session = self.upgrade_sessions.get(key)
+            if session is None:
+                deleted.append(key)  # Deleted meanwhile
+            else:
+                data = encode_state(session)
+                written += len(data)
+                rows.append((key, data, session))
+        with self.database.transaction():
+            if cleared:
+                deleted += [
+                    key
+                    for key, _ in self.database.session_index()
+                    if key not in self.upgrade_sessions
+                ]
+            self.database.delete_sessions(deleted)
+            self.database.put_sessions(rows)
+        self.writes += len(rows)
+        self.deletes += len(deleted)
+        return written
+
+    def _write_candidates(self, changed: Dict[str, str], removed: List[str]) -> int:
+        with self.database.transaction():
+            self.database.put_candidates(changed.items())
+            self.database.delete_candidates(removed)
+        return sum(len(data) for data in changed.values())
+
+    @_holding_write_lock
+    def close(self):
+        """Save the pending changes and close the database."""
+        self.flush()
+        self.database.close()
+
+
+class _ChangeNotifier:
+    """Journal of the upgrade session store that only reports that it changed.
+
+    It is attached while the state writer runs and no state log is kept.
+    """
+
+    def __init__(self, notify):
+        self.notify = notify
+
+    def _changed(self, *args):
+        self.notify()
+
+    put = set = unset = delete = clear = task = message = _changed
+
+
+def _attach_journal(upgrade_sessions: Dict[str, Any], journal=None):
+    """Attach a state log or state files, or what the state writer needs without
+    them, as journal."""
+    notify = None
+    if _state_writer is not None:
+        notify = partial(_state_writer.notify, UPGRADE_SESSIONS)
+
+    if journal is not None:
+        journal.on_change = notify
+        upgrade_sessions.journal = journal
+    elif notify is not None:
+        upgrade_sessions.journal = _ChangeNotifier(notify)
+    else:
+        upgrade_sessions.journal = None
+
+
+def get_state_log(upgrade_sessions: Dict[str, Any]) -> Optional[StateLog]:
+    """Return the state log attached to the upgrade sessions, if any."""
+    journal = getattr(upgrade_sessions, "journal", None)
+    return journal if isinstance(journal, StateLog) else None
+
+
+def enable_state_log(upgrade_sessions: Dict[str, Any]) -> StateLog:
+    """Start logging the changes to the upgrade sessions.
+
+    A snapshot of the current sessions is saved first, for the log to apply to.
+
+    Args:
+        upgrade_sessions: The upgrade session store
+
+    Returns:
+        The attached state log
+    """
+    state_log = get_state_log(upgrade_sessions)
+    if state_log is None:
+        disable_state_files(upgrade_sessions)
+        disable_state_database(upgrade_sessions)
+        state_log = StateLog(upgrade_sessions)
+        state_log.compact()
+        _attach_journal(upgrade_sessions, state_log)
+        logger.info(f"Logging upgrade session changes to {STATE_LOG_FILE}")
+    return state_log
+
+
+def disable_state_log(upgrade_sessions: Dict[str, Any]):
+    """Stop logging the changes to the upgrade sessions.
+
+    The changes logged so far stay on disk until the next snapshot is saved.
+    """
+    state_log = get_state_log(upgrade_sessions)
+    if state_log is not None:
+        _attach_journal(upgrade_sessions)
+        state_log.close()
+        logger.info("Stopped logging upgrade session changes")
+
+
+def get_state_files(upgrade_sessions: Dict[str, Any]) -> Optional[StateFiles]:
+    """Return the state files attached to the upgrade sessions, if any."""
+    journal = getattr(upgrade_sessions, "journal", None)
+    return journal if isinstance(journal, StateFiles) else None
+
+
+def _changed_records(upgrade_sessions: Dict[str, Any]) -> Optional[_ChangedRecords]:
+    """Return the state files or state database attached to the upgrade sessions."""
+    journal = getattr(upgrade_sessions, "journal", None)
+    return journal if isinstance(journal, _ChangedRecords) else None
+
+
+def _persistence_journal(upgrade_sessions: Dict[str, Any]):
+    """Return the state log, state files or state database attached to the upgrade
+    sessions."""
+    return get_state_log(upgrade_sessions) or _changed_records(upgrade_sessions)
+
+
+def enable_state_files(
+    upgrade_sessions: Dict[str, Any], candidate_software_versions: Dict[str, Any]
+) -> StateFiles:
+    """Start saving the state one file per record.
+
+    Unless the upgrade sessions were loaded from such files, every record is
+    written first, and the files of the other persistence modes are removed.
+
+    Args:
+        upgrade_sessions: The upgrade session store
+        candidate_software_versions: The candidate software versions
+
+    Returns:
+        The attached state files
+    """
+    state_files = get_state_files(upgrade_sessions)
+    if state_files is None:
+        disable_state_log(upgrade_sessions)
+        disable_state_database(upgrade_sessions)
+        state_files = StateFiles(upgrade_sessions, candidate_software_versions)
+        if not isinstance(upgrade_sessions.loader, RecordFiles):
+            with _write_lock:
+                _release_snapshot(upgrade_sessions)
+                state_files.write_all()
+                _remove_snapshot_files()
+        upgrade_sessions.loader = state_files.sessions
+        _attach_journal(upgrade_sessions, state_files)
+        logger.info(
+            f"Saving upgrade sessions one file per session in {SESSION_FILES_DIR}"
+        )
+    return state_files
+
+
+def _release_snapshot(upgrade_sessions: Dict[str, Any]):
+    """Read the unloaded upgrade sessions, before the files they are read from go."""
+    upgrade_sessions.load_all()
+    snapshot = _session_snapshot(upgrade_sessions)
+    if snapshot is not None:
+        snapshot.close()
+
+
+def _remove_snapshot_files():
+    """Remove the files of the 'snapshot' and 'log' persistence modes."""
+    for path in (
+        UPGRADE_SESSIONS_FILE,
+        UPGRADE_SESSIONS_INDEX_FILE,
+        BACKUP_FILE,
+        STATE_LOG_FILE,
+        CANDIDATE_SOFTWARE_FILE,
+        CANDIDATE_BACKUP_FILE,
+    ):
+        if path.exists():
+            path.unlink()
+
+
+def disable_state_files(upgrade_sessions: Dict[str, Any]):
+    """Stop saving the state one file per record.
+
+    Upgrade sessions and candidate software versions are saved in the files of the
+    'snapshot' mode, and their own files are removed.
+    """
+    state_files = get_state_files(upgrade_sessions)
+    if state_files is None:
+        return
+    with _write_lock:
+        _attach_journal(upgrade_sessions)
+        upgrade_sessions.load_all()
+        upgrade_sessions.loader = None
+        save_upgrade_sessions(upgrade_sessions)
+        save_candidate_software(state_files.candidate_software_versions)
+        shutil.rmtree(SESSION_FILES_DIR, ignore_errors=True)
+        shutil.rmtree(CANDIDATE_FILES_DIR, ignore_errors=True)
+    logger.info("Stopped saving upgrade sessions one file per session")
+
+
+def open_state_database(upgrade_sessions: Dict[str, Any]) -> RecordDatabase:
+    """Open the state database, with columns for the store's indexed fields."""
+    return RecordDatabase(
+        STATE_DATABASE_FILE,
+        fields=getattr(upgrade_sessions, "fields", ()),
+        decode_session=decode_session,
+        decode_candidate=decode_candidate,
+    )
+
+
+def get_state_database(upgrade_sessions: Dict[str, Any]) -> Optional[StateDatabase]:
+    """Return the state database attached to the upgrade sessions, if any."""
+    journal = getattr(upgrade_sessions, "journal", None)
+    return journal if isinstance(journal, StateDatabase) else None
+
+
+def enable_state_database(
+    upgrade_sessions: Dict[str, Any], candidate_software_versions: Dict[str, Any]
+) -> StateDatabase:
+    """Start saving the state in the state database.
+
+    Unless the upgrade sessions were loaded from the database, every record is
+    written to it first, and the files of the other persistence modes are removed.
+
+    Args:
+        upgrade_sessions: The upgrade session store
+        candidate_software_versions: The candidate software versions
+
+    Returns:
+        The attached state database
+    """
+    state_database = get_state_database(upgrade_sessions)
+    if state_database is None:
+        disable_state_log(upgrade_sessions)
+        disable_state_files(upgrade_sessions)
+        database = upgrade_sessions.loader
+        if isinstance(database, RecordDatabase):
+            state_database = StateDatabase(
+                upgrade_sessions, candidate_software_versions, database
+            )
+        else:
+            with _write_lock:
+                _release_snapshot(upgrade_sessions)
+                database = open_state_database(upgrade_sessions)
+                state_database = StateDatabase(
+                    upgrade_sessions, candidate_software_versions, database
+                )
+                state_database.write_all()
+                _remove_snapshot_files()
+            upgrade_sessions.loader = database
+        _attach_journal(upgrade_sessions, state_database)
+        logger.info(f"Saving upgrade sessions in {STATE_DATABASE_FILE}")
+    return state_database
+
+
+def disable_state_database(upgrade_sessions: Dict[str, Any]):
+    """Stop saving the state in the state database.
+
+    Upgrade sessions and candidate software versions are saved in the files of the
+    'snapshot' mode, and the database is removed.
+    """
+    state_database = get_state_database(upgrade_sessions)
+    if state_database is None:
+        return
+    with _write_lock:
+        _attach_journal(upgrade_sessions)
+        upgrade_sessions.load_all()
+        upgrade_sessions.loader = None
+        save_upgrade_sessions(upgrade_sessions)
+        save_candidate_software(state_database.candidate_software_versions)
+        state_database.database.close()
+        # The write-ahead log and its shared memory file go with the database
+        for suffix in ("", "-wal", "-shm"):
+            path = STATE_DATABASE_FILE.with_name(STATE_DATABASE_FILE.name + suffix)
+            if path.exists():
+                path.unlink()
+    logger.info("Stopped saving upgrade sessions in the state database")
+
+
+def flush_state(
+    upgrade_sessions: Dict[str, Any],
+    candidate_software_versions: Dict[str, Any],
+    parts: Set[str],
+) -> int:
+    """Save the given parts of the state.
+
+    Upgrade sessions are saved by flushing the state log, state files or state
+    database if one is kept, and by saving every session otherwise.
+
+    Returns:
+        The number of bytes written
+    """
+    written = 0
+    changed_records = _changed_records(upgrade_sessions)
+    if CANDIDATE_SOFTWARE in parts:
+        if changed_records is not None:
+            written += changed_records.save_candidates()
+        else:
+            written += save_candidate_software(candidate_software_versions)
+    if UPGRADE_SESSIONS in parts:
+        journal = _persistence_journal(upgrade_sessions)
+        if journal is not None:
+            written += journal.flush()
+        else:
+            written += save_upgrade_sessions(upgrade_sessions)
+    return written
+
+
+def start_state_writer(
+    upgrade_sessions: Dict[str, Any], candidate_software_versions: Dict[str, Any]
+) -> StateWriter:
+    """Start saving the state in the background whenever it changes.
+
+    Changes to the upgrade sessions are noticed through the store's journal; other
+    changes are reported with notify_state_changed().
+
+    Args:
+        upgrade_sessions: The upgrade session store
+        candidate_software_versions: The candidate software versions
+
+    Returns:
+        The running state writer
+    """
+    global _state_writer
+    if _state_writer is None:
+        _state_writer = StateWriter(
+            partial(flush_state, upgrade_sessions, candidate_software_versions)
+        )
+        _attach_journal(upgrade_sessions, _persistence_journal(upgrade_sessions))
+    _state_writer.start()
+    return _state_writer
+
+
+def stop_state_writer(upgrade_sessions: Dict[str, Any]):
+    """Stop the background state writer, leaving unsaved changes to the caller."""
+    global _state_writer
+    writer, _state_writer = _state_writer, None
+    if writer is not None:
+        writer.stop()
+        _attach_journal(upgrade_sessions, _persistence_journal(upgrade_sessions))
+
+
+def get_state_writer() -> Optional[StateWriter]:
+    """Return the background state writer, if it has been started."""
+    return _state_writer
+
+
+def notify_state_changed(part: str):
+    """Report a change of a part of the state to the state writer, if it runs."""
+    if _state_writer is not None:
+        _state_writer.notify(part)
+
+
+def request_state_flush() -> bool:
+    """Ask the state writer to save the pending changes now.
+
+    Returns:
+        True if the state writer runs and will save them, False otherwise
+    """
+    if _state_writer is None or not _state_writer.running:
+        return False
+    _state_writer.flush_soon()
+    return True
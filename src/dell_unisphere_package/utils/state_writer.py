@@ -0,0 +1,159 @@
+"""Background state writer for Dell Unisphere API.
+
+This module saves the state from a background thread while the server runs, so a
+crash loses at most the last few seconds of changes. Changes are only notified,
+which is cheap enough to do on every write; the writer coalesces them and saves
+each changed part of the state at most once per flush interval, off the event
+loop.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from ..models.storage import system_config
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Default interval in seconds between two saves of a changing state
+PERSISTENCE_INTERVAL = 1.0
+
+
+class StateWriter:
+    """Saves the changed parts of the state on a background thread.
+
+    The first change notified after a flush starts the flush interval; every change
+    notified until it has elapsed is written by the same flush. Parts of the state
+    (e.g. "upgrade_sessions") are named by the callers, and the flush function is
+    given the set of parts that changed.
+    """
+
+    def __init__(self, flush: Callable[[Set[str]], int]):
+        """Initialize the writer.
+
+        Args:
+            flush: Function writing the given parts of the state and returning the
+                number of bytes written
+        """
+        self._flush = flush
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self.notifications = 0
+        self.flushes = 0
+        self.errors = 0
+        self.bytes_written = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    @property
+    def interval(self) -> float:
+        """Seconds between two flushes, as configured."""
+        return system_config.get("persistence_interval") or PERSISTENCE_INTERVAL
+
+    @property
+    def running(self) -> bool:
+        """Whether the background thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background thread."""
+        if self.running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="state-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Stop the background thread once it has finished the current flush.
+
+        Changes that have not been flushed yet are left to the caller.
+        """
+        self._stopping = True
+        self._changed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self, part: str):
+        """Record that a part of the state has changed."""
+        self.notifications += 1
+        if part in self._dirty:
+            return
+        with self._lock:
+            self._dirty.add(part)
+        self._changed.set()
+
+    def flush_soon(self):
+        """Flush the pending changes without waiting for the rest of the interval."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._changed.wait()
+            if self._stopping:
+                break
+            # Let further changes accumulate before writing them together
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._changed.clear()
+            if not self._stopping:
+                self.flush()
+
+    def flush(self) -> int:
+        """Write the parts of the state that changed since the last flush.
+
+        Returns:
+            The number of bytes written
+        """
+        with self._flush_lock:
+            with self._lock:
+                parts, self._dirty = self._dirty, set()
+            if not parts:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                written = self._flush(parts)
+            except Exception as e:
+                logger.error(f"Failed to save the state: {e}")
+                self.errors += 1
+                # Try again on the next flush
+                with self._lock:
+                    self._dirty |= parts
+                self._changed.set()
+                return 0
+
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.bytes_written += written
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            return written
+
+    def stats(self) -> Dict[str, float]:
+        """Return counters describing the writer's activity."""
+        mean = self.total_flush_seconds / self.flushes if self.flushes else 0.0
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "pending": sorted(self._dirty),
+            "notifications": self.notifications,
+            "flushes": self.flushes,
+            "errors": self.errors,
+            "bytes_written": self.bytes_written,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 3),
+            "mean_flush_ms": round(mean * 1000, 3),
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 3),
+        }
@@ -0,0 +1,167 @@
+"""Upgrade scheduler for Dell Unisphere API.
+
+This module runs upgrade simulations as coroutines on the server's own event loop
+instead of spawning a thread and a private event loop per session.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class SimulationScheduler:
+    """Runs one simulation coroutine per session on a single event loop.
+
+    Concurrency is bounded by a semaphore: sessions started beyond the limit are
+    queued and begin as soon as a running simulation finishes or is cancelled.
+
+    Simulations that have to wait for an external state change (e.g. a paused
+    session being resumed) block on a per-session event instead of polling.
+    """
+
+    def __init__(self, max_concurrent: int):
+        """Initialize the scheduler.
+
+        Args:
+            max_concurrent: Maximum number of simulations allowed to run at once
+        """
+        self.max_concurrent = max_concurrent
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._running = 0
+        self._wakeup_events: Dict[str, asyncio.Event] = {}
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        """Bind the scheduler to the given event loop.
+
+        asyncio primitives belong to the loop they were first used on, so the
+        semaphore is recreated whenever a new loop (e.g. a new test loop) is seen.
+        """
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._running = 0
+            self._wakeup_events.clear()
+
+    def is_active(self, session_id: str) -> bool:
+        """Check whether a simulation task for the session is still pending."""
+        task = self.tasks.get(session_id)
+        return task is not None and not task.done()
+
+    def start(
+        self, session_id: str, coroutine_function: Callable[[str], Awaitable[Any]]
+    ) -> asyncio.Task:
+        """Schedule a simulation for the session on the running event loop.
+
+        Args:
+            session_id: ID of the upgrade session
+            coroutine_function: Coroutine function called with the session ID once
+                a concurrency slot is available
+
+        Returns:
+            The asyncio task wrapping the simulation
+        """
+        self._bind(asyncio.get_running_loop())
+        task = asyncio.create_task(
+            self._run(session_id, coroutine_function),
+            name=f"upgrade-simulation-{session_id}",
+        )
+        self.tasks[session_id] = task
+        return task
+
+    async def _run(
+        self, session_id: str, coroutine_function: Callable[[str], Awaitable[Any]]
+    ):
+        """Run the simulation once a concurrency slot is free."""
+        try:
+            async with self._semaphore:
+                self._running += 1
+                try:
+                    return await coroutine_function(session_id)
+                finally:
+                    self._running -= 1
+        finally:
+            # Only forget the task if it has not been replaced by a newer one
+            if self.tasks.get(session_id) is asyncio.current_task():
+                del self.tasks[session_id]
+
+    async def wait_until(self, session_id: str, predicate: Callable[[], bool]):
+        """Suspend the caller until the predicate holds.
+
+        The predicate is only re-evaluated when notify() is called for the
+        session, so a waiting simulation costs no CPU at all.
+
+        Args:
+            session_id: ID of the upgrade session being waited on
+            predicate: Condition to wait for
+        """
+        self._bind(asyncio.get_running_loop())
+        while not predicate():
+            event = self._wakeup_events.get(session_id)
+            if event is None:
+                event = self._wakeup_events[session_id] = asyncio.Event()
+            await event.wait()
+
+    def notify(self, session_id: str):
+        """Wake all coroutines waiting on the session.
+
+        Safe to call from outside the event loop thread.
+        """
+        event = self._wakeup_events.pop(session_id, None)
+        if event is None:
+            return
+        self._call_on_loop(event.set)
+
+    def _call_on_loop(self, callback: Callable[[], Any]):
+        """Invoke the callback on the scheduler's loop thread."""
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+
+        if on_loop or self._loop is None or self._loop.is_closed():
+            callback()
+        else:
+            self._loop.call_soon_threadsafe(callback)
+
+    def cancel(self, session_id: str) -> bool:
+        """Cancel the simulation for the session.
+
+        Safe to call from outside the event loop thread.
+
+        Returns:
+            True if a pending simulation was cancelled, False otherwise
+        """
+        self._wakeup_events.pop(session_id, None)
+        task = self.tasks.pop(session_id, None)
+        if task is None or task.done():
+            return False
+
+        self._call_on_loop(task.cancel)
+        return True
+
+    async def shutdown(self):
+        """Cancel all simulations and wait for them to unwind."""
+        tasks = [task for task in self.tasks.values() if not task.done()]
+        self.tasks.clear()
+        self._wakeup_events.clear()
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"Cancelled {len(tasks)} upgrade simulations on shutdown")
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters describing the scheduler's current load."""
+        active = sum(1 for task in self.tasks.values() if not task.done())
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": active,
+            "running": self._running,
+            "queued": max(active - self._running, 0),
+            "waiting": len(self._wakeup_events),
+        }
@@ -6,10 +6,21 @@ This module provides utilities for simulating software upgrade processes.
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set
 
-from ..models.storage import candidate_software_versions, upgrade_sessions
+import anyio
+
+from ..models.records import TaskRecord
+from ..models.storage import (
+    candidate_software_versions,
+    system_config,
+    upgrade_sessions,
+)
 from ..schemas.base import TaskStatusEnum, TaskTypeEnum, UpgradeStatusEnum
+from .clock import get_clock
+from .progress_engine import ProgressEngine
+from .state_persistence import CANDIDATE_SOFTWARE, notify_state_changed
+from .upgrade_scheduler import SimulationScheduler
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -18,9 +29,27 @@ logger = logging.getLogger(__name__)
 # For reboot task, we want it to last approximately 60 seconds
 SIMULATION_SPEED_FACTOR = 40  # Slowed down to better observe the reboot behavior
 
+# Upper bound on simulations progressing at the same time; further sessions queue
+MAX_CONCURRENT_SIMULATIONS = 10000
+
+# All simulations run as tasks on the server's event loop
+scheduler = SimulationScheduler(MAX_CONCURRENT_SIMULATIONS)
+
 # Store active simulation tasks
-active_simulations = {}
-active_tasks = {}
+active_simulations = scheduler.tasks
+
+# A single engine drives the progress of every running task
+progress_engine = ProgressEngine()
+
+# Per-session overrides of the simulation speed factor
+session_speed_factors: Dict[str, float] = {}
+
+# Sessions with a task in progress, keyed by the caption of that task, so that the
+# reboot simulator can find a running reboot task without scanning every session
+running_task_sessions: Dict[str, Set[str]] = {}
+
+# Statuses of upgrade sessions that no longer block a new upgrade session
+FINISHED_STATUSES = (UpgradeStatusEnum.COMPLETED, UpgradeStatusEnum.FAILED)
 
 
 def parse_time_to_seconds(time_str: str) -> int:
@@ -30,6 +59,22 @@ def parse_time_to_seconds(time_str: str) -> int:
     return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
 
 
+def get_speed_factor(session_id: str) -> float:
+    """Return the time acceleration applied to a session's task durations.
+
+    A per-session override takes precedence over the configured default, which in
+    turn falls back to SIMULATION_SPEED_FACTOR.
+    """
+    if session_id in session_speed_factors:
+        return session_speed_factors[session_id]
+    return system_config.get("simulation_speed_factor") or SIMULATION_SPEED_FACTOR
+
+
+def forget_speed_factor(session_id: str):
+    """Drop the speed factor override of a session whose simulation has ended."""
+    session_speed_factors.pop(session_id, None)
+
+
 def format_timedelta(td: timedelta) -> str:
     """Format a timedelta to ISO 8601 duration format."""
     total_seconds = int(td.total_seconds())
@@ -41,7 +86,7 @@ def format_timedelta(td: timedelta) -> str:
 
 def create_realistic_upgrade_tasks() -> List[Dict[str, Any]]:
     """Create a realistic list of upgrade tasks with proper timing."""
-    now = datetime.now()
+    now = get_clock().now()
 
     return [
         {
@@ -131,6 +176,103 @@ def create_realistic_upgrade_tasks() -> List[Dict[str, Any]]:
     ]
 
 
+def set_task_status(session_id: str, task: TaskRecord, status: TaskStatusEnum):
+    """Update the status of a task, keeping running_task_sessions in sync.
+
+    The change is also reported to the session so that it reaches the state log.
+
+    Args:
+        session_id: ID of the upgrade session owning the task
+        task: The task
+        status: The new status
+    """
+    task.status = status
+    session = upgrade_sessions.get(session_id)
+    if session is not None:
+        session.task_changed(task)
+
+    sessions = running_task_sessions.setdefault(task.caption, set())
+    if status == TaskStatusEnum.IN_PROGRESS:
+        sessions.add(session_id)
+    else:
+        sessions.discard(session_id)
+
+
+def track_running_tasks(session_id: str):
+    """Register the in-progress tasks of a session, e.g. after loading it from disk."""
+    forget_running_tasks(session_id)
+    for task in upgrade_sessions.get(session_id, {}).get("tasks", []):
+        if task.status == TaskStatusEnum.IN_PROGRESS:
+            running_task_sessions.setdefault(task.caption, set()).add(session_id)
+
+
+def active_session_ids() -> List[str]:
+    """Return the IDs of the upgrade sessions that have not completed or failed.
+
+    The sessions are looked up in the status index of upgrade_sessions, so the cost
+    does not depend on how many finished sessions are stored. Lazily progressed
+    sessions must be refreshed first for their status to be current.
+
+    Returns:
+        The IDs in the order the sessions were created
+    """
+    return upgrade_sessions.in_insertion_order(
+        upgrade_sessions.keys_where_not("status", FINISHED_STATUSES)
+    )
+
+
+def forget_running_tasks(session_id: str):
+    """Remove a session from running_task_sessions."""
+    for sessions in running_task_sessions.values():
+        sessions.discard(session_id)
+
+
+def find_session_running_task(caption: str) -> Optional[str]:
+    """Return the ID of a session whose task with the given caption is in progress.
+
+    Only the sessions registered for the caption are checked, so the cost does not
+    depend on how many sessions are stored. Entries left behind by sessions that
+    were removed or changed without set_task_status() are dropped on the way.
+
+    Args:
+        caption: Caption of the task
+
+    Returns:
+        The session ID, or None if no such task is in progress
+    """
+    sessions = running_task_sessions.get(caption)
+    while sessions:
+        session_id = next(iter(sessions))
+        session = upgrade_sessions.get(session_id)
+        if session is not None and any(
+            task.caption == caption and task.status == TaskStatusEnum.IN_PROGRESS
+            for task in session.get("tasks", [])
+        ):
+            return session_id
+        sessions.discard(session_id)
+    return None
+
+
+def _is_paused(session_id: str) -> bool:
+    """Check whether the session exists and is paused."""
+    session = upgrade_sessions.get(session_id)
+    return session is not None and session["status"] == UpgradeStatusEnum.PAUSED
+
+
+async def wait_while_paused(session_id: str):
+    """Wait without polling until the session is no longer paused.
+
+    The wait ends when notify_session_resumed() is called for the session (or the
+    simulation is cancelled).
+    """
+    await scheduler.wait_until(session_id, lambda: not _is_paused(session_id))
+
+
+def notify_session_resumed(session_id: str):
+    """Wake the simulation of a session that has left the paused state."""
+    scheduler.notify(session_id)
+
+
 async def simulate_task_execution(task_duration, session_id, task_index, total_tasks):
     """Simulate the execution of a single task.
 
@@ -156,20 +298,20 @@ async def simulate_task_execution(task_duration, session_id, task_index, total_t
     task = session["tasks"][task_index]
 
     # Set task to IN_PROGRESS immediately
-    task["status"] = TaskStatusEnum.IN_PROGRESS
+    set_task_status(session_id, task, TaskStatusEnum.IN_PROGRESS)
 
     # Add a message about starting the task
-    session["messages"].append(
+    session.add_message(
         {
-            "timestamp": datetime.now().isoformat(),
-            "message": f"Starting task: {task['caption']}",
+            "timestamp": get_clock().now().isoformat(),
+            "message": f"Starting task: {task.caption}",
             "severity": 0,
         }
     )
 
-    # Simulate task execution with progress updates
-    increment_count = 10  # Number of progress updates
-    for j in range(increment_count):
+    # Let the shared progress engine drive the task until it completes
+    remaining = task_duration
+    while remaining > 0:
         # Check if session still exists
         if session_id not in upgrade_sessions:
             logger.info(f"Session {session_id} no longer exists during task execution")
@@ -195,23 +337,13 @@ async def simulate_task_execution(task_duration, session_id, task_index, total_t
         # Check if we should pause
         if session["status"] == UpgradeStatusEnum.PAUSED:
             logger.info(f"Task {task_index+1} paused: session {session_id} is paused")
-            while session["status"] == UpgradeStatusEnum.PAUSED:
-                if session_id not in active_simulations:
-                    return False
-                await asyncio.sleep(0.1)
+            await wait_while_paused(session_id)
             logger.info(f"Task {task_index+1} resumed: session {session_id} resumed")
+            continue
 
-        # Sleep for a fraction of the task duration
-        sleep_time = task_duration / increment_count
         try:
-            await asyncio.sleep(sleep_time)
-
-            # Calculate completed tasks so far (including partial completion of current task)
-            completed = task_index + (j + 1) / increment_count
-            session["percentComplete"] = int((completed / total_tasks) * 100)
-
-            logger.debug(
-                f"Task {task_index+1} progress: {(j+1)/increment_count:.1f}, Overall: {session['percentComplete']}%"
+            remaining = await progress_engine.run_task(
+                session_id, task_index, total_tasks, task_duration, remaining
             )
         except asyncio.CancelledError:
             logger.info(f"Task {task_index+1} for session {session_id} was cancelled")
@@ -236,13 +368,13 @@ async def simulate_task_execution(task_duration, session_id, task_index, total_t
     task = session["tasks"][task_index]
 
     # Task completed successfully
-    task["status"] = TaskStatusEnum.COMPLETED
+    set_task_status(session_id, task, TaskStatusEnum.COMPLETED)
 
     # Add a message about task completion
-    session["messages"].append(
+    session.add_message(
         {
-            "timestamp": datetime.now().isoformat(),
-            "message": f"Completed task: {task['caption']}",
+            "timestamp": get_clock().now().isoformat(),
+            "message": f"Completed task: {task.caption}",
             "severity": 0,
         }
     )
@@ -253,58 +385,23 @@ async def simulate_task_execution(task_duration, session_id, task_index, total_t
 
 async def process_upgrade_session(session_id: str):
     """Process an upgrade session in the background."""
-    # Add print statement for immediate console output
-    print(f"DEBUG: process_upgrade_session started for {session_id}")
-
-    # Use both logger.info and logger.warning to see if one works
     logger.info(f"Starting upgrade simulation for session {session_id}")
-    logger.warning(
-        f"Starting upgrade simulation for session {session_id} (WARNING level)"
-    )
 
     if session_id not in upgrade_sessions:
         logger.error(f"Session {session_id} not found")
-        print(f"DEBUG: Session {session_id} not found")
         return
 
     session = upgrade_sessions[session_id]
-    print(f"DEBUG: Found session {session_id} with status {session.get('status')}")
+    logger.debug(f"Found session {session_id} with status {session.get('status')}")
 
     # Check if this is a session being resumed after a server restart
     is_resumed_session = False
     current_task_index = None
 
     # Find the current task that was in progress (if any)
-    session_status = session.get("status")
-    # Handle case where status is a dict with _value_ (serialized enum)
-    if isinstance(session_status, dict) and "_value_" in session_status:
-        session_status = session_status["_value_"]
-    # Handle case where status is an enum
-    elif hasattr(session_status, "_value_"):
-        session_status = session_status._value_
-
-    if (
-        session_status == UpgradeStatusEnum.IN_PROGRESS or session_status == 1
-    ):  # 1 = IN_PROGRESS
+    if session.get("status") == UpgradeStatusEnum.IN_PROGRESS:
         for i, task in enumerate(session.get("tasks", [])):
-            # Check if task is a dictionary or a Pydantic model
-            if isinstance(task, dict):
-                task_status = task.get("status")
-                # Handle case where status is a dict with _value_ (serialized enum)
-                if isinstance(task_status, dict) and "_value_" in task_status:
-                    task_status = task_status["_value_"]
-                # Handle case where status is an enum
-                elif hasattr(task_status, "_value_"):
-                    task_status = task_status._value_
-            else:
-                task_status = getattr(task, "status", None)
-                # Handle case where status is an enum
-                if hasattr(task_status, "_value_"):
-                    task_status = task_status._value_
-
-            if (
-                task_status == TaskStatusEnum.IN_PROGRESS or task_status == 1
-            ):  # 1 = IN_PROGRESS
+            if task.status == TaskStatusEnum.IN_PROGRESS:
                 is_resumed_session = True
                 current_task_index = i
                 logger.info(
@@ -312,31 +409,22 @@ async def process_upgrade_session(session_id: str):
                 )
 
                 # Add a message about resuming the task
-                task_caption = (
-                    task.get("caption")
-                    if isinstance(task, dict)
-                    else getattr(task, "caption", "Unknown task")
-                )
-                session["messages"].append(
+                session.add_message(
                     {
-                        "timestamp": datetime.now().isoformat(),
-                        "message": f"Resuming task after server restart: {task_caption}",
+                        "timestamp": get_clock().now().isoformat(),
+                        "message": f"Resuming task after server restart: {task.caption}",
                         "severity": 0,
                     }
                 )
                 break
 
-    # Initialize list to track asyncio tasks
-    tasks = []
-
     # Check if session is paused and wait for resume
     if session["status"] == UpgradeStatusEnum.PAUSED:
         logger.info(f"Upgrade session {session_id} is paused, waiting for resume")
-        while session["status"] == UpgradeStatusEnum.PAUSED:
-            await asyncio.sleep(0.1)
-            # If session was deleted or cancelled, exit
-            if session_id not in upgrade_sessions:
-                return
+        await wait_while_paused(session_id)
+        # If session was deleted while paused, exit
+        if session_id not in upgrade_sessions:
+            return
 
     # Always ensure the session is in IN_PROGRESS state
     session["status"] = UpgradeStatusEnum.IN_PROGRESS
@@ -344,7 +432,7 @@ async def process_upgrade_session(session_id: str):
 
     # Make sure startTime is set
     if "startTime" not in session:
-        session["startTime"] = datetime.now().isoformat()
+        session["startTime"] = get_clock().now().isoformat()
 
     # Initialize messages array if not present
     if "messages" not in session:
@@ -354,9 +442,9 @@ async def process_upgrade_session(session_id: str):
     candidate_id = session.get("candidate")
     if not candidate_id or candidate_id not in candidate_software_versions:
         session["status"] = UpgradeStatusEnum.FAILED
-        session["messages"].append(
+        session.add_message(
             {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": get_clock().now().isoformat(),
                 "message": "Candidate software version not found",
                 "severity": 2,
             }
@@ -374,12 +462,8 @@ async def process_upgrade_session(session_id: str):
             # If this is a resumed session and we're not at the current task yet, skip
             if is_resumed_session and i < current_task_index:
                 # Count completed tasks
-                if isinstance(task, dict):
-                    if task.get("status") == TaskStatusEnum.COMPLETED:
-                        completed_tasks += 1
-                else:
-                    if getattr(task, "status", None) == TaskStatusEnum.COMPLETED:
-                        completed_tasks += 1
+                if task.status == TaskStatusEnum.COMPLETED:
+                    completed_tasks += 1
                 continue
             # Check if session still exists (might have been deleted or stopped)
             if session_id not in upgrade_sessions:
@@ -408,41 +492,21 @@ async def process_upgrade_session(session_id: str):
                 )
                 return
 
-            # Check if task is a dictionary or a Pydantic model
-            if hasattr(task, "status"):
-                # It's a Pydantic model, use attribute access
-                if task.status == TaskStatusEnum.COMPLETED:
-                    completed_tasks += 1
-                    continue
-
-                # Set task to IN_PROGRESS immediately
-                task.status = TaskStatusEnum.IN_PROGRESS
-
-                # Add a message about starting the task
-                session["messages"].append(
-                    {
-                        "timestamp": datetime.now().isoformat(),
-                        "message": f"Starting task: {task.caption}",
-                        "severity": 0,
-                    }
-                )
-            else:
-                # It's a dictionary, use dictionary access
-                if task["status"] == TaskStatusEnum.COMPLETED:
-                    completed_tasks += 1
-                    continue
+            if task.status == TaskStatusEnum.COMPLETED:
+                completed_tasks += 1
+                continue
 
-                # Set task to IN_PROGRESS immediately
-                task["status"] = TaskStatusEnum.IN_PROGRESS
+            # Set task to IN_PROGRESS immediately
+            set_task_status(session_id, task, TaskStatusEnum.IN_PROGRESS)
 
-                # Add a message about starting the task
-                session["messages"].append(
-                    {
-                        "timestamp": datetime.now().isoformat(),
-                        "message": f"Starting task: {task['caption']}",
-                        "severity": 0,
-                    }
-                )
+            # Add a message about starting the task
+            session.add_message(
+                {
+                    "timestamp": get_clock().now().isoformat(),
+                    "message": f"Starting task: {task.caption}",
+                    "severity": 0,
+                }
+            )
 
             # Update session percentage based on tasks completed so far
             session["percentComplete"] = int((completed_tasks / total_tasks) * 100)
@@ -451,45 +515,15 @@ async def process_upgrade_session(session_id: str):
             if session["status"] == UpgradeStatusEnum.PAUSED:
                 logger.info(f"Upgrade session {session_id} paused during task {i+1}")
                 # Wait until resumed or cancelled
-                while session["status"] == UpgradeStatusEnum.PAUSED:
-                    await asyncio.sleep(0.1)
-                    # If session was deleted or cancelled, exit
-                    if session_id not in upgrade_sessions:
-                        return
-
-            # Handle task properties based on its type
-            if hasattr(task, "status"):
-                # It's a Pydantic model - we need to update the session's task list directly
-                # since we can't modify the Pydantic model
-
-                # Get estimated time from the model
-                if hasattr(task, "estimatedTime"):
-                    est_time = task.estimatedTime
-                elif hasattr(task, "estRemainTime"):
-                    est_time = task.estRemainTime
-                else:
-                    est_time = "00:01:00.000"
-
-                task_caption = task.caption
-
-                # Update the task in the session's task list
-                # We need to convert the Pydantic model to a dict
-                if not isinstance(session["tasks"][i], dict):
-                    # Convert the task to a dictionary
-                    task_dict = task.model_dump()
-                    # Replace the task in the session's task list
-                    session["tasks"][i] = task_dict
-            else:
-                # It's a dictionary - no need to add startTime to match the original schema
-
-                # Get estimated time from dictionary
-                est_time = task.get(
-                    "estimatedTime", task.get("estRemainTime", "00:01:00.000")
-                )
-
-                task_caption = task["caption"]
-
-            duration = parse_time_to_seconds(est_time) / SIMULATION_SPEED_FACTOR
+                await wait_while_paused(session_id)
+                # If session was deleted while paused, exit
+                if session_id not in upgrade_sessions:
+                    return
+
+            task_caption = task.caption
+            duration = parse_time_to_seconds(task.estRemainTime) / get_speed_factor(
+                session_id
+            )
 
             logger.info(
                 f"Task {i+1}/{total_tasks}: {task_caption} duration: {duration} seconds"
@@ -498,43 +532,20 @@ async def process_upgrade_session(session_id: str):
             # Log task start
             logger.info(f"Starting task {i+1}/{total_tasks}: {task_caption}")
 
-            # Create a task for this step
-            task_obj = asyncio.create_task(
-                simulate_task_execution(duration, session_id, i, total_tasks)
-            )
-            tasks.append(task_obj)
-
-            # Wait for this task to complete before moving to the next one
+            # Run this step before moving to the next one
             try:
-                await task_obj
-
-                # Mark task as completed based on its type
-                if hasattr(task, "status"):
-                    # It's a Pydantic model - we need to update the session's task list
-                    task_caption = task.caption
-
-                    # Update the task in the session's task list
-                    if isinstance(session["tasks"][i], dict):
-                        session["tasks"][i]["status"] = TaskStatusEnum.COMPLETED
-                    else:
-                        # Convert the task to a dictionary, update it, and replace it in the list
-                        task_dict = task.model_dump()
-                        task_dict["status"] = TaskStatusEnum.COMPLETED
-                        session["tasks"][i] = task_dict
-                else:
-                    # It's a dictionary
-                    task["status"] = TaskStatusEnum.COMPLETED
-                    task_caption = task["caption"]
+                await simulate_task_execution(duration, session_id, i, total_tasks)
 
+                set_task_status(session_id, task, TaskStatusEnum.COMPLETED)
                 completed_tasks += 1
 
                 # Update session progress percentage
                 session["percentComplete"] = int(completed_tasks / total_tasks * 100)
 
                 # Add a message about task completion
-                session["messages"].append(
+                session.add_message(
                     {
-                        "timestamp": datetime.now().isoformat(),
+                        "timestamp": get_clock().now().isoformat(),
                         "message": f"Completed task: {task_caption}",
                         "severity": 0,
                     }
@@ -558,9 +569,9 @@ async def process_upgrade_session(session_id: str):
             # Set status to COMPLETED
             session["status"] = UpgradeStatusEnum.COMPLETED
             session["percentComplete"] = 100
-            session["endTime"] = datetime.now().isoformat()
+            session["endTime"] = get_clock().now().isoformat()
             session["elapsedTime"] = format_timedelta(
-                datetime.now() - datetime.fromisoformat(session["startTime"])
+                get_clock().now() - datetime.fromisoformat(session["startTime"])
             )
 
             # Remove candidate after successful upgrade
@@ -568,98 +579,119 @@ async def process_upgrade_session(session_id: str):
                 candidate_id = session["candidate"]
                 if candidate_id in candidate_software_versions:
                     del candidate_software_versions[candidate_id]
+                    notify_state_changed(CANDIDATE_SOFTWARE)
                     logger.info(
                         f"Removed candidate {candidate_id} after successful upgrade"
                     )
 
             logger.info(f"Upgrade session {session_id} completed successfully")
     except asyncio.CancelledError:
+        # Leave the status alone: stop_upgrade_simulation has already marked the
+        # session as failed, and on server shutdown the session must stay in
+        # progress so that it is resumed after the restart.
         logger.info(f"Upgrade session {session_id} was cancelled")
-        session["status"] = UpgradeStatusEnum.FAILED
         raise
     except Exception as e:
         logger.error(f"Error processing upgrade session {session_id}: {e}")
         session["status"] = UpgradeStatusEnum.FAILED
         raise
-    finally:
-        # Clean up active tasks but keep the session for status checking
-        if session_id in active_tasks:
-            del active_tasks[session_id]
 
     # Return the session ID for reference
     return session_id
 
 
-def start_upgrade_simulation(session_id: str):
-    """Start a new upgrade simulation for the given session."""
-    if session_id in active_simulations:
-        logger.warning(f"Simulation for session {session_id} is already running")
+async def _run_upgrade_simulation(session_id: str):
+    """Run an upgrade session, logging how it ended."""
+    try:
+        result = await process_upgrade_session(session_id)
+        logger.debug(f"Upgrade simulation for session {session_id} returned {result}")
+        return result
+    except asyncio.CancelledError:
+        logger.info(f"Upgrade simulation for session {session_id} was stopped")
+        raise
+    except Exception as e:
+        # Check if session was intentionally stopped
+        if session_id not in upgrade_sessions:
+            logger.info(f"Upgrade simulation for session {session_id} was stopped")
+        elif upgrade_sessions[session_id]["status"] in [
+            UpgradeStatusEnum.FAILED,
+            UpgradeStatusEnum.CANCELLED,
+        ]:
+            status_str = str(upgrade_sessions[session_id]["status"].value).lower()
+            logger.info(f"Upgrade simulation for session {session_id} was {status_str}")
+        else:
+            logger.error(
+                f"Upgrade simulation for session {session_id} failed: {str(e)}"
+            )
+    finally:
+        # A session cancelled on shutdown is still in progress and resumes later
+        session = upgrade_sessions.get(session_id)
+        if session is None or session["status"] in FINISHED_STATUSES:
+            forget_speed_factor(session_id)
+
+
+def start_upgrade_simulation(session_id: str, speed_factor: Optional[float] = None):
+    """Start a new upgrade simulation for the given session.
+
+    The simulation runs as a task on the server's event loop. When called from a
+    worker thread (FastAPI runs sync background tasks in its threadpool), the call
+    is handed over to the event loop thread.
+
+    Args:
+        session_id: ID of the upgrade session
+        speed_factor: Optional time acceleration for this session only
+    """
+    if speed_factor:
+        session_speed_factors[session_id] = speed_factor
+
+    # Sessions in lazy progress mode have their progress computed on read
+    from .lazy_progress import is_lazy, start_lazy_progress
+
+    session = upgrade_sessions.get(session_id)
+    if session is not None and (
+        is_lazy(session) or system_config.get("progress_mode") == "lazy"
+    ):
+        if not is_lazy(session):
+            start_lazy_progress(session_id)
         return
 
-    # Log that we're starting the simulation
-    logger.info(f"Initializing upgrade simulation for session {session_id}")
-    print(f"DEBUG: Initializing upgrade simulation for session {session_id}")
+    # Processes sharing their state leave the simulations to the leader, which
+    # starts them when it reads the session
+    from .shared_state import runs_simulations
 
-    # Use a completely different approach with a dedicated thread for the task
-    import threading
+    if not runs_simulations():
+        logger.info(
+            f"Leaving upgrade simulation for session {session_id} to the leader"
+        )
+        return
 
-    def run_async_task():
-        print(f"DEBUG: Thread started for session {session_id}")
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    if scheduler.is_active(session_id):
+        logger.warning(f"Simulation for session {session_id} is already running")
+        return
 
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
         try:
-            # Run the coroutine to completion in this thread
-            print(f"DEBUG: About to run process_upgrade_session for {session_id}")
-            result = loop.run_until_complete(process_upgrade_session(session_id))
-            print(
-                f"DEBUG: process_upgrade_session completed for {session_id} with result: {result}"
+            anyio.from_thread.run_sync(
+                start_upgrade_simulation, session_id, speed_factor
             )
-            return result
-        except Exception as e:
-            # Check if session was intentionally stopped
-            if session_id not in upgrade_sessions:
-                print(
-                    f"DEBUG: Session {session_id} was stopped, ignoring exception: {str(e)}"
-                )
-                logger.info(f"Upgrade simulation for session {session_id} was stopped")
-            elif session_id in upgrade_sessions and upgrade_sessions[session_id][
-                "status"
-            ] in [UpgradeStatusEnum.FAILED, UpgradeStatusEnum.CANCELLED]:
-                status_str = str(upgrade_sessions[session_id]["status"].value).lower()
-                print(
-                    f"DEBUG: Session {session_id} was already marked as {status_str}, ignoring exception: {str(e)}"
-                )
-                logger.info(
-                    f"Upgrade simulation for session {session_id} was {status_str}"
-                )
-            else:
-                print(
-                    f"DEBUG: Exception in process_upgrade_session for {session_id}: {str(e)}"
-                )
-                logger.error(
-                    f"Upgrade simulation for session {session_id} failed: {str(e)}"
-                )
-        finally:
-            loop.close()
-            print(f"DEBUG: Thread for session {session_id} finished")
-            # Clean up the task reference
-            if session_id in active_simulations:
-                del active_simulations[session_id]
+        except RuntimeError:
+            logger.error(
+                f"Cannot start upgrade simulation for session {session_id}: no running event loop"
+            )
+        return
 
-    # Create a thread for the task
-    thread = threading.Thread(target=run_async_task, daemon=True)
-    thread.start()
+    # Log that we're starting the simulation
+    logger.info(f"Initializing upgrade simulation for session {session_id}")
 
-    # Store a reference to the thread
-    active_simulations[session_id] = thread
+    scheduler.start(session_id, _run_upgrade_simulation)
 
     # Set initial session state if not already set
     if session_id in upgrade_sessions:
         session = upgrade_sessions[session_id]
         if "startTime" not in session:
-            session["startTime"] = datetime.now().isoformat()
+            session["startTime"] = get_clock().now().isoformat()
         if "messages" not in session:
             session["messages"] = []
 
@@ -668,29 +700,28 @@ def start_upgrade_simulation(session_id: str):
 
 def stop_upgrade_simulation(session_id: str):
     """Stop an ongoing upgrade simulation."""
-    if session_id not in active_simulations:
+    from .lazy_progress import LAZY_PROGRESS_KEY
+
+    session = upgrade_sessions.get(session_id)
+    lazy_progress = session.pop(LAZY_PROGRESS_KEY, None) if session else None
+    if lazy_progress is None and not scheduler.is_active(session_id):
         logger.warning(f"No active simulation found for session {session_id}")
         return
 
     # Mark the session as failed if it exists
     if session_id in upgrade_sessions:
         upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.FAILED
-        upgrade_sessions[session_id]["messages"].append(
+        upgrade_sessions[session_id].add_message(
             {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": get_clock().now().isoformat(),
                 "message": "Upgrade simulation was cancelled",
                 "severity": 1,
             }
         )
 
-    # For Thread objects, we can't cancel them directly, but we can mark the session as failed
-    # which will cause the thread to exit gracefully when it checks the session status
-    logger.info(
-        f"Task {session_id} stopped: simulation for session {session_id} was stopped"
-    )
-
-    # Remove from active simulations
-    if session_id in active_simulations:
-        del active_simulations[session_id]
+    # Cancel the task; it unwinds at its next await point
+    scheduler.cancel(session_id)
+    forget_running_tasks(session_id)
+    forget_speed_factor(session_id)
 
     logger.info(f"Stopped upgrade simulation for session {session_id}")
@@ -131,3 +131,39 @@ class TestAuthRoutes:
         data = response.json()
         assert "error" in data
         assert "CSRF" in data["error"]
+
+    def test_csrf_token_in_body(self, app_client, auth_headers, reset_storage):
+        """Test that a CSRF token passed in the body is accepted and the body kept."""
+        response = app_client.post(
+            "/api/types/systemConfig/action/update",
+            json={
+                "eligibility_status": "success",
+                "comment": "EMC-CSRF-TOKEN: token-from-body",
+            },
+            headers=auth_headers,
+        )
+
+        # The body must still reach the route after the middleware has read it
+        assert response.status_code == 200
+        assert response.json()["content"]["eligibility_status"] == "success"
+
+    def test_basic_auth_reuses_login_session(
+        self, app_client, auth_headers, reset_storage
+    ):
+        """Test that repeated basic auth requests share one login session."""
+        from dell_unisphere_package.models.storage import sessions
+
+        for _ in range(5):
+            response = app_client.get(
+                "/api/types/loginSessionInfo/instances", headers=auth_headers
+            )
+            assert response.status_code == 200
+
+        assert len(sessions) == 1
+        assert response.json()["content"]["id"] in sessions
+
+        response = app_client.get(
+            "/api/types/systemMetrics/instances", headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["content"]["login_sessions"]["live_sessions"] == 1
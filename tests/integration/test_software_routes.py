@@ -51,6 +51,32 @@ class TestSoftwareRoutes:
         assert data["links"][0]["rel"] == "self"
         assert entry["links"][0]["rel"] == "self"
 
+    def test_get_installed_software_versions_paginated(
+        self, app_client, auth_headers, reset_storage
+    ):
+        """Test that per_page and page select a page of installed software versions."""
+        response = app_client.get(
+            "/api/types/installedSoftwareVersion/instances?per_page=1&page=2",
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["@base"].endswith(
+            "/api/types/installedSoftwareVersion/instances?per_page=1"
+        )
+        assert data["entries"] == []
+        assert data["links"] == [
+            {"rel": "self", "href": "&page=2"},
+            {"rel": "prev", "href": "&page=1"},
+        ]
+
+        response = app_client.get(
+            "/api/types/installedSoftwareVersion/instances?per_page=none",
+            headers=auth_headers,
+        )
+        assert response.status_code == 400
+
     def test_get_installed_software_version_by_id(
         self, app_client, auth_headers, reset_storage
     ):
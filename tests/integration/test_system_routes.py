@@ -67,3 +67,59 @@ class TestSystemRoutes:
         data = response.json()
         assert "entries" in data
         assert len(data["entries"]) == 1
+
+    def test_advance_virtual_clock(self, app_client, auth_headers, csrf_token):
+        """Test switching to virtual time and advancing the simulation clock."""
+        from dell_unisphere_package.models.storage import system_config
+        from dell_unisphere_package.utils.clock import RealClock, set_clock
+
+        headers = {**auth_headers, "EMC-CSRF-TOKEN": csrf_token}
+        try:
+            # Advancing is rejected while the clock follows real time
+            response = app_client.post(
+                "/api/types/systemConfig/action/advanceClock",
+                json={"seconds": 900},
+                headers=headers,
+            )
+            assert response.status_code == 400
+
+            response = app_client.post(
+                "/api/types/systemConfig/action/update",
+                json={"clock_mode": "virtual"},
+                headers=headers,
+            )
+            assert response.status_code == 200
+            assert response.json()["content"]["clock_mode"] == "virtual"
+
+            response = app_client.post(
+                "/api/types/systemConfig/action/advanceClock",
+                json={"seconds": 900},
+                headers=headers,
+            )
+            assert response.status_code == 200
+            assert response.json()["content"]["time"] == 900
+        finally:
+            set_clock(RealClock())
+            system_config["clock_mode"] = "real"
+
+    def test_invalid_update_changes_nothing(self, app_client, auth_headers, csrf_token):
+        """Test that a rejected update leaves the configuration and persistence alone."""
+        from dell_unisphere_package.models.storage import (
+            system_config,
+            upgrade_sessions,
+        )
+        from dell_unisphere_package.utils.state_persistence import get_state_database
+
+        before = dict(system_config)
+        response = app_client.post(
+            "/api/types/systemConfig/action/update",
+            json={
+                "persistence_mode": "sqlite",
+                "progress_mode": "lazy",
+                "clock_mode": "bogus",
+            },
+            headers={**auth_headers, "EMC-CSRF-TOKEN": csrf_token},
+        )
+        assert response.status_code == 400
+        assert system_config == before
+        assert get_state_database(upgrade_sessions) is None
@@ -10,7 +10,10 @@ from dell_unisphere_package.models.storage import (
     upgrade_sessions,
 )
 from dell_unisphere_package.schemas.base import TaskStatusEnum, UpgradeStatusEnum
-from dell_unisphere_package.utils.upgrade_simulator import SIMULATION_SPEED_FACTOR
+from dell_unisphere_package.utils.upgrade_simulator import (
+    SIMULATION_SPEED_FACTOR,
+    set_task_status,
+)
 
 # Set up logger
 logger = logging.getLogger(__name__)
@@ -178,6 +181,78 @@ class TestUpgradeEndpoints:
         assert "percentComplete" in session
         assert "tasks" in session
 
+    def test_get_upgrade_sessions_dotted_fields(
+        self, app_client, auth_headers, csrf_token
+    ):
+        """Test that dotted fields select nested fields of the sessions."""
+        headers = {**auth_headers, "EMC-CSRF-TOKEN": csrf_token}
+        app_client.cookies.set("EMC-CSRF-TOKEN", csrf_token)
+        create_response = app_client.post(
+            "/api/types/upgradeSession/instances",
+            json={"candidate": {"id": "candidate_test"}},
+            headers=headers,
+        )
+        session_id = create_response.json()["id"]
+
+        response = app_client.get(
+            "/api/types/upgradeSession/instances?fields=id,tasks.status,_progress",
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        session = next(
+            entry["content"]
+            for entry in response.json()["entries"]
+            if entry["content"]["id"] == session_id
+        )
+        assert set(session) == {"id", "tasks"}
+        assert all(set(task) == {"status"} for task in session["tasks"])
+
+        response = app_client.get(
+            f"/api/instances/upgradeSession/{session_id}?fields=caption,tasks.caption",
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        content = response.json()["content"]
+        assert content["caption"].startswith("Upgrade to ")
+        assert content["tasks"][0] == {"caption": "Preparing system"}
+
+    def test_filter_and_order_upgrade_sessions(self, app_client, auth_headers):
+        """Test the filter and orderby query parameters of upgrade sessions."""
+        for i, status in enumerate(
+            [UpgradeStatusEnum.COMPLETED, UpgradeStatusEnum.IN_PROGRESS]
+        ):
+            upgrade_sessions[f"Upgrade_{i}"] = {
+                "id": f"Upgrade_{i}",
+                "status": status,
+                "creationTime": f"2025-01-0{i + 1}T00:00:00",
+                "messages": [],
+                "tasks": [],
+            }
+
+        response = app_client.get(
+            "/api/types/upgradeSession/instances?filter=status eq 1&fields=id",
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert [entry["content"] for entry in response.json()["entries"]] == [
+            {"id": "Upgrade_1"}
+        ]
+
+        response = app_client.get(
+            "/api/types/upgradeSession/instances?orderby=creationTime desc&fields=id",
+            headers=auth_headers,
+        )
+        assert [entry["content"]["id"] for entry in response.json()["entries"]] == [
+            "Upgrade_1",
+            "Upgrade_0",
+        ]
+
+        response = app_client.get(
+            "/api/types/upgradeSession/instances?filter=status eq",
+            headers=auth_headers,
+        )
+        assert response.status_code == 400
+
     def test_pause_and_resume_upgrade(self, app_client, auth_headers, csrf_token):
         """Test pausing and resuming an upgrade session."""
         # Create an upgrade session
@@ -354,3 +429,40 @@ class TestUpgradeEndpoints:
 
         # Verify progress has increased
         assert updated_progress > initial_progress
+
+    def test_connection_reset_during_reboot(
+        self, app_client, auth_headers, csrf_token, monkeypatch
+    ):
+        """Test that requests are reset while the primary SP reboot task runs."""
+        from dell_unisphere_package.utils import state_persistence
+
+        saves = []
+        monkeypatch.setattr(
+            state_persistence, "save_state", lambda *args: saves.append(args)
+        )
+
+        headers = {**auth_headers, "EMC-CSRF-TOKEN": csrf_token}
+        create_response = app_client.post(
+            "/api/types/upgradeSession/instances",
+            json={"candidate": {"id": "candidate_test"}},
+            headers=headers,
+        )
+        session_id = create_response.json()["id"]
+        reboot_task = upgrade_sessions[session_id]["tasks"][9]
+        assert reboot_task.caption == "Rebooting the primary SP"
+
+        set_task_status(session_id, reboot_task, TaskStatusEnum.IN_PROGRESS)
+        for _ in range(3):
+            response = app_client.get(
+                "/api/types/upgradeSession/instances", headers=auth_headers
+            )
+            assert response.status_code == 444
+
+        # The state is saved once per reboot, not on every reset request
+        assert len(saves) == 1
+
+        set_task_status(session_id, reboot_task, TaskStatusEnum.COMPLETED)
+        response = app_client.get(
+            "/api/types/upgradeSession/instances", headers=auth_headers
+        )
+        assert response.status_code == 200
@@ -6,12 +6,15 @@ from unittest.mock import MagicMock
 
 import pytest
 from fastapi import HTTPException, Request
+from starlette.datastructures import QueryParams
 
 from dell_unisphere_package.controllers.auth import (
     error_response,
     format_response,
     get_current_user,
 )
+from dell_unisphere_package.models.indexed_store import KeyedRecords
+from dell_unisphere_package.schemas.base import BasicSystemInfo
 
 
 @pytest.mark.unit
@@ -54,6 +57,54 @@ class TestAuthController:
         assert excinfo.value.status_code == 401
         assert "Not authenticated" in excinfo.value.detail
 
+    def test_get_current_user_basic_auth_cache_invalidation(self, monkeypatch):
+        """Test that cached basic auth credentials follow changes to users."""
+        from dell_unisphere_package.controllers import auth
+        from dell_unisphere_package.models.storage import users
+
+        header = "Basic YWRtaW46UGFzc3dvcmQxMjMh"  # admin:Password123!
+        mock_request = MagicMock(spec=Request)
+        mock_request.headers = {"Authorization": header}
+        mock_request.cookies = {}
+
+        assert get_current_user(mock_request)["username"] == "admin"
+        assert header in auth._credential_cache
+
+        # A cache hit does not decode the header again
+        monkeypatch.setattr(auth.base64, "b64decode", None)
+        assert get_current_user(mock_request)["username"] == "admin"
+
+        # Changing the password invalidates the cached credentials
+        monkeypatch.setitem(users, "admin", {**users["admin"], "password": "changed"})
+        with pytest.raises(HTTPException):
+            get_current_user(mock_request)
+        assert header not in auth._credential_cache
+
+    def test_basic_auth_cache_concurrent_use(self, monkeypatch):
+        """Test that threads verifying headers never collide in the credential cache."""
+        import base64
+        from concurrent.futures import ThreadPoolExecutor
+
+        from dell_unisphere_package.controllers import auth
+
+        monkeypatch.setattr(auth, "CREDENTIAL_CACHE_SIZE", 2)
+        monkeypatch.setattr(auth, "_credential_cache", auth.OrderedDict())
+        headers = [
+            "Basic " + base64.b64encode(f"admin:{password}".encode()).decode()
+            for password in ["Password123!", "wrong1", "wrong2"]
+        ]
+        headers += [header + "=" * i for header in headers[:1] for i in range(1, 4)]
+
+        def verify(worker):
+            for i in range(300):
+                auth._verify_basic_auth(headers[(worker + i) % len(headers)])
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(verify, worker) for worker in range(8)]:
+                future.result()
+
+        assert len(auth._credential_cache) <= 2
+
     def test_get_current_user_session_auth_success(self):
         """Test that get_current_user correctly handles session-based authentication."""
         # Create a mock request with session cookie
@@ -157,6 +208,107 @@ class TestAuthController:
         assert response["links"][0]["rel"] == "self"
         assert response["links"][0]["href"] == "/1"
 
+    def test_format_response_urls(self):
+        """Test the URLs and timestamp shared by the entries of a collection."""
+        data = [{"name": "Item 1"}, BasicSystemInfo()]
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.url.scheme = "https"
+        mock_request.url.netloc = "unity:443"
+
+        response = format_response(data, mock_request, instance_type="test")
+
+        assert response["@base"] == (
+            "https://unity:443/api/types/test/instances?per_page=2000"
+        )
+        assert [entry["@base"] for entry in response["entries"]] == [
+            "https://unity:443/api/instances/test"
+        ] * 2
+        assert [entry["links"][0]["href"] for entry in response["entries"]] == [
+            "/0",
+            "/0",
+        ]
+        assert response["entries"][1]["content"]["id"] == "0"
+        assert {entry["updated"] for entry in response["entries"]} == {
+            response["updated"]
+        }
+
+    def test_format_response_pagination(self):
+        """Test that only the requested page of a collection is converted."""
+        data = {str(i): {"id": str(i)} for i in range(5)}
+        converted = []
+
+        def convert(item):
+            converted.append(item["id"])
+            return item
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.url.scheme = "http"
+        mock_request.url.netloc = "localhost:8000"
+        mock_request.query_params = QueryParams("fields=id,name&page=2&per_page=2")
+
+        response = format_response(
+            data.values(), mock_request, instance_type="test", convert=convert
+        )
+
+        assert converted == ["2", "3"]
+        assert [entry["content"]["id"] for entry in response["entries"]] == ["2", "3"]
+        assert response["@base"] == (
+            "http://localhost:8000/api/types/test/instances?fields=id,name&per_page=2"
+        )
+        assert response["links"] == [
+            {"rel": "self", "href": "&page=2"},
+            {"rel": "prev", "href": "&page=1"},
+            {"rel": "next", "href": "&page=3"},
+        ]
+
+        mock_request.query_params = QueryParams("page=3&per_page=2")
+        response = format_response(data.values(), mock_request, instance_type="test")
+        assert [entry["content"]["id"] for entry in response["entries"]] == ["4"]
+        assert [link["rel"] for link in response["links"]] == ["self", "prev"]
+
+        mock_request.query_params = QueryParams("per_page=0")
+        with pytest.raises(HTTPException) as excinfo:
+            format_response(data.values(), mock_request, instance_type="test")
+        assert excinfo.value.status_code == 400
+
+        # Records listed by their keys are only loaded for the requested page
+        loaded = []
+
+        def load(key):
+            loaded.append(key)
+            return data[key]
+
+        mock_request.query_params = QueryParams("page=2&per_page=2")
+        response = format_response(
+            KeyedRecords(list(data), load), mock_request, instance_type="test"
+        )
+        assert [entry["content"]["id"] for entry in response["entries"]] == ["2", "3"]
+        assert loaded == ["2", "3"]
+
+    def test_format_response_compact(self):
+        """Test that compact responses only hold the content of the entries."""
+        mock_request = MagicMock(spec=Request)
+        mock_request.url.scheme = "http"
+        mock_request.url.netloc = "localhost:8000"
+        mock_request.query_params = QueryParams("compact=True&fields=name")
+
+        response = format_response(
+            [BasicSystemInfo(), BasicSystemInfo(name="other")],
+            mock_request,
+            instance_type="basicSystemInfo",
+        )
+        assert response["entries"] == [
+            {"content": {"name": "CKM01204905476"}},
+            {"content": {"name": "other"}},
+        ]
+        assert response["links"] == [{"rel": "self", "href": "&page=1"}]
+
+        response = format_response(
+            BasicSystemInfo(), mock_request, instance_type="test", instance_id="0"
+        )
+        assert response == {"content": {"name": "CKM01204905476"}}
+
     def test_error_response(self):
         """Test that error_response correctly formats error responses."""
         # Call the function for different error codes
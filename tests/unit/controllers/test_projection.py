@@ -0,0 +1,60 @@
+"""
+Unit tests for field projection.
+"""
+
+import pytest
+
+from dell_unisphere_package.controllers.projection import parse_fields, project
+from dell_unisphere_package.schemas.base import (
+    InstalledSoftwareVersion,
+    InstalledSoftwareVersionLanguage,
+)
+
+
+@pytest.mark.unit
+class TestProjection:
+    """Tests for parsing and applying the fields query parameter."""
+
+    def test_parse_fields(self):
+        """Test that dotted fields are parsed into a tree."""
+        assert parse_fields(None) is None
+        assert parse_fields(" , _progress") is None
+        assert parse_fields("id, tasks.status,tasks.caption") == {
+            "id": None,
+            "tasks": {"status": None, "caption": None},
+        }
+        # Requesting a whole field takes precedence over its nested fields
+        assert parse_fields("tasks.status,tasks") == {"tasks": None}
+        assert parse_fields("tasks,tasks.status") == {"tasks": None}
+
+    def test_project_nested_fields(self):
+        """Test that only the requested nested fields are picked out."""
+        session = {
+            "id": "Upgrade_5.4.0",
+            "messages": ["not requested"],
+            "tasks": [
+                {"caption": "Preparing system", "status": 2},
+                {"caption": "Rebooting", "status": 0},
+            ],
+        }
+
+        assert project(session, parse_fields("id,tasks.status,missing")) == {
+            "id": "Upgrade_5.4.0",
+            "tasks": [{"status": 2}, {"status": 0}],
+        }
+
+    def test_project_models_and_defaults(self):
+        """Test projecting models and filling in model defaults for dicts."""
+        fields = parse_fields("version,languages.name")
+        version = InstalledSoftwareVersion(
+            languages=[InstalledSoftwareVersionLanguage(name="English", version="1")]
+        )
+
+        assert project(version, fields) == {
+            "version": "5.3.0",
+            "languages": [{"name": "English"}],
+        }
+        assert project({"version": "5.4.0"}, fields, InstalledSoftwareVersion) == {
+            "version": "5.4.0",
+            "languages": [{"name": "English"}, {"name": "Chinese"}],
+        }
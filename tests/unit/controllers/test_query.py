@@ -0,0 +1,120 @@
+"""
+Unit tests for collection queries.
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException, Request
+from starlette.datastructures import QueryParams
+
+from dell_unisphere_package.controllers.query import (
+    matches,
+    parse_filter,
+    query_collection,
+)
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.schemas.base import UpgradeStatusEnum
+
+
+def make_request(query: str):
+    """Create a mock request with a query string."""
+    request = MagicMock(spec=Request)
+    request.query_params = QueryParams(query)
+    return request
+
+
+@pytest.fixture
+def store():
+    """Create a store of upgrade sessions indexed by status and creationTime."""
+    store = IndexedStore(indexes=("status",), ordered=("creationTime",))
+    statuses = [
+        UpgradeStatusEnum.COMPLETED,
+        UpgradeStatusEnum.IN_PROGRESS,
+        UpgradeStatusEnum.FAILED,
+        UpgradeStatusEnum.COMPLETED,
+    ]
+    for i, status in enumerate(statuses):
+        store[f"Upgrade_{i}"] = {
+            "id": f"Upgrade_{i}",
+            "caption": f"Upgrade to 5.{i}",
+            "status": status,
+            "creationTime": f"2025-01-0{4 - i}T00:00:00",
+        }
+    return store
+
+
+@pytest.mark.unit
+class TestQuery:
+    """Tests for the filter and orderby query parameters."""
+
+    def test_filter_expressions(self):
+        """Test parsing and evaluating filter expressions."""
+        item = {"caption": "Upgrade to 5.4", "status": 1, "tasks": {"count": 12}}
+
+        assert matches(item, parse_filter("status eq 1"))
+        assert matches(item, parse_filter('caption lk "upgrade%5._"'))
+        assert matches(item, parse_filter("tasks.count ge 12 and not status eq 2"))
+        assert matches(item, parse_filter("(status eq 2 or status lt 2) and x ne 1"))
+        assert not matches(item, parse_filter('status gt "a" or missing eq null'))
+
+        for invalid in ["status", "status is 1", "(status eq 1", "status eq 1 2"]:
+            with pytest.raises(HTTPException) as excinfo:
+                parse_filter(invalid)
+            assert excinfo.value.status_code == 400
+
+    def test_query_collection(self, store):
+        """Test filtering and ordering a store, with and without its indexes."""
+        assert list(query_collection(store, make_request(""))) == list(store.values())
+
+        def ids(query):
+            return [item["id"] for item in query_collection(store, make_request(query))]
+
+        assert ids("filter=status eq 2") == ["Upgrade_0", "Upgrade_3"]
+        assert ids("filter=status eq 2 or status eq 1") == [
+            "Upgrade_0",
+            "Upgrade_1",
+            "Upgrade_3",
+        ]
+        assert ids("orderby=creationTime") == [
+            "Upgrade_3",
+            "Upgrade_2",
+            "Upgrade_1",
+            "Upgrade_0",
+        ]
+        assert ids("filter=status eq 2&orderby=creationTime desc") == [
+            "Upgrade_0",
+            "Upgrade_3",
+        ]
+        assert ids('filter=caption lk "%5.2"') == ["Upgrade_2"]
+        assert ids("orderby=status desc,caption desc") == [
+            "Upgrade_2",
+            "Upgrade_3",
+            "Upgrade_0",
+            "Upgrade_1",
+        ]
+
+        with pytest.raises(HTTPException):
+            query_collection(store, make_request("orderby=status up"))
+
+    def test_unfiltered_query_loads_records_as_used(self):
+        """Test that the records of an unfiltered query are loaded when accessed."""
+        loaded = []
+
+        class Loader:
+            def load(self, key):
+                loaded.append(key)
+                return {"id": key, "creationTime": key}
+
+        store = IndexedStore(ordered=("creationTime",))
+        store.loader = Loader()
+        store.add_unloaded((f"s{i}", {"creationTime": f"s{i}"}) for i in range(100))
+
+        items = query_collection(store, make_request(""))
+        assert len(items) == 100
+        assert [item["id"] for item in items[10:12]] == ["s10", "s11"]
+        assert loaded == ["s10", "s11"]
+
+        items = query_collection(store, make_request("orderby=creationTime desc"))
+        assert items[0]["id"] == "s99"
+        assert loaded == ["s10", "s11", "s99"]
@@ -0,0 +1,137 @@
+"""
+Unit tests for the indexed store.
+"""
+
+import pytest
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+
+
+@pytest.fixture
+def store():
+    """Create a store indexed like the upgrade sessions."""
+    store = IndexedStore(indexes=("status",), ordered=("creationTime",))
+    store["b"] = {"status": 1, "creationTime": "2025-01-02T00:00:00"}
+    store["a"] = {"status": 2, "creationTime": "2025-01-01T00:00:00"}
+    store["c"] = {"status": 1}
+    return store
+
+
+@pytest.mark.unit
+class TestIndexedStore:
+    """Tests for the IndexedStore class."""
+
+    def test_record_writes_update_indexes(self, store):
+        """Test that every way of changing a record keeps the indexes current."""
+        assert store.keys_where("status", 1) == {"b", "c"}
+        assert store.keys_where_not("status", [1, 3]) == {"a"}
+
+        store["b"]["status"] = 2
+        store["c"].update(status=3)
+        assert store.keys_where("status", 1) == set()
+        assert store.keys_where("status", 2) == {"a", "b"}
+
+        store["c"].pop("status")
+        store["a"].setdefault("status", 5)
+        del store["b"]
+        assert store.keys_where("status", 2) == {"a"}
+        assert store.keys_where("status", 3) == set()
+
+        # Records without the field, or with an unhashable value, have none of the
+        # excluded values
+        store["d"] = {"status": [1]}
+        store.add_unloaded([("e", {})])
+        assert store.keys_where_not("status", [2]) == {"c", "d", "e"}
+        store["c"]["status"] = 2
+        store["d"]["status"] = 2
+        assert store.keys_where_not("status", [2]) == {"e"}
+
+        store.clear()
+        assert store.keys_where("status", 2) == set()
+        assert list(store.keys_ordered_by("creationTime")) == []
+
+    def test_ordered_index(self, store):
+        """Test ordering keys by a field, with records lacking it last."""
+        assert list(store.keys_ordered_by("creationTime")) == ["a", "b", "c"]
+        assert list(store.keys_ordered_by("creationTime", descending=True)) == [
+            "b",
+            "a",
+            "c",
+        ]
+
+        store["c"]["creationTime"] = "2024-12-31T00:00:00"
+        assert list(store.keys_ordered_by("creationTime")) == ["c", "a", "b"]
+
+    def test_replaced_records_keep_their_position(self, store):
+        """Test that the store iterates like a dict when records are replaced."""
+        removed = store["b"]
+        store["b"] = {"status": 4}
+        removed["status"] = 1
+
+        assert list(store) == ["b", "a", "c"]
+        assert store.in_insertion_order({"c", "b"}) == ["b", "c"]
+        assert store.keys_where("status", 1) == {"c"}
+        assert store.keys_where("status", 4) == {"b"}
+
+    def test_unloaded_records_are_loaded_on_access(self, store):
+        """Test that records added unloaded are indexed and loaded when accessed."""
+
+        class Loader:
+            loaded = []
+
+            def load(self, key):
+                self.loaded.append(key)
+                return {"status": 2, "creationTime": "2024-12-30T00:00:00", "id": key}
+
+        store.loader = Loader()
+        store.add_unloaded(
+            [
+                ("d", {"status": 1, "creationTime": "2024-12-30T00:00:00"}),
+                ("e", {"status": 2}),
+            ]
+        )
+
+        assert list(store) == ["b", "a", "c", "d", "e"]
+        assert store.keys_where("status", 1) == {"b", "c", "d"}
+        assert list(store.keys_ordered_by("creationTime"))[0] == "d"
+        assert not store.is_loaded("d")
+        assert Loader.loaded == []
+
+        # Loading reindexes the fields whose values have changed since the index
+        assert store["d"]["id"] == "d"
+        assert store.is_loaded("d")
+        assert store.keys_where("status", 1) == {"b", "c"}
+        assert Loader.loaded == ["d"]
+
+        assert [record.get("id") for record in store.values()] == [
+            None,
+            None,
+            None,
+            "d",
+            "e",
+        ]
+        assert Loader.loaded == ["d", "e"]
+        assert list(store.keys_ordered_by("creationTime"))[:2] == ["d", "e"]
+
+    def test_copy_of_unloaded_records_can_be_restored(self, store):
+        """Test that a store holding unloaded records round-trips through copy()."""
+
+        class Loader:
+            def load(self, key):
+                return {"status": 4, "id": key}
+
+        store.loader = Loader()
+        store.add_unloaded([("d", {"status": 4})])
+        assert "'d': <unloaded>" in repr(store)
+        assert not store.is_loaded("d")
+
+        saved = store.copy()
+        assert saved["d"] == {"status": 4, "id": "d"}
+        store.clear()
+        store.update(saved)
+        assert list(store) == ["b", "a", "c", "d"]
+        assert store.keys_where("status", 4) == {"d"}
+
+        other = IndexedStore(indexes=("status",))
+        other.update(store)
+        assert other["d"]["id"] == "d"
@@ -0,0 +1,78 @@
+"""
+Unit tests for the upgrade session records.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import TaskRecord, UpgradeSessionRecord
+from dell_unisphere_package.schemas.base import (
+    TaskStatusEnum,
+    TaskTypeEnum,
+    UpgradeStatusEnum,
+)
+from dell_unisphere_package.schemas.upgrade import UpgradeTask
+from dell_unisphere_package.utils.state_codec import encode_state
+
+
+@pytest.fixture
+def store():
+    """Create a store holding upgrade session records."""
+    return IndexedStore(indexes=("status",), record_type=UpgradeSessionRecord)
+
+
+@pytest.mark.unit
+class TestRecords:
+    """Tests for TaskRecord and UpgradeSessionRecord."""
+
+    def test_tasks_are_converted_on_write(self, store):
+        """Test that tasks given as models or dictionaries are stored as records."""
+        tasks = [
+            UpgradeTask(
+                status=TaskStatusEnum.COMPLETED,
+                type=TaskTypeEnum.PREPARE,
+                caption="Preparing system",
+                creationTime=datetime(2025, 1, 1, 12, 0, 0),
+            ),
+            {"status": 1, "type": 3, "caption": "Rebooting", "creationTime": "now"},
+        ]
+        store["s1"] = {"id": "s1", "status": 1, "tasks": tasks}
+        session = store["s1"]
+
+        assert session["status"] is UpgradeStatusEnum.IN_PROGRESS
+        assert store.keys_where("status", UpgradeStatusEnum.IN_PROGRESS) == {"s1"}
+        # The list is converted in place, so existing references see the records
+        assert session["tasks"] is tasks
+        assert all(isinstance(task, TaskRecord) for task in tasks)
+        assert tasks[0].creationTime == "2025-01-01T12:00:00"
+        assert tasks[1].status is TaskStatusEnum.IN_PROGRESS
+        assert tasks[1].type is TaskTypeEnum.REBOOT
+
+        session["tasks"] = [{"status": 0, "caption": "Later"}]
+        assert isinstance(session["tasks"][0], TaskRecord)
+
+    def test_task_record_mapping_access(self):
+        """Test that task records can be used like the dictionaries they replace."""
+        task = TaskRecord(status=TaskStatusEnum.PENDING, caption="Final tasks")
+        task["status"] = TaskStatusEnum.COMPLETED
+
+        assert task.status is TaskStatusEnum.COMPLETED
+        assert task.get("caption") == "Final tasks"
+        assert task.get("unknown") is None
+        assert "estRemainTime" in task
+        assert not hasattr(task, "__dict__")
+        with pytest.raises(KeyError):
+            task["unknown"] = 1
+
+        assert json.loads(encode_state([task])) == [
+            {
+                "status": 2,
+                "type": None,
+                "caption": "Final tasks",
+                "creationTime": None,
+                "estRemainTime": "00:03:30.000",
+            }
+        ]
@@ -0,0 +1,111 @@
+"""
+Unit tests for the login session store.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dell_unisphere_package.models.session_store import SessionStore
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.unit
+class TestSessionStore:
+    """Tests for the SessionStore class."""
+
+    def test_sessions_expire_when_idle(self):
+        """Test that sessions expire once unused for longer than the idle timeout."""
+        clock = FakeClock()
+        store = SessionStore(idle_timeout=3600, clock=clock)
+        store["active"] = {"username": "admin"}
+        store["idle"] = {"username": "user"}
+
+        clock.now = 3000
+        assert store["active"]["username"] == "admin"
+
+        clock.now = 4000
+        assert "idle" not in store
+        assert "active" in store
+        assert len(store) == 1
+        assert store.stats()["expired"] == 1
+
+    def test_least_recently_used_sessions_are_evicted(self):
+        """Test that the store never holds more than max_sessions sessions."""
+        clock = FakeClock()
+        store = SessionStore(max_sessions=2, clock=clock)
+        store["first"] = {}
+        store["second"] = {}
+        assert "first" in store  # Makes "second" the least recently used
+
+        store["third"] = {}
+
+        assert set(store) == {"first", "third"}
+        assert store.stats()["evicted"] == 1
+
+    def test_client_sessions_are_reused(self):
+        """Test that a session bound to a client is found until it is removed."""
+        store = SessionStore()
+        session_id = store.create({"username": "admin"}, client=("admin", "1.2.3.4"))
+
+        assert store.find_client_session(("admin", "1.2.3.4")) == session_id
+        assert store.find_client_session(("admin", "5.6.7.8")) is None
+
+        del store[session_id]
+        assert store.find_client_session(("admin", "1.2.3.4")) is None
+        assert store.copy() == {}
+
+    def test_concurrent_use_from_threads(self):
+        """Test that threads creating, using and removing sessions never collide."""
+        store = SessionStore(max_sessions=8)
+
+        def use(worker):
+            for i in range(500):
+                client = (f"user{worker}", i % 4)
+                session_id = store.find_client_session(client)
+                if session_id is None:
+                    session_id = store.create({"username": client[0]}, client=client)
+                store.get(session_id)
+                if i % 3 == 0:
+                    store.forget(session_id)
+                list(store)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(use, worker) for worker in range(8)]:
+                future.result()
+
+        assert len(store) <= 8
+
+    def test_backend_is_touched_once_per_interval(self):
+        """Test that concurrent uses of a session touch it in the backend once."""
+
+        class Backend:
+            touches = []
+
+            def put_login_session(self, session_id, data, client, last_access):
+                pass
+
+            def touch_login_session(self, session_id, last_access):
+                self.touches.append(session_id)
+
+        store = SessionStore()
+        store.backend = Backend()
+        session_id = store.create({"username": "admin"})
+        store._entries[session_id].touched = 0.0
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [
+                executor.submit(store.__getitem__, session_id) for _ in range(200)
+            ]:
+                future.result()
+
+        assert Backend.touches == [session_id]
@@ -0,0 +1,96 @@
+"""Unit tests for the simulation clock module."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from dell_unisphere_package.utils.clock import (
+    RealClock,
+    VirtualClock,
+    get_clock,
+    set_clock,
+)
+
+
+@pytest.fixture
+def restore_clock():
+    """Restore the real clock after each test."""
+    yield
+    set_clock(RealClock())
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_virtual_clock_only_moves_when_advanced():
+    """Test that virtual sleepers wake only once the clock passes their deadline."""
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    clock = VirtualClock(start=start)
+    woken = []
+
+    async def sleeper(name, seconds):
+        await clock.sleep(seconds)
+        woken.append((name, clock.time()))
+
+    tasks = [
+        asyncio.create_task(sleeper("short", 10)),
+        asyncio.create_task(sleeper("long", 900)),
+    ]
+    await asyncio.sleep(0)
+    assert clock.pending == 2
+
+    await clock.advance(60)
+    assert woken == [("short", 10)]
+    assert clock.time() == 60
+    assert clock.now() == start + timedelta(seconds=60)
+
+    await clock.advance(15 * 60)
+    assert woken == [("short", 10), ("long", 900)]
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_virtual_clock_advances_through_chained_sleeps():
+    """Test that sleeps registered by woken coroutines fire within the same advance."""
+    clock = VirtualClock()
+    ticks = []
+
+    async def ticker():
+        for _ in range(100):
+            await clock.sleep(1)
+            ticks.append(clock.time())
+
+    task = asyncio.create_task(ticker())
+    await clock.advance(100)
+
+    assert ticks == [float(i) for i in range(1, 101)]
+    await task
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_set_clock_releases_virtual_sleepers(restore_clock):
+    """Test that switching away from a virtual clock wakes its sleepers."""
+    clock = set_clock(VirtualClock())
+    assert get_clock() is clock
+
+    task = asyncio.create_task(clock.sleep(3600))
+    await asyncio.sleep(0)
+
+    set_clock(RealClock())
+    await asyncio.wait_for(task, timeout=1.0)
+    assert get_clock().mode == "real"
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_set_clock_from_another_thread(restore_clock):
+    """Test that a sync route's thread can switch away from a virtual clock."""
+    clock = set_clock(VirtualClock())
+    task = asyncio.create_task(clock.sleep(3600))
+    await asyncio.sleep(0)
+
+    await asyncio.to_thread(set_clock, RealClock())
+    await asyncio.wait_for(task, timeout=1.0)
+    assert clock.pending == 0
@@ -0,0 +1,51 @@
+"""Unit tests for the fast JSON response class."""
+
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from dell_unisphere_package.schemas.base import TaskStatusEnum, UpgradeStatusEnum
+from dell_unisphere_package.schemas.upgrade import UpgradeTask
+from dell_unisphere_package.utils import json_response
+from dell_unisphere_package.utils.json_response import UnisphereJSONResponse
+
+CONTENT = {
+    "id": "Upgrade_5.4.0",
+    "status": UpgradeStatusEnum.IN_PROGRESS,
+    "startTime": datetime(2025, 1, 1, 12, 0, 0, 123456),
+    "tasks": [
+        UpgradeTask(
+            status=TaskStatusEnum.PENDING,
+            type=0,
+            caption="Preparing system",
+            creationTime=datetime(2025, 1, 1, 12, 0, 0),
+        )
+    ],
+    "hotFixes": {"HF1"},
+}
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(json_response.orjson is None, reason="orjson is not installed")
+def test_encodes_like_default_response():
+    """Test that the fast encoding matches FastAPI's default encoding."""
+    response = UnisphereJSONResponse(CONTENT)
+
+    assert response.body == JSONResponse(jsonable_encoder(CONTENT)).body
+    assert response.headers["content-type"] == "application/json"
+
+
+@pytest.mark.unit
+def test_falls_back_without_orjson(monkeypatch):
+    """Test that content is encoded with the standard encoder without orjson."""
+    monkeypatch.setattr(json_response, "orjson", None)
+
+    body = json.loads(UnisphereJSONResponse(CONTENT).body)
+
+    assert body["status"] == 1
+    assert body["startTime"] == "2025-01-01T12:00:00.123456"
+    assert body["tasks"][0]["creationTime"] == "2025-01-01T12:00:00"
+    assert body["hotFixes"] == ["HF1"]
@@ -0,0 +1,123 @@
+"""Unit tests for the lazy progress module."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from dell_unisphere_package.models.storage import (
+    candidate_software_versions,
+    system_config,
+    upgrade_sessions,
+)
+from dell_unisphere_package.schemas.base import TaskStatusEnum, UpgradeStatusEnum
+from dell_unisphere_package.utils.clock import RealClock, VirtualClock, set_clock
+from dell_unisphere_package.utils.lazy_progress import (
+    LAZY_PROGRESS_KEY,
+    pause_lazy_progress,
+    refresh_session,
+    resume_lazy_progress,
+)
+from dell_unisphere_package.utils.upgrade_simulator import (
+    create_realistic_upgrade_tasks,
+    scheduler,
+    start_upgrade_simulation,
+)
+
+SESSION_ID = "lazy_session"
+CANDIDATE_ID = "lazy_candidate"
+
+# Duration of the realistic upgrade tasks at real-time speed: 1h32m25s
+TOTAL_SECONDS = 5545
+
+
+@pytest.fixture
+def clock():
+    """Create a lazily progressed session driven by a virtual clock."""
+    clock = set_clock(VirtualClock(start=datetime(2025, 1, 1, 12, 0, 0)))
+    system_config["progress_mode"] = "lazy"
+    candidate_software_versions[CANDIDATE_ID] = {"id": CANDIDATE_ID}
+    upgrade_sessions[SESSION_ID] = {
+        "id": SESSION_ID,
+        "status": UpgradeStatusEnum.IN_PROGRESS,
+        "percentComplete": 0,
+        "startTime": clock.now().isoformat(),
+        "tasks": create_realistic_upgrade_tasks(),
+        "messages": [],
+        "candidate": CANDIDATE_ID,
+    }
+    start_upgrade_simulation(SESSION_ID, speed_factor=1)
+    yield clock
+    system_config["progress_mode"] = "background"
+    set_clock(RealClock())
+    upgrade_sessions.pop(SESSION_ID, None)
+    candidate_software_versions.pop(CANDIDATE_ID, None)
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_progress_is_computed_on_read(clock):
+    """Test that a lazy session does no background work and is derived on read."""
+    session = upgrade_sessions[SESSION_ID]
+    assert not scheduler.is_active(SESSION_ID)
+    assert LAZY_PROGRESS_KEY in session
+
+    await clock.advance(900)
+    assert session["percentComplete"] == 0
+
+    refresh_session(session)
+    statuses = [task["status"] for task in session["tasks"]]
+    assert statuses[:3] == [
+        TaskStatusEnum.COMPLETED,
+        TaskStatusEnum.COMPLETED,
+        TaskStatusEnum.IN_PROGRESS,
+    ]
+    assert set(statuses[3:]) == {TaskStatusEnum.PENDING}
+    assert session["percentComplete"] == 21
+    assert [m["message"] for m in session["messages"]] == [
+        "Starting task: Preparing system",
+        "Completed task: Preparing system",
+        "Starting task: Performing health checks",
+        "Completed task: Performing health checks",
+        "Starting task: Preparing system software",
+    ]
+
+    await clock.advance(2 * 3600)
+    refresh_session(session)
+
+    assert session["status"] == UpgradeStatusEnum.COMPLETED
+    assert session["percentComplete"] == 100
+    assert session["elapsedTime"] == "PT1H32M25S"
+    assert LAZY_PROGRESS_KEY not in session
+    assert CANDIDATE_ID not in candidate_software_versions
+    assert len(session["messages"]) == 24
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_pause_freezes_progress(clock):
+    """Test that time spent paused does not count towards a lazy session."""
+    session = upgrade_sessions[SESSION_ID]
+    start = clock.now()
+
+    await clock.advance(100)
+    refresh_session(session)
+    percent = session["percentComplete"]
+
+    session["status"] = UpgradeStatusEnum.PAUSED
+    pause_lazy_progress(session)
+    await clock.advance(1000)
+    refresh_session(session)
+
+    assert session["percentComplete"] == percent
+    assert session["tasks"][0]["status"] == TaskStatusEnum.PAUSED
+
+    session["status"] = UpgradeStatusEnum.IN_PROGRESS
+    resume_lazy_progress(session)
+    await clock.advance(TOTAL_SECONDS - 100)
+    refresh_session(session)
+
+    assert session["status"] == UpgradeStatusEnum.COMPLETED
+    assert session["elapsedTime"] == "PT1H49M5S"
+    assert session["messages"][1]["timestamp"] == (
+        (start + timedelta(seconds=1210)).isoformat()
+    )
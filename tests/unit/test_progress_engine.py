@@ -0,0 +1,82 @@
+"""Unit tests for the progress engine module."""
+
+import asyncio
+
+import pytest
+
+from dell_unisphere_package.models.storage import upgrade_sessions
+from dell_unisphere_package.schemas.base import UpgradeStatusEnum
+from dell_unisphere_package.utils.clock import RealClock, VirtualClock, set_clock
+from dell_unisphere_package.utils.progress_engine import ProgressEngine
+
+
+@pytest.fixture
+def virtual_clock():
+    """Drive the engine with a virtual clock and clean up afterwards."""
+    clock = set_clock(VirtualClock())
+    yield clock
+    set_clock(RealClock())
+    for i in range(100):
+        upgrade_sessions.pop(f"engine_session_{i}", None)
+
+
+def _add_session(session_id):
+    upgrade_sessions[session_id] = {
+        "id": session_id,
+        "status": UpgradeStatusEnum.IN_PROGRESS,
+        "percentComplete": 0,
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_engine_drives_many_tasks_from_one_coroutine(virtual_clock):
+    """Test that all tasks progress in batches and complete on their deadline."""
+    engine = ProgressEngine()
+    session_ids = [f"engine_session_{i}" for i in range(100)]
+    for session_id in session_ids:
+        _add_session(session_id)
+
+    tasks = [
+        asyncio.create_task(engine.run_task(session_id, 0, 2, 10))
+        for session_id in session_ids
+    ]
+    await virtual_clock.advance(0)
+
+    assert engine.stats()["running_tasks"] == 100
+    # The engine sleeps on a single timer no matter how many tasks are running
+    assert virtual_clock.pending == 1
+
+    await virtual_clock.advance(5)
+    assert all(upgrade_sessions[s]["percentComplete"] == 25 for s in session_ids)
+
+    await virtual_clock.advance(5)
+    assert await asyncio.gather(*tasks) == [0.0] * 100
+    assert all(upgrade_sessions[s]["percentComplete"] == 50 for s in session_ids)
+    assert engine.stats()["running_tasks"] == 0
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_engine_hands_back_paused_tasks(virtual_clock):
+    """Test that a paused task is returned with the time it still needs."""
+    engine = ProgressEngine()
+    session_id = "engine_session_0"
+    _add_session(session_id)
+
+    task = asyncio.create_task(engine.run_task(session_id, 0, 1, 10))
+    await virtual_clock.advance(4)
+    upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.PAUSED
+    await virtual_clock.advance(1)
+
+    remaining = await task
+    assert remaining == pytest.approx(6, abs=engine.tick_interval)
+
+    upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.IN_PROGRESS
+    task = asyncio.create_task(engine.run_task(session_id, 0, 1, 10, remaining))
+    await virtual_clock.advance(1)
+    assert upgrade_sessions[session_id]["percentComplete"] in range(45, 55)
+
+    await virtual_clock.advance(remaining)
+    assert await task == 0.0
+    assert upgrade_sessions[session_id]["percentComplete"] == 100
@@ -0,0 +1,197 @@
+"""Unit tests for sharing the state between server processes."""
+
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from dell_unisphere_package.middleware import shared_state as shared_state_middleware
+from dell_unisphere_package.middleware.shared_state import SharedStateMiddleware
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import UpgradeSessionRecord
+from dell_unisphere_package.models.session_store import SessionStore
+from dell_unisphere_package.schemas.base import (
+    TaskStatusEnum,
+    UpgradeStatusEnum,
+    UpgradeTypeEnum,
+)
+from dell_unisphere_package.utils import state_persistence
+from dell_unisphere_package.utils.shared_state import LEASE_DURATION, SharedState
+from dell_unisphere_package.utils.state_persistence import (
+    enable_state_database,
+    load_upgrade_sessions_into,
+    save_upgrade_sessions,
+)
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Keep the state files in a temporary directory."""
+    monkeypatch.setattr(state_persistence, "STATE_DIR", tmp_path)
+    for name, file_name in [
+        ("UPGRADE_SESSIONS_FILE", "upgrade_sessions.json"),
+        ("UPGRADE_SESSIONS_INDEX_FILE", "upgrade_sessions.index.json"),
+        ("BACKUP_FILE", "upgrade_sessions.backup.json"),
+        ("STATE_LOG_FILE", "upgrade_sessions.log"),
+        ("CANDIDATE_SOFTWARE_FILE", "candidate_software.json"),
+        ("CANDIDATE_BACKUP_FILE", "candidate_software.backup.json"),
+        ("SESSION_FILES_DIR", "upgrade_sessions"),
+        ("CANDIDATE_FILES_DIR", "candidate_software"),
+        ("STATE_DATABASE_FILE", "state.db"),
+    ]:
+        monkeypatch.setattr(state_persistence, name, tmp_path / file_name)
+    return tmp_path
+
+
+def make_store():
+    return IndexedStore(
+        indexes=("status",), ordered=("creationTime",), record_type=UpgradeSessionRecord
+    )
+
+
+def make_session(i):
+    return {
+        "id": f"s{i}",
+        "status": UpgradeStatusEnum.COMPLETED if i % 2 else UpgradeStatusEnum.PAUSED,
+        "creationTime": f"2025-01-{i + 1:02}T00:00:00",
+        "messages": [],
+        "tasks": [{"status": TaskStatusEnum.PENDING, "caption": "Prepare"}],
+    }
+
+
+def start_process(store, candidates):
+    """Share the state of a store as a server process would."""
+    state_database = enable_state_database(store, candidates)
+    shared_state = SharedState(state_database, SessionStore(), {"system_config": {}})
+    shared_state.attach()
+    return shared_state
+
+
+@pytest.fixture
+def processes(state_dir):
+    """Start two processes sharing the state saved by the first."""
+    first_store = make_store()
+    for i in range(4):
+        first_store[f"s{i}"] = make_session(i)
+    save_upgrade_sessions(first_store)
+    first = start_process(first_store, {})
+
+    second_store = make_store()
+    load_upgrade_sessions_into(second_store)
+    second = start_process(second_store, {})
+    yield first, second
+    for shared_state in (first, second):
+        shared_state.detach()
+        shared_state.database.close()
+
+
+@pytest.mark.unit
+def test_sessions_changed_elsewhere_are_read(processes):
+    """Test that session changes reach the other process without being saved again."""
+    first, second = processes
+    sessions = second.upgrade_sessions
+    session = sessions["s1"]
+    task = session["tasks"][0]
+    writes = second.state_database.stats()["writes"]
+
+    first.upgrade_sessions["s4"] = make_session(4)
+    first.upgrade_sessions["s1"]["status"] = UpgradeStatusEnum.FAILED
+    first_task = first.upgrade_sessions["s1"]["tasks"][0]
+    first_task.status = TaskStatusEnum.IN_PROGRESS
+    first.upgrade_sessions["s1"].task_changed(first_task)
+    del first.upgrade_sessions["s2"]
+    assert second.refresh() == 3
+    assert second.refresh() == 0
+
+    # Loaded records and their tasks are updated in place
+    assert sessions["s1"] is session and session["tasks"][0] is task
+    assert task.status is TaskStatusEnum.IN_PROGRESS
+    assert sessions.keys_where("status", UpgradeStatusEnum.FAILED) == {"s1"}
+    assert list(sessions) == ["s0", "s1", "s3", "s4"]
+    assert dict(sessions.items()) == dict(first.upgrade_sessions.items())
+    assert second.state_database.stats()["writes"] == writes
+
+    # Changes are not read back by the process that made them
+    sessions["s3"]["percentComplete"] = 50
+    assert first.refresh() == 1
+    assert second.refresh() == 0
+    assert first.upgrade_sessions["s3"]["percentComplete"] == 50
+
+
+@pytest.mark.unit
+def test_login_sessions_and_values_are_shared(processes):
+    """Test that login sessions, candidates and shared values reach the other process."""
+    first, second = processes
+    client = ("admin", "127.0.0.1")
+    session_id = first.login_sessions.create({"username": "admin"}, client=client)
+    assert second.login_sessions[session_id] == {"username": "admin"}
+    assert second.login_sessions.find_client_session(client) == session_id
+
+    first.state_database.candidate_software_versions["candidate_1"] = {
+        "id": "candidate_1",
+        "type": UpgradeTypeEnum.SOFTWARE,
+    }
+    first.collections["system_config"]["progress_mode"] = "lazy"
+    first.publish()
+    del first.login_sessions[session_id]
+    second.refresh()
+
+    assert session_id not in second.login_sessions
+    assert second.state_database.candidate_software_versions == {
+        "candidate_1": {"id": "candidate_1", "type": UpgradeTypeEnum.SOFTWARE}
+    }
+    assert second.state_database.save_candidates() == 0
+    assert second.collections["system_config"] == {"progress_mode": "lazy"}
+
+
+@pytest.mark.unit
+def test_simulator_lease_moves_when_it_expires(processes):
+    """Test that one process leads until it stops renewing its lease."""
+    first, second = processes
+    assert first.elect(now=1000)
+    assert not second.elect(now=1001)
+    assert first.elect(now=1002)
+
+    expired = 1002 + LEASE_DURATION + 1
+    assert second.elect(now=expired)
+    assert not first.elect(now=expired)
+    assert (first.is_leader, second.is_leader) == (False, True)
+    assert second.stats()["terms"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_refresh_reads_database_in_thread(processes):
+    """Test that a refresh in a worker thread stores the records it read."""
+    first, second = processes
+    first.upgrade_sessions["s1"]["status"] = UpgradeStatusEnum.FAILED
+    assert await second.refresh_in_thread() == 1
+    assert second.upgrade_sessions["s1"]["status"] is UpgradeStatusEnum.FAILED
+    assert await second.refresh_in_thread() == 0
+
+
+@pytest.mark.unit
+def test_requests_are_served_when_database_is_locked(monkeypatch):
+    """Test that a request is still handled when the shared state cannot be read."""
+
+    class LockedState:
+        published = 0
+
+        async def refresh_in_thread(self):
+            raise sqlite3.OperationalError("database is locked")
+
+        def publish(self):
+            self.published += 1
+
+    locked_state = LockedState()
+    monkeypatch.setattr(
+        shared_state_middleware, "get_shared_state", lambda: locked_state
+    )
+    app = FastAPI()
+    app.add_middleware(SharedStateMiddleware)
+    app.get("/ping")(lambda: {"ok": True})
+
+    response = TestClient(app).get("/ping")
+    assert response.status_code == 200
+    assert locked_state.published == 1
@@ -0,0 +1,101 @@
+"""Unit tests for the saved state encoding."""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from dell_unisphere_package.models.records import TaskRecord
+from dell_unisphere_package.schemas.base import (
+    TaskStatusEnum,
+    TaskTypeEnum,
+    UpgradeSessionTypeEnum,
+    UpgradeStatusEnum,
+    UpgradeTypeEnum,
+)
+from dell_unisphere_package.schemas.upgrade import UpgradeMessage
+from dell_unisphere_package.utils.state_codec import (
+    decode_candidates,
+    decode_change,
+    decode_sessions,
+    encode_state,
+)
+
+
+def make_session():
+    return {
+        "id": "s1",
+        "type": UpgradeSessionTypeEnum.UPGRADE,
+        "status": UpgradeStatusEnum.PAUSED,
+        "startTime": datetime(2025, 1, 1, 12, 0, 0),
+        "messages": [UpgradeMessage(timestamp="2025-01-01T12:00:00", message="Go")],
+        "tasks": [
+            TaskRecord(
+                status=TaskStatusEnum.COMPLETED,
+                type=TaskTypeEnum.REBOOT,
+                caption="Rebooting",
+            )
+        ],
+    }
+
+
+@pytest.mark.unit
+def test_sessions_round_trip():
+    """Test that saved sessions are loaded back with their enums and task records."""
+    text = encode_state({"s1": make_session()})
+    saved = json.loads(text)
+    assert saved["s1"]["status"] == 6
+    assert saved["s1"]["startTime"] == "2025-01-01T12:00:00"
+    assert saved["s1"]["tasks"][0]["type"] == 3
+    assert saved["s1"]["messages"][0]["message"] == "Go"
+
+    session = decode_sessions(saved)["s1"]
+    assert session["status"] is UpgradeStatusEnum.PAUSED
+    assert session["type"] is UpgradeSessionTypeEnum.UPGRADE
+    assert session["tasks"] == make_session()["tasks"]
+    assert session["tasks"][0].status is TaskStatusEnum.COMPLETED
+    assert encode_state(decode_sessions(json.loads(text))) == text
+
+
+@pytest.mark.unit
+def test_legacy_enums_and_candidates():
+    """Test that enums saved as their attributes and candidate types are restored."""
+    sessions = decode_sessions(
+        {
+            "s1": {
+                "status": {"_value_": 2, "_name_": "COMPLETED"},
+                "tasks": [{"status": {"_value_": 2}, "caption": "Prepare"}],
+            }
+        }
+    )
+    assert sessions["s1"]["status"] is UpgradeStatusEnum.COMPLETED
+    assert sessions["s1"]["tasks"][0].status is TaskStatusEnum.COMPLETED
+
+    candidates = decode_candidates(
+        json.loads(encode_state({"c1": {"type": "SOFTWARE"}}))
+    )
+    assert candidates["c1"]["type"] is UpgradeTypeEnum.SOFTWARE
+
+
+@pytest.mark.unit
+def test_state_log_changes_are_decoded():
+    """Test that the values of logged changes are restored like saved sessions."""
+    change = decode_change(
+        json.loads(
+            encode_state({"op": "set", "id": "s1", "field": "status", "value": 3})
+        )
+    )
+    assert change["value"] is UpgradeStatusEnum.FAILED
+
+    change = decode_change(
+        {"op": "task", "id": "s1", "index": 0, "value": {"status": 1, "caption": "A"}}
+    )
+    assert change["value"] == TaskRecord(status=TaskStatusEnum.IN_PROGRESS, caption="A")
+
+
+@pytest.mark.unit
+def test_unsupported_values_are_rejected():
+    """Test that values without a JSON encoding fail instead of being saved as text."""
+    assert json.loads(encode_state({"ids": {"s1"}})) == {"ids": ["s1"]}
+    with pytest.raises(TypeError, match="Cannot encode object"):
+        encode_state({"id": "s1", "lock": object()})
@@ -0,0 +1,160 @@
+"""Unit tests for saving the state in a SQLite database."""
+
+import pytest
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import UpgradeSessionRecord
+from dell_unisphere_package.schemas.base import (
+    TaskStatusEnum,
+    UpgradeStatusEnum,
+    UpgradeTypeEnum,
+)
+from dell_unisphere_package.utils import state_persistence
+from dell_unisphere_package.utils.record_database import RecordDatabase
+from dell_unisphere_package.utils.state_persistence import (
+    StateDatabase,
+    disable_state_database,
+    enable_state_database,
+    load_candidate_software,
+    load_upgrade_sessions,
+    load_upgrade_sessions_into,
+    save_upgrade_sessions,
+)
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Keep the state files in a temporary directory."""
+    monkeypatch.setattr(state_persistence, "STATE_DIR", tmp_path)
+    for name, file_name in [
+        ("UPGRADE_SESSIONS_FILE", "upgrade_sessions.json"),
+        ("UPGRADE_SESSIONS_INDEX_FILE", "upgrade_sessions.index.json"),
+        ("BACKUP_FILE", "upgrade_sessions.backup.json"),
+        ("STATE_LOG_FILE", "upgrade_sessions.log"),
+        ("CANDIDATE_SOFTWARE_FILE", "candidate_software.json"),
+        ("CANDIDATE_BACKUP_FILE", "candidate_software.backup.json"),
+        ("SESSION_FILES_DIR", "upgrade_sessions"),
+        ("CANDIDATE_FILES_DIR", "candidate_software"),
+        ("STATE_DATABASE_FILE", "state.db"),
+    ]:
+        monkeypatch.setattr(state_persistence, name, tmp_path / file_name)
+    return tmp_path
+
+
+def make_store():
+    return IndexedStore(
+        indexes=("status",), ordered=("creationTime",), record_type=UpgradeSessionRecord
+    )
+
+
+def make_session(i):
+    return {
+        "id": f"s{i}",
+        "status": UpgradeStatusEnum.COMPLETED if i % 2 else UpgradeStatusEnum.PAUSED,
+        "creationTime": f"2025-01-{i + 1:02}T00:00:00",
+        "messages": [],
+        "tasks": [{"status": TaskStatusEnum.COMPLETED, "caption": "Prepare"}],
+    }
+
+
+@pytest.fixture
+def store(state_dir):
+    """Create an upgrade session store saved in the state database."""
+    store = make_store()
+    for i in range(5):
+        store[f"s{i}"] = make_session(i)
+    save_upgrade_sessions(store)
+    candidates = {
+        "candidate_1": {"id": "candidate_1", "type": UpgradeTypeEnum.SOFTWARE}
+    }
+    enable_state_database(store, candidates)
+    yield store
+    if store.journal is not None:
+        store.journal.database.close()
+
+
+@pytest.mark.unit
+def test_changes_are_committed(store, state_dir):
+    """Test that each change is committed and visible to another connection."""
+    # The state database implements every storage method of the journal
+    assert isinstance(store.journal, StateDatabase)
+    assert not StateDatabase.__abstractmethods__
+    assert not (state_dir / "upgrade_sessions.json").exists()
+    store["s1"]["status"] = UpgradeStatusEnum.FAILED
+    store["s2"].add_message({"message": "Resumed"})
+    del store["s4"]
+    store["s5"] = make_session(5)
+    stats = store.journal.stats()
+    assert (stats["writes"], stats["deletes"]) == (9, 1)
+
+    # Another connection, as after a crash or from another process
+    other = RecordDatabase(state_dir / "state.db", fields=("creationTime", "status"))
+    try:
+        assert other.session_ids_where("status", UpgradeStatusEnum.FAILED) == ["s1"]
+        assert [key for key, _ in other.session_index()] == [
+            "s0",
+            "s1",
+            "s2",
+            "s3",
+            "s5",
+        ]
+        assert '"Resumed"' in other.read("s2")
+        journal_mode = other._connection.execute("PRAGMA journal_mode").fetchone()
+        assert journal_mode == ("wal",)
+        plan = other._connection.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM upgrade_sessions WHERE "status" = 4'
+        ).fetchall()
+        assert "USING INDEX" in str(plan) or "USING COVERING INDEX" in str(plan)
+    finally:
+        other.close()
+
+
+@pytest.mark.unit
+def test_sessions_are_read_when_accessed(store):
+    """Test that loading reads the indexed columns and each session on first access."""
+    store["s1"]["percentComplete"] = 50
+
+    reloaded = make_store()
+    assert load_upgrade_sessions_into(reloaded) == 5
+    try:
+        assert list(reloaded) == list(store)
+        assert not any(reloaded.is_loaded(key) for key in reloaded)
+        assert reloaded.keys_where("status", UpgradeStatusEnum.COMPLETED) == {
+            "s1",
+            "s3",
+        }
+        assert (
+            list(reloaded.keys_ordered_by("creationTime", descending=True))[0] == "s4"
+        )
+        assert reloaded["s0"]["tasks"][0].status is TaskStatusEnum.COMPLETED
+        assert dict(reloaded.items()) == dict(store.items())
+        assert load_candidate_software() == {
+            "candidate_1": {"id": "candidate_1", "type": UpgradeTypeEnum.SOFTWARE}
+        }
+    finally:
+        reloaded.loader.close()
+
+
+@pytest.mark.unit
+def test_candidates_are_saved_when_changed(store):
+    """Test that only the candidate software versions that changed are written."""
+    state_database = store.journal
+    candidates = state_database.candidate_software_versions
+    assert state_database.save_candidates() == 0
+
+    candidates["candidate_2"] = {"id": "candidate_2"}
+    assert state_database.save_candidates() > 0
+    del candidates["candidate_1"]
+    assert state_database.save_candidates() == 0
+    assert list(load_candidate_software()) == ["candidate_2"]
+
+
+@pytest.mark.unit
+def test_switching_back_saves_a_snapshot(store, state_dir):
+    """Test that leaving the mode saves the state in the snapshot files."""
+    store["s0"]["status"] = UpgradeStatusEnum.IN_PROGRESS
+    disable_state_database(store)
+
+    assert not (state_dir / "state.db").exists()
+    assert load_upgrade_sessions() == dict(store.items())
+    assert list(load_candidate_software()) == ["candidate_1"]
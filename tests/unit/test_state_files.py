@@ -0,0 +1,160 @@
+"""Unit tests for saving the state one file per record."""
+
+import pytest
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import UpgradeSessionRecord
+from dell_unisphere_package.schemas.base import (
+    TaskStatusEnum,
+    UpgradeStatusEnum,
+    UpgradeTypeEnum,
+)
+from dell_unisphere_package.utils import state_persistence
+from dell_unisphere_package.utils.state_persistence import (
+    disable_state_files,
+    enable_state_files,
+    load_candidate_software,
+    load_upgrade_sessions,
+    load_upgrade_sessions_into,
+)
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Keep the state files in a temporary directory."""
+    monkeypatch.setattr(state_persistence, "STATE_DIR", tmp_path)
+    for name, file_name in [
+        ("UPGRADE_SESSIONS_FILE", "upgrade_sessions.json"),
+        ("UPGRADE_SESSIONS_INDEX_FILE", "upgrade_sessions.index.json"),
+        ("BACKUP_FILE", "upgrade_sessions.backup.json"),
+        ("STATE_LOG_FILE", "upgrade_sessions.log"),
+        ("CANDIDATE_SOFTWARE_FILE", "candidate_software.json"),
+        ("CANDIDATE_BACKUP_FILE", "candidate_software.backup.json"),
+        ("SESSION_FILES_DIR", "upgrade_sessions"),
+        ("CANDIDATE_FILES_DIR", "candidate_software"),
+        ("STATE_DATABASE_FILE", "state.db"),
+    ]:
+        monkeypatch.setattr(state_persistence, name, tmp_path / file_name)
+    return tmp_path
+
+
+def make_store():
+    return IndexedStore(
+        indexes=("status",), ordered=("creationTime",), record_type=UpgradeSessionRecord
+    )
+
+
+def make_session(i):
+    return {
+        "id": f"s{i}",
+        "status": UpgradeStatusEnum.COMPLETED if i % 2 else UpgradeStatusEnum.PAUSED,
+        "creationTime": f"2025-01-{i + 1:02}T00:00:00",
+        "messages": [],
+        "tasks": [{"status": TaskStatusEnum.COMPLETED, "caption": "Prepare"}],
+    }
+
+
+@pytest.fixture
+def store(state_dir):
+    """Create an upgrade session store saved one file per session."""
+    store = make_store()
+    for i in range(5):
+        store[f"s{i}"] = make_session(i)
+    candidates = {
+        "candidate_1": {"id": "candidate_1", "type": UpgradeTypeEnum.SOFTWARE}
+    }
+    enable_state_files(store, candidates)
+    return store
+
+
+@pytest.mark.unit
+def test_only_changed_sessions_are_written(store, state_dir):
+    """Test that a change rewrites the changed session and the index only if needed."""
+    state_files = store.journal
+    assert state_files.stats()["writes"] == 6  # Every session and the candidate
+    assert not (state_dir / "upgrade_sessions.json").exists()
+
+    store["s1"]["percentComplete"] = 50
+    store["s2"].add_message({"message": "Resumed"})
+    assert state_files.stats() == {
+        "pending": 0,
+        "writes": 8,
+        "deletes": 0,
+        "index_writes": 1,
+    }
+
+    store["s3"]["status"] = UpgradeStatusEnum.FAILED
+    del store["s4"]
+    stats = state_files.stats()
+    assert (stats["writes"], stats["deletes"], stats["index_writes"]) == (9, 1, 3)
+    assert sorted(path.name for path in (state_dir / "upgrade_sessions").iterdir()) == [
+        ".index",
+        "s0.json",
+        "s1.json",
+        "s2.json",
+        "s3.json",
+    ]
+
+
+@pytest.mark.unit
+def test_sessions_are_read_when_accessed(store, state_dir):
+    """Test that loading reads the index and each session on first access."""
+    store["s1"]["percentComplete"] = 50
+    store["s5"] = make_session(5)
+
+    reloaded = make_store()
+    assert load_upgrade_sessions_into(reloaded) == 6
+    assert list(reloaded) == list(store)
+    assert not any(reloaded.is_loaded(key) for key in reloaded)
+    assert reloaded.keys_where("status", UpgradeStatusEnum.COMPLETED) == {
+        "s1",
+        "s3",
+        "s5",
+    }
+    assert reloaded["s0"]["tasks"][0].status is TaskStatusEnum.COMPLETED
+    assert dict(reloaded.items()) == dict(store.items())
+    assert load_candidate_software() == {
+        "candidate_1": {"id": "candidate_1", "type": UpgradeTypeEnum.SOFTWARE}
+    }
+
+    # Sessions saved after the index was removed are read on startup
+    (state_dir / "upgrade_sessions" / ".index").unlink()
+    reloaded = make_store()
+    assert load_upgrade_sessions_into(reloaded) == 6
+    assert all(reloaded.is_loaded(key) for key in reloaded)
+    assert dict(reloaded.items()) == dict(store.items())
+
+
+@pytest.mark.unit
+def test_candidates_are_saved_when_changed(store, state_dir):
+    """Test that only the candidate software versions that changed are written."""
+    state_files = store.journal
+    candidates = state_files.candidate_software_versions
+    assert state_files.save_candidates() == 0
+
+    candidates["candidate_2"] = {"id": "candidate_2"}
+    assert state_files.save_candidates() > 0
+    del candidates["candidate_1"]
+    assert state_files.save_candidates() == 0
+    assert [path.name for path in (state_dir / "candidate_software").iterdir()] == [
+        "candidate_2.json"
+    ]
+
+
+@pytest.mark.unit
+def test_switching_back_saves_a_snapshot(store, state_dir):
+    """Test that leaving the mode saves the state in the snapshot files."""
+    store["s0"]["status"] = UpgradeStatusEnum.IN_PROGRESS
+    disable_state_files(store)
+
+    assert not (state_dir / "upgrade_sessions").exists()
+    assert not (state_dir / "candidate_software").exists()
+    assert load_upgrade_sessions() == dict(store.items())
+    assert list(load_candidate_software()) == ["candidate_1"]
+
+    # Sessions loaded from the snapshot are written when switching again
+    reloaded = make_store()
+    load_upgrade_sessions_into(reloaded)
+    enable_state_files(reloaded, {})
+    assert not (state_dir / "upgrade_sessions.json").exists()
+    assert len(list((state_dir / "upgrade_sessions").glob("*.json"))) == 5
@@ -0,0 +1,96 @@
+"""Unit tests for the append-only state log."""
+
+import pytest
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import UpgradeSessionRecord
+from dell_unisphere_package.schemas.base import TaskStatusEnum, UpgradeStatusEnum
+from dell_unisphere_package.utils import state_persistence
+from dell_unisphere_package.utils.state_persistence import (
+    disable_state_log,
+    enable_state_log,
+    load_upgrade_sessions,
+)
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Keep the state files in a temporary directory."""
+    monkeypatch.setattr(state_persistence, "STATE_DIR", tmp_path)
+    for name, file_name in [
+        ("UPGRADE_SESSIONS_FILE", "upgrade_sessions.json"),
+        ("UPGRADE_SESSIONS_INDEX_FILE", "upgrade_sessions.index.json"),
+        ("BACKUP_FILE", "upgrade_sessions.backup.json"),
+        ("STATE_LOG_FILE", "upgrade_sessions.log"),
+        ("SESSION_FILES_DIR", "upgrade_sessions"),
+        ("CANDIDATE_FILES_DIR", "candidate_software"),
+        ("STATE_DATABASE_FILE", "state.db"),
+    ]:
+        monkeypatch.setattr(state_persistence, name, tmp_path / file_name)
+    return tmp_path
+
+
+@pytest.fixture
+def store(state_dir):
+    """Create an upgrade session store whose changes are logged."""
+    store = IndexedStore(indexes=("status",), record_type=UpgradeSessionRecord)
+    store["old"] = {"id": "old", "status": UpgradeStatusEnum.COMPLETED}
+    enable_state_log(store)
+    yield store
+    disable_state_log(store)
+
+
+def make_session(session_id):
+    return {
+        "id": session_id,
+        "status": UpgradeStatusEnum.IN_PROGRESS,
+        "percentComplete": 0,
+        "messages": [],
+        "tasks": [
+            {"status": TaskStatusEnum.PENDING, "caption": "Preparing system"},
+            {"status": TaskStatusEnum.PENDING, "caption": "Final tasks"},
+        ],
+    }
+
+
+def change_sessions(store, count):
+    for i in range(count):
+        store[f"s{i}"] = make_session(f"s{i}")
+        session = store[f"s{i}"]
+        session["percentComplete"] = 50
+        session["tasks"][0].status = TaskStatusEnum.COMPLETED
+        session.task_changed(session["tasks"][0])
+        session.add_message({"message": "Completed task: Preparing system"})
+        session.pop("percentComplete")
+    del store["old"]
+
+
+@pytest.mark.unit
+def test_changes_are_appended_and_replayed(store, state_dir):
+    """Test that logged changes are applied on top of the snapshot when loading."""
+    snapshot = (state_dir / "upgrade_sessions.json").read_bytes()
+    change_sessions(store, 3)
+
+    # Only the log grows; the snapshot is not rewritten
+    assert (state_dir / "upgrade_sessions.json").read_bytes() == snapshot
+    assert store.journal.changes == 16
+    with open(state_dir / "upgrade_sessions.log", "ab") as f:
+        f.write(b'{"op":"set","id":"s0"')  # Interrupted write
+
+    loaded = load_upgrade_sessions()
+    assert loaded == store
+    assert loaded["s0"]["tasks"][0]["status"] == TaskStatusEnum.COMPLETED
+    assert loaded["s0"]["messages"] == [{"message": "Completed task: Preparing system"}]
+
+
+@pytest.mark.unit
+def test_log_is_compacted(store, state_dir, monkeypatch):
+    """Test that the log is folded into a new snapshot once it outgrows it."""
+    monkeypatch.setattr(state_persistence, "STATE_LOG_MIN_COMPACTION_SIZE", 1000)
+    change_sessions(store, 20)
+
+    assert store.journal.compactions > 1
+    assert (state_dir / "upgrade_sessions.log").stat().st_size <= max(
+        1000, store.journal.snapshot_size
+    )
+    assert load_upgrade_sessions() == store
@@ -0,0 +1,117 @@
+"""Unit tests for loading upgrade sessions lazily from an indexed snapshot."""
+
+import pytest
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import UpgradeSessionRecord
+from dell_unisphere_package.schemas.base import TaskStatusEnum, UpgradeStatusEnum
+from dell_unisphere_package.utils import state_persistence
+from dell_unisphere_package.utils.state_persistence import (
+    enable_state_log,
+    load_upgrade_sessions,
+    load_upgrade_sessions_into,
+    save_upgrade_sessions,
+)
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """Keep the state files in a temporary directory."""
+    monkeypatch.setattr(state_persistence, "STATE_DIR", tmp_path)
+    for name, file_name in [
+        ("UPGRADE_SESSIONS_FILE", "upgrade_sessions.json"),
+        ("UPGRADE_SESSIONS_INDEX_FILE", "upgrade_sessions.index.json"),
+        ("BACKUP_FILE", "upgrade_sessions.backup.json"),
+        ("STATE_LOG_FILE", "upgrade_sessions.log"),
+        ("SESSION_FILES_DIR", "upgrade_sessions"),
+        ("CANDIDATE_FILES_DIR", "candidate_software"),
+        ("STATE_DATABASE_FILE", "state.db"),
+    ]:
+        monkeypatch.setattr(state_persistence, name, tmp_path / file_name)
+    return tmp_path
+
+
+def make_store():
+    return IndexedStore(
+        indexes=("status",), ordered=("creationTime",), record_type=UpgradeSessionRecord
+    )
+
+
+@pytest.fixture
+def saved(state_dir):
+    """Save upgrade sessions, half of which have finished."""
+    store = make_store()
+    for i in range(10):
+        store[f"s{i}"] = {
+            "id": f"s{i}",
+            "status": (
+                UpgradeStatusEnum.COMPLETED if i % 2 else UpgradeStatusEnum.PAUSED
+            ),
+            "creationTime": f"2025-01-{i + 1:02}T00:00:00",
+            "messages": [{"message": "Starting upgrade"}],
+            "tasks": [{"status": TaskStatusEnum.COMPLETED, "caption": "Prepare"}],
+        }
+    save_upgrade_sessions(store)
+    return store
+
+
+@pytest.mark.unit
+def test_sessions_are_read_when_accessed(saved):
+    """Test that loading reads the index and each session on first access."""
+    store = make_store()
+
+    assert load_upgrade_sessions_into(store) == 10
+    assert list(store) == list(saved)
+    assert store.keys_where("status", UpgradeStatusEnum.PAUSED) == {
+        "s0",
+        "s2",
+        "s4",
+        "s6",
+        "s8",
+    }
+    assert list(store.keys_ordered_by("creationTime", descending=True))[0] == "s9"
+    assert not any(store.is_loaded(key) for key in store)
+
+    assert store["s3"]["tasks"][0].status is TaskStatusEnum.COMPLETED
+    assert [key for key in store if store.is_loaded(key)] == ["s3"]
+
+    # Saving copies the sessions that are still unloaded from the previous file
+    store["s3"]["status"] = UpgradeStatusEnum.FAILED
+    save_upgrade_sessions(store)
+    assert [key for key in store if store.is_loaded(key)] == ["s3"]
+    assert store["s5"] == saved["s5"]
+
+    reloaded = make_store()
+    load_upgrade_sessions_into(reloaded)
+    assert reloaded.keys_where("status", UpgradeStatusEnum.FAILED) == {"s3"}
+    assert dict(reloaded.items()) == load_upgrade_sessions()
+
+
+@pytest.mark.unit
+def test_stale_index_loads_every_session(saved, state_dir):
+    """Test that a snapshot saved without its index is loaded in full."""
+    with open(state_dir / "upgrade_sessions.json", "a") as f:
+        f.write("\n")
+
+    store = make_store()
+    assert load_upgrade_sessions_into(store) == 10
+    assert all(store.is_loaded(key) for key in store)
+
+
+@pytest.mark.unit
+def test_state_log_is_applied_to_unloaded_sessions(saved, monkeypatch):
+    """Test that only the sessions changed by the state log are read."""
+    enable_state_log(saved)
+    saved["s0"]["status"] = UpgradeStatusEnum.IN_PROGRESS
+    saved["s1"].add_message({"message": "Done"})
+    del saved["s2"]
+    saved["s10"] = {"id": "s10", "status": UpgradeStatusEnum.NOT_STARTED}
+    saved.journal.close()
+
+    store = make_store()
+    load_upgrade_sessions_into(store)
+
+    assert [key for key in store if store.is_loaded(key)] == ["s0", "s1", "s10"]
+    assert list(store) == list(saved)
+    assert store.keys_where("status", UpgradeStatusEnum.IN_PROGRESS) == {"s0"}
+    assert dict(store.items()) == dict(saved.items())
@@ -0,0 +1,114 @@
+"""Unit tests for the background state writer."""
+
+import threading
+
+import pytest
+
+from dell_unisphere_package.models.indexed_store import IndexedStore
+from dell_unisphere_package.models.records import UpgradeSessionRecord
+from dell_unisphere_package.models.storage import system_config
+from dell_unisphere_package.utils import state_persistence
+from dell_unisphere_package.utils.state_persistence import (
+    CANDIDATE_SOFTWARE,
+    UPGRADE_SESSIONS,
+    notify_state_changed,
+    request_state_flush,
+    start_state_writer,
+    stop_state_writer,
+)
+from dell_unisphere_package.utils.state_writer import StateWriter
+
+
+@pytest.fixture
+def interval(monkeypatch):
+    """Use a short flush interval."""
+    monkeypatch.setitem(system_config, "persistence_interval", 0.05)
+    return 0.05
+
+
+@pytest.mark.unit
+def test_changes_are_coalesced(interval):
+    """Test that changes notified within the interval are written by one flush."""
+    flushed = []
+    done = threading.Event()
+
+    def flush(parts):
+        flushed.append(parts)
+        done.set()
+        return 10
+
+    writer = StateWriter(flush)
+    writer.start()
+    try:
+        for _ in range(100):
+            writer.notify(UPGRADE_SESSIONS)
+        writer.notify(CANDIDATE_SOFTWARE)
+        assert done.wait(5)
+    finally:
+        writer.stop()
+
+    assert flushed == [{UPGRADE_SESSIONS, CANDIDATE_SOFTWARE}]
+    stats = writer.stats()
+    assert stats["notifications"] == 101
+    assert stats["flushes"] == 1
+    assert stats["bytes_written"] == 10
+    assert stats["pending"] == []
+    assert not stats["running"]
+
+
+@pytest.mark.unit
+def test_failed_flush_is_retried():
+    """Test that the parts of a failed flush are written by the next one."""
+    results = [OSError("disk full"), 20]
+
+    def flush(parts):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    writer = StateWriter(flush)
+    writer.notify(UPGRADE_SESSIONS)
+
+    assert writer.flush() == 0
+    assert writer.stats()["pending"] == [UPGRADE_SESSIONS]
+    assert writer.flush() == 20
+    assert writer.flush() == 0  # Nothing left to write
+    assert writer.errors == 1
+    assert writer.flushes == 1
+
+
+@pytest.mark.unit
+def test_store_changes_reach_the_writer(monkeypatch):
+    """Test that writes to the session store and notified changes are saved."""
+    # Long enough for the flush to be the one requested below
+    monkeypatch.setitem(system_config, "persistence_interval", 60)
+    saved = []
+    done = threading.Event()
+
+    def save(parts):
+        saved.append(parts)
+        done.set()
+        return 1
+
+    monkeypatch.setattr(
+        state_persistence,
+        "flush_state",
+        lambda sessions, candidates, parts: save(parts),
+    )
+    store = IndexedStore(indexes=("status",), record_type=UpgradeSessionRecord)
+    assert not request_state_flush()
+
+    writer = start_state_writer(store, {})
+    try:
+        store["s1"] = {"id": "s1", "status": 1}
+        store["s1"]["percentComplete"] = 10
+        notify_state_changed(CANDIDATE_SOFTWARE)
+        assert request_state_flush()
+        assert done.wait(5)
+    finally:
+        stop_state_writer(store)
+
+    assert saved == [{UPGRADE_SESSIONS, CANDIDATE_SOFTWARE}]
+    assert writer.notifications == 3
+    assert store.journal is None
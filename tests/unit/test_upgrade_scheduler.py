@@ -0,0 +1,60 @@
+"""Unit tests for the upgrade scheduler module."""
+
+import asyncio
+
+import pytest
+
+from dell_unisphere_package.utils.upgrade_scheduler import SimulationScheduler
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_scheduler_bounds_concurrency():
+    """Test that sessions beyond the concurrency limit are queued."""
+    scheduler = SimulationScheduler(max_concurrent=2)
+    release = asyncio.Event()
+    started = []
+
+    async def simulation(session_id):
+        started.append(session_id)
+        await release.wait()
+        return session_id
+
+    tasks = [scheduler.start(f"session_{i}", simulation) for i in range(5)]
+    await asyncio.sleep(0.01)
+
+    assert len(started) == 2
+    assert scheduler.stats()["running"] == 2
+    assert scheduler.stats()["queued"] == 3
+
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert results == [f"session_{i}" for i in range(5)]
+    assert scheduler.tasks == {}
+
+
+@pytest.mark.unit
+@pytest.mark.asyncio
+async def test_scheduler_cancel_and_shutdown():
+    """Test cancelling a single simulation and shutting down the rest."""
+    scheduler = SimulationScheduler(max_concurrent=10)
+
+    async def simulation(session_id):
+        await asyncio.sleep(3600)
+
+    first = scheduler.start("first", simulation)
+    second = scheduler.start("second", simulation)
+    await asyncio.sleep(0)
+
+    assert scheduler.cancel("first") is True
+    assert scheduler.cancel("first") is False
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert not scheduler.is_active("first")
+    assert scheduler.is_active("second")
+
+    await scheduler.shutdown()
+
+    assert second.cancelled()
+    assert scheduler.tasks == {}
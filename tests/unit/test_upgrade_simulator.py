@@ -15,12 +15,20 @@ from dell_unisphere_package.schemas.base import (
     TaskTypeEnum,
     UpgradeStatusEnum,
 )
+from dell_unisphere_package.utils.clock import RealClock, VirtualClock, set_clock
 from dell_unisphere_package.utils.upgrade_simulator import (
+    active_session_ids,
     active_simulations,
     create_realistic_upgrade_tasks,
+    find_session_running_task,
     format_timedelta,
+    notify_session_resumed,
     parse_time_to_seconds,
     process_upgrade_session,
+    running_task_sessions,
+    scheduler,
+    session_speed_factors,
+    set_task_status,
     start_upgrade_simulation,
     stop_upgrade_simulation,
 )
@@ -236,15 +244,14 @@ async def test_start_stop_upgrade_simulation(
 ):
     """Test starting and stopping upgrade simulations."""
     # Start simulation
-    start_upgrade_simulation(session_id)
+    start_upgrade_simulation(session_id, speed_factor=100)
     assert session_id in active_simulations
 
-    # Give the thread a moment to start properly
+    # Give the task a moment to start properly
     await asyncio.sleep(0.2)
 
-    assert active_simulations[
-        session_id
-    ].is_alive()  # Thread objects use is_alive() instead of done()
+    # Simulations run as asyncio tasks on the current event loop
+    assert not active_simulations[session_id].done()
 
     # Give the task a moment to start
     await asyncio.sleep(0.1)
@@ -260,6 +267,7 @@ async def test_start_stop_upgrade_simulation(
     await asyncio.sleep(0.1)
 
     assert session_id not in active_simulations
+    assert session_id not in session_speed_factors
 
     # Try stopping again (should not raise error)
     stop_upgrade_simulation(session_id)
@@ -283,11 +291,13 @@ async def test_upgrade_session_pause_resume(
         # Wait a bit to ensure task starts
         await asyncio.sleep(0.1)
 
-        # Verify session is still paused
+        # Verify session is still paused and waiting on its resume event
         assert upgrade_sessions[session_id]["status"] == UpgradeStatusEnum.PAUSED
+        assert scheduler.stats()["waiting"] == 1
 
-        # Resume the session
+        # Resume the session and wake the simulation
         upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.IN_PROGRESS
+        notify_session_resumed(session_id)
 
         # Wait for completion
         try:
@@ -323,3 +333,102 @@ async def test_upgrade_session_pause_resume(
     # Verify candidate was removed
     assert len(candidate_software_versions) == 0
     assert len(uploaded_files) == 0
+
+
+@pytest.mark.asyncio
+async def test_paused_session_waits_without_polling(
+    reset_storage, upgrade_session, candidate_software, session_id
+):
+    """Test that a paused session sleeps until it is explicitly resumed."""
+    upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.PAUSED
+
+    session_task = asyncio.create_task(process_upgrade_session(session_id))
+    await asyncio.sleep(0.05)
+
+    # The simulation is parked on its resume event rather than sleeping in a loop
+    assert not session_task.done()
+    assert scheduler.stats()["waiting"] == 1
+
+    # Resuming wakes it immediately
+    upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.IN_PROGRESS
+    notify_session_resumed(session_id)
+    await asyncio.wait_for(session_task, timeout=5.0)
+
+    assert upgrade_sessions[session_id]["status"] == UpgradeStatusEnum.COMPLETED
+    assert scheduler.stats()["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_upgrade_with_virtual_clock(
+    reset_storage, candidate_software, session_id
+):
+    """Test that a complete 12-task upgrade runs instantly on a virtual clock."""
+    clock = set_clock(VirtualClock())
+    try:
+        upgrade_sessions[session_id] = {
+            "id": session_id,
+            "status": UpgradeStatusEnum.IN_PROGRESS,
+            "percentComplete": 0,
+            "tasks": create_realistic_upgrade_tasks(),
+            "messages": [],
+            "candidate": "test_candidate_123",
+        }
+
+        # Run at real-time speed: the whole upgrade takes well over an hour
+        start_upgrade_simulation(session_id, speed_factor=1)
+        await clock.advance(15 * 60)
+
+        session = upgrade_sessions[session_id]
+        assert session["status"] == UpgradeStatusEnum.IN_PROGRESS
+        assert 0 < session["percentComplete"] < 100
+        assert session_speed_factors[session_id] == 1
+
+        await clock.advance(3 * 3600)
+
+        assert session["status"] == UpgradeStatusEnum.COMPLETED
+        assert session["percentComplete"] == 100
+        assert all(t["status"] == TaskStatusEnum.COMPLETED for t in session["tasks"])
+        assert session["elapsedTime"].startswith("PT1H")
+        # The speed factor override ends with the simulation
+        assert session_id not in session_speed_factors
+    finally:
+        set_clock(RealClock())
+
+
+def test_running_task_index(reset_storage, upgrade_session, session_id):
+    """Test that sessions running a task are found without scanning all sessions."""
+    task = upgrade_session["tasks"][1]
+    assert find_session_running_task("Test Task 2") is None
+
+    set_task_status(session_id, task, TaskStatusEnum.IN_PROGRESS)
+    assert task["status"] == TaskStatusEnum.IN_PROGRESS
+    assert find_session_running_task("Test Task 2") == session_id
+    assert find_session_running_task("Test Task 1") is None
+
+    set_task_status(session_id, task, TaskStatusEnum.COMPLETED)
+    assert find_session_running_task("Test Task 2") is None
+
+    # Entries of sessions that no longer exist are dropped on lookup
+    set_task_status(session_id, task, TaskStatusEnum.IN_PROGRESS)
+    del upgrade_sessions[session_id]
+    assert find_session_running_task("Test Task 2") is None
+    assert session_id not in running_task_sessions["Test Task 2"]
+
+
+def test_active_session_ids(reset_storage, upgrade_session, session_id):
+    """Test that unfinished sessions are found through the status index."""
+    for i, status in enumerate([UpgradeStatusEnum.COMPLETED, UpgradeStatusEnum.FAILED]):
+        upgrade_sessions[f"finished_{i}"] = {"id": f"finished_{i}", "status": status}
+    assert active_session_ids() == [session_id]
+
+    upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.PAUSED
+    upgrade_sessions["finished_1"]["status"] = 1
+    assert active_session_ids() == [session_id, "finished_1"]
+
+    # A session without a status is not finished either
+    del upgrade_sessions["finished_1"]["status"]
+    assert active_session_ids() == [session_id, "finished_1"]
+
+    upgrade_sessions[session_id]["status"] = UpgradeStatusEnum.COMPLETED
+    del upgrade_sessions["finished_1"]
+    assert active_session_ids() == []